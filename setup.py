@@ -6,5 +6,10 @@ setuptools.setup(
         'requests',
         'boto3',
         'azure-storage-file-datalake',
-        'azure-identity']
+        'azure-identity'],
+    extras_require={
+        'ijson': ['ijson'],
+        'async': ['aiohttp', 'aiobotocore'],
+        'benchmark': ['moto[server]', 'pyftpdlib'],
+        'opentelemetry': ['opentelemetry-api']}
 )
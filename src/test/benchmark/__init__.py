@@ -0,0 +1,85 @@
+""" Benchmarks against local stand-ins of the remote services, run only if the
+XCPUTILS_BENCHMARK environment variable is set """
+
+from contextlib import contextmanager
+import os
+import socket
+import unittest
+from unittest import mock
+
+
+requires_benchmark = unittest.skipUnless(
+    os.environ.get("XCPUTILS_BENCHMARK"), "set XCPUTILS_BENCHMARK=1 to run benchmarks")
+
+
+def get_free_port() -> int:
+    """ Get a free TCP port on localhost """
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def local_s3_server():
+    """ Run a moto S3 server on localhost with boto3 pointed at it, yields its URL """
+
+    from moto.server import ThreadedMotoServer # pylint: disable=import-outside-toplevel
+
+    port = get_free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    url = f"http://127.0.0.1:{port}"
+
+    try:
+        with mock.patch.dict(os.environ, {
+                "AWS_ENDPOINT_URL_S3": url,
+                "AWS_ACCESS_KEY_ID": "testing",
+                "AWS_SECRET_ACCESS_KEY": "testing",
+                "AWS_DEFAULT_REGION": "us-east-1"}):
+            yield url
+    finally:
+        server.stop()
+
+
+@contextmanager
+def local_ftp_server(directory: str, user: str = "benchmark", password: str = "benchmark"):
+    """ Run a pyftpdlib server on localhost serving directory, with ftplib pointed at its port,
+    yields its host """
+
+    # pylint: disable=import-outside-toplevel
+    import ftplib
+    import threading
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+
+    authorizer = DummyAuthorizer()
+    authorizer.add_user(user, password, directory, perm="elr")
+    handler = type("BenchmarkFTPHandler", (FTPHandler,), {"authorizer": authorizer})
+
+    server = ThreadedFTPServer(("127.0.0.1", 0), handler)
+    port = server.address[1]
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={"timeout": 0.05, "handle_exit": False}, daemon=True)
+    thread.start()
+
+    try:
+        with mock.patch.object(ftplib.FTP, "port", port):
+            yield "127.0.0.1"
+    finally:
+        server.close_all()
+        thread.join()
+
+
+@contextmanager
+def fake_datalake():
+    """ Point Azure Data Lake Storage connections at an in-memory Data Lake, yields its client """
+
+    # pylint: disable=import-outside-toplevel
+    from test.unit import FakeDataLakeServiceClient
+    from xcputils.streaming.az import AdfsConnectionSettings
+
+    client = FakeDataLakeServiceClient()
+    with mock.patch.object(AdfsConnectionSettings, "get_client", return_value=client):
+        yield client
@@ -0,0 +1,76 @@
+""" Benchmark AwsS3TransferConfig against a local S3 server """
+
+import importlib.util
+import io
+import os
+import time
+import unittest
+from test.benchmark import local_s3_server, requires_benchmark
+
+from xcputils.streaming.aws import (
+    AwsS3ConnectionSettings, AwsS3StreamReader, AwsS3StreamWriter, AwsS3TransferConfig)
+
+
+MIB = 1024 * 1024
+
+CONFIGS = {
+    "legacy 10 KB threshold": AwsS3TransferConfig(
+        multipart_threshold=10000, chunk_size=8 * MIB, max_concurrency=4),
+    "default adaptive": AwsS3TransferConfig(),
+    "no threads": AwsS3TransferConfig(use_threads=False),
+    "16 MiB parts": AwsS3TransferConfig(chunk_size=16 * MIB),
+    }
+
+PAYLOADS = {
+    "50 x 100 KB": (50, 100 * 1024),
+    "1 x 64 MB": (1, 64 * MIB),
+    }
+
+
+@requires_benchmark
+@unittest.skipUnless(importlib.util.find_spec("moto"), "requires moto[server]")
+class BenchmarkAwsS3TransferConfig(unittest.TestCase):
+    """ Compare transfer configurations by throughput and number of requests """
+
+
+    def test_transfer_configs(self):
+        """ Upload and download each payload with each configuration """
+
+        with local_s3_server():
+            settings = AwsS3ConnectionSettings(bucket="benchmark", file_path=None)
+            client = settings.get_client()
+            client.create_bucket(Bucket="benchmark")
+            requests = [0]
+            client.meta.events.register(
+                "before-send.s3", lambda **kwargs: requests.__setitem__(0, requests[0] + 1))
+
+            results = {}
+            print(f"\n{'config':<24}{'payload':<14}{'op':<10}{'MB/s':>10}{'requests':>10}")
+            for config_name, config in CONFIGS.items():
+                for payload_name, (count, size) in PAYLOADS.items():
+                    payload = os.urandom(size)
+                    for operation in ("upload", "download"):
+                        requests[0] = 0
+                        start = time.perf_counter()
+                        for i in range(count):
+                            object_settings = AwsS3ConnectionSettings(
+                                bucket="benchmark", file_path=f"{payload_name}/{i}",
+                                transfer_config=config)
+                            if operation == "upload":
+                                AwsS3StreamWriter(object_settings).write(io.BytesIO(payload))
+                            else:
+                                AwsS3StreamReader(object_settings).read(io.BytesIO())
+                        seconds = time.perf_counter() - start
+                        results[config_name, payload_name, operation] = requests[0]
+                        print(f"{config_name:<24}{payload_name:<14}{operation:<10}"
+                              f"{count * size / MIB / seconds:>10.1f}{requests[0]:>10}")
+
+            settings.evict_client()
+
+        self.assertLess(
+            results["default adaptive", "50 x 100 KB", "upload"],
+            results["legacy 10 KB threshold", "50 x 100 KB", "upload"])
+
+
+if __name__ == '__main__':
+    unittest.main()
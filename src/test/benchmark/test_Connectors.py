@@ -0,0 +1,454 @@
+""" Benchmark every source and destination pair against local stand-ins of the remote services,
+run if XCPUTILS_BENCHMARK is set
+
+Payload sizes are set with XCPUTILS_BENCHMARK_SIZES, e.g. "1KB,1MB,64MB,5GB", by default
+1KB,1MB,64MB. Pairs with an in-memory source or destination, String and the fake Data Lake,
+are skipped above XCPUTILS_BENCHMARK_MAX_IN_MEMORY, by default 1GB. Results are written as
+JSON to XCPUTILS_BENCHMARK_OUTPUT if it is set, and compared with the results in
+XCPUTILS_BENCHMARK_BASELINE if it is set, failing pairs whose throughput dropped or whose peak
+memory grew by more than XCPUTILS_BENCHMARK_TOLERANCE, by default 0.3.
+
+Each pair runs in a process of its own, so its peak RSS is that of the pair, not of the stand-ins
+or pairs run before it. The in-memory Data Lake runs in that process, so its payload counts in the
+peak RSS of ADLS pairs """
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+import ftplib
+from http.server import BaseHTTPRequestHandler
+import importlib.util
+import json
+import math
+import multiprocessing
+import os
+import shutil
+import string
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+from test.benchmark import fake_datalake, local_ftp_server, local_s3_server, requires_benchmark
+from test.unit import local_http_server
+
+from xcputils.ingestion.aws import AwsS3Ingestor
+from xcputils.ingestion.az import AdfsIngestor
+from xcputils.ingestion.file import FileIngestor
+from xcputils.ingestion.ftp import FtpIngestor
+from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.ingestion.string import StringIngestor
+from xcputils.streaming.aws import AwsS3ConnectionSettings, AwsS3StreamWriter
+from xcputils.streaming.az import AdfsConnectionSettings, AdfsStreamWriter
+from xcputils.streaming.file import FileStreamWriter
+from xcputils.streaming.string import StringStreamWriter
+
+try:
+    import resource
+except ImportError: # pragma: no cover, e.g. on Windows
+    resource = None
+
+
+MIB = 1024 * 1024
+UNITS = {"KB": 1024, "MB": MIB, "GB": 1024 * MIB}
+BLOCK = (string.ascii_letters * (MIB // len(string.ascii_letters) + 1))[:MIB].encode("ascii")
+ITEM = "x" * 1000
+PAGE_SIZE = 64
+MIN_SECONDS = 1.0
+MAX_RUNS = 20
+
+SOURCES = ["File", "String", "HTTP", "Paginated HTTP", "FTP", "S3", "ADLS"]
+DESTINATIONS = ["File", "String", "S3", "ADLS"]
+IN_MEMORY = {"String", "ADLS"}
+
+
+def parse_size(size: str) -> int:
+    """ Parse a size like 64MB """
+
+    size = size.strip().upper()
+    for unit, factor in UNITS.items():
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+
+def format_size(size: int) -> str:
+    """ Format size with the largest unit it is a multiple of """
+
+    for unit, factor in reversed(UNITS.items()):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return f"{size}B"
+
+
+def generate(size: int):
+    """ Generate size bytes of payload, BLOCK repeated """
+
+    while size > 0:
+        yield BLOCK[:min(size, len(BLOCK))]
+        size -= len(BLOCK)
+
+
+def percentile(latencies: list, fraction: float) -> float:
+    """ Get the nearest-rank percentile of latencies """
+
+    ordered = sorted(latencies)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def get_peak_rss() -> float:
+    """ Get peak resident set size of the process in MB, None if unknown. VmHWM is read first
+    on Linux, since ru_maxrss keeps the peak of the parent of a spawned process """
+
+    try:
+        with open("/proc/self/status", encoding="ascii") as file:
+            for line in file:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / MIB if sys.platform == "darwin" else peak / 1024
+
+
+class PayloadHandler(BaseHTTPRequestHandler):
+    """ Serve /payload?size=N as a stream and /pages?size=N as offset/limit pages of items """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """ Serve payload or page """
+
+        url = urlparse(self.path)
+        query = {key: int(values[0]) for key, values in parse_qs(url.query).items()}
+
+        if url.path == "/payload":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(query["size"]))
+            self.end_headers()
+            for block in generate(query["size"]):
+                self.wfile.write(block)
+            return
+
+        items = math.ceil(query["size"] / len(ITEM))
+        offset = query.get("offset", 0)
+        count = max(0, min(query.get("limit", PAGE_SIZE), items - offset))
+        body = json.dumps({"data": [ITEM] * count}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+
+def run_pair_process(settings: dict, source: str, destination: str, size: int) -> dict:
+    """ Run pair with the in-memory Data Lake and FTP port of this process, to be called in a
+    spawned process, returns its results with the peak RSS of the process """
+
+    with ExitStack() as stack:
+        datalake = stack.enter_context(fake_datalake())
+        datalake.create_file_system("benchmark")
+        if settings.get("ftp_port"):
+            stack.enter_context(mock.patch.object(ftplib.FTP, "port", settings["ftp_port"]))
+
+        runner = PairRunner(settings, datalake)
+        if source == "ADLS":
+            runner.create_adls_source(size)
+        result = runner.run(source, destination, size)
+
+    result["peak_rss_mb"] = get_peak_rss()
+    return result
+
+
+class PairRunner():
+    """ Copy payloads from a source to a destination and check what was written """
+
+    def __init__(self, settings: dict, datalake):
+        self.directory = settings["directory"]
+        self.source_directory = settings["source_directory"]
+        self.http_url = settings["http_url"]
+        self.ftp_host = settings.get("ftp_host")
+        self.datalake = datalake
+        self.s3_client = AwsS3ConnectionSettings(bucket="benchmark", file_path=None).get_client() \
+            if settings.get("s3") else None
+
+
+    def run(self, source: str, destination: str, size: int) -> dict:
+        """ Copy size bytes from source to destination until MIN_SECONDS or MAX_RUNS """
+
+        latencies = []
+        while len(latencies) < MAX_RUNS and sum(latencies) < MIN_SECONDS:
+            target = f"target/{len(latencies)}"
+            writer = self.create_writer(destination, target)
+            ingestor = self.create_ingestor(source, size, writer)
+
+            start = time.perf_counter()
+            ingestor.ingest()
+            latencies.append(time.perf_counter() - start)
+
+            written = self.get_written_size(destination, target, writer)
+            expected = written > size if source == "Paginated HTTP" else written == size
+            if not expected:
+                raise AssertionError(f"{source} to {destination} wrote {written} of {size} bytes")
+            self.delete_target(destination, target)
+
+        return {
+            "runs": len(latencies),
+            "mb_per_second": size / MIB / percentile(latencies, 0.5),
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            }
+
+
+    def create_adls_source(self, size: int):
+        """ Store the payload in the in-memory Data Lake """
+
+        with open(os.path.join(self.source_directory, format_size(size)), "rb") as file:
+            self.datalake.get_file_system_client("benchmark") \
+                .get_directory_client("source") \
+                .get_file_client(format_size(size)) \
+                .upload_data(file.read(), overwrite=True)
+
+
+    def create_ingestor(self, source: str, size: int, writer):
+        """ Create ingestor reading size bytes from source """
+
+        name = format_size(size)
+
+        if source == "File":
+            return FileIngestor(os.path.join(self.source_directory, name), writer)
+        if source == "String":
+            return StringIngestor("".join(block.decode("ascii") for block in generate(size)), writer)
+        if source == "HTTP":
+            return HttpIngestor(
+                http_request=HttpRequest(url=f"{self.http_url}/payload", params={"size": size}),
+                stream_writer=writer)
+        if source == "Paginated HTTP":
+            return HttpIngestor(
+                http_request=HttpRequest(url=f"{self.http_url}/pages", params={"size": size}),
+                stream_writer=writer) \
+                .with_pagination(
+                    page_size=PAGE_SIZE,
+                    max_pages=math.ceil(size / len(ITEM) / PAGE_SIZE) + 1,
+                    max_concurrency=4)
+        if source == "FTP":
+            return FtpIngestor(
+                url=self.ftp_host, file_name=name, user="benchmark", password="benchmark",
+                stream_writer=writer)
+        if source == "S3":
+            return AwsS3Ingestor(
+                AwsS3ConnectionSettings(bucket="benchmark", file_path=f"source/{name}"), writer)
+        return AdfsIngestor(
+            AdfsConnectionSettings(container="benchmark", directory="source", file_name=name),
+            writer)
+
+
+    def create_writer(self, destination: str, target: str):
+        """ Create writer of payload.bin in target """
+
+        if destination == "File":
+            return FileStreamWriter(os.path.join(self.directory, target, "payload.bin"))
+        if destination == "String":
+            return StringStreamWriter()
+        if destination == "S3":
+            return AwsS3StreamWriter(
+                AwsS3ConnectionSettings(bucket="benchmark", file_path=f"{target}/payload.bin"))
+        return AdfsStreamWriter(AdfsConnectionSettings(
+            container="benchmark", directory=target, file_name="payload.bin",
+            storage_account_name="target"))
+
+
+    def get_written_size(self, destination: str, target: str, writer) -> int:
+        """ Get number of bytes written to target, over all files for pages """
+
+        if destination == "File":
+            return sum(
+                os.path.getsize(os.path.join(folder, file_name))
+                for folder, _, file_names in os.walk(os.path.join(self.directory, target))
+                for file_name in file_names)
+        if destination == "String":
+            return len(writer.get_buffer())
+        if destination == "S3":
+            pages = self.s3_client.get_paginator("list_objects_v2").paginate(
+                Bucket="benchmark", Prefix=f"{target}/")
+            return sum(obj["Size"] for page in pages for obj in page.get("Contents", []))
+        files = self.datalake.get_file_system_client("benchmark").files
+        return sum(len(file.content) for path, file in files.items() if path.startswith(f"{target}/"))
+
+
+    def delete_target(self, destination: str, target: str):
+        """ Delete everything written to target """
+
+        if destination == "File":
+            shutil.rmtree(os.path.join(self.directory, target), ignore_errors=True)
+        elif destination == "S3":
+            pages = self.s3_client.get_paginator("list_objects_v2").paginate(
+                Bucket="benchmark", Prefix=f"{target}/")
+            for page in pages:
+                for obj in page.get("Contents", []):
+                    self.s3_client.delete_object(Bucket="benchmark", Key=obj["Key"])
+        elif destination == "ADLS":
+            files = self.datalake.get_file_system_client("benchmark").files
+            for path in [path for path in files if path.startswith(f"{target}/")]:
+                del files[path]
+
+
+@requires_benchmark
+class BenchmarkConnectors(unittest.TestCase):
+    """ Measure throughput, latency and peak memory of each source and destination pair """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.sizes = [
+            parse_size(size)
+            for size in os.getenv("XCPUTILS_BENCHMARK_SIZES", "1KB,1MB,64MB").split(",")]
+        cls.max_in_memory = parse_size(os.getenv("XCPUTILS_BENCHMARK_MAX_IN_MEMORY", "1GB"))
+        cls.directory = tempfile.mkdtemp()
+        cls.source_directory = os.path.join(cls.directory, "source")
+        os.makedirs(cls.source_directory)
+
+        cls.stack = ExitStack()
+        cls.settings = {
+            "directory": cls.directory,
+            "source_directory": cls.source_directory,
+            "http_url": cls.stack.enter_context(local_http_server(PayloadHandler)),
+            }
+        cls.missing = {}
+
+        if importlib.util.find_spec("moto"):
+            cls.stack.enter_context(local_s3_server())
+            cls.s3_client = AwsS3ConnectionSettings(bucket="benchmark", file_path=None).get_client()
+            cls.s3_client.create_bucket(Bucket="benchmark")
+            cls.settings["s3"] = True
+        else:
+            cls.missing["S3"] = "requires moto[server]"
+
+        if importlib.util.find_spec("pyftpdlib"):
+            cls.settings["ftp_host"] = cls.stack.enter_context(
+                local_ftp_server(cls.source_directory))
+            cls.settings["ftp_port"] = ftplib.FTP.port
+        else:
+            cls.missing["FTP"] = "requires pyftpdlib"
+
+
+    @classmethod
+    def tearDownClass(cls):
+        if "S3" not in cls.missing:
+            AwsS3ConnectionSettings(bucket="benchmark", file_path=None).evict_client()
+        cls.stack.close()
+        shutil.rmtree(cls.directory)
+
+
+    def test_connectors(self):
+        """ Copy each payload size from each source to each destination """
+
+        results = {}
+        print(f"\n{'source':<16}{'destination':<13}{'size':>7}{'runs':>6}{'MB/s':>10}"
+              f"{'p50 ms':>10}{'p99 ms':>10}{'peak RSS MB':>13}")
+
+        for size in self.sizes:
+            self.create_sources(size)
+            for source in SOURCES:
+                for destination in DESTINATIONS:
+                    name = f"{source} to {destination} {format_size(size)}"
+                    with self.subTest(name):
+                        reason = self.get_skip_reason(source, destination, size)
+                        if reason:
+                            self.skipTest(reason)
+                        results[name] = self.run_pair(source, destination, size)
+                        result = results[name]
+                        print(f"{source:<16}{destination:<13}{format_size(size):>7}"
+                              f"{result['runs']:>6}{result['mb_per_second']:>10.1f}"
+                              f"{result['p50'] * 1000:>10.1f}{result['p99'] * 1000:>10.1f}"
+                              f"{result['peak_rss_mb'] or 0:>13.0f}")
+            self.delete_sources(size)
+
+        output = os.getenv("XCPUTILS_BENCHMARK_OUTPUT")
+        if output:
+            with open(output, "w", encoding="utf-8") as file:
+                json.dump(results, file, indent=2)
+
+        self.compare_baseline(results)
+
+
+    def get_skip_reason(self, source: str, destination: str, size: int) -> str:
+        """ Get reason to skip pair, None to run it """
+
+        for connector in (source, destination):
+            if connector in self.missing:
+                return self.missing[connector]
+            if connector in IN_MEMORY and size > self.max_in_memory:
+                return f"{connector} is in memory, above XCPUTILS_BENCHMARK_MAX_IN_MEMORY"
+        return None
+
+
+    def run_pair(self, source: str, destination: str, size: int) -> dict:
+        """ Run pair in a new spawned process, so its peak RSS starts from a fresh interpreter """
+
+        with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            return executor.submit(
+                run_pair_process, self.settings, source, destination, size).result()
+
+
+    def compare_baseline(self, results: dict):
+        """ Fail pairs slower or using more memory than the baseline by more than the tolerance """
+
+        baseline_path = os.getenv("XCPUTILS_BENCHMARK_BASELINE")
+        if not baseline_path:
+            return
+
+        with open(baseline_path, encoding="utf-8") as file:
+            baseline = json.load(file)
+        tolerance = float(os.getenv("XCPUTILS_BENCHMARK_TOLERANCE", "0.3"))
+
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            with self.subTest(f"{name} baseline"):
+                self.assertGreaterEqual(
+                    result["mb_per_second"],
+                    baseline[name]["mb_per_second"] * (1 - tolerance),
+                    f"{name} throughput regressed")
+                if result["peak_rss_mb"] and baseline[name].get("peak_rss_mb"):
+                    self.assertLessEqual(
+                        result["peak_rss_mb"],
+                        baseline[name]["peak_rss_mb"] * (1 + tolerance),
+                        f"{name} peak memory regressed")
+
+
+    def create_sources(self, size: int):
+        """ Store the payload in the file, FTP and S3 sources, the in-memory Data Lake source is
+        created in the process of each pair """
+
+        file_path = os.path.join(self.source_directory, format_size(size))
+        with open(file_path, "wb") as file:
+            for block in generate(size):
+                file.write(block)
+
+        if "S3" not in self.missing:
+            with open(file_path, "rb") as file:
+                AwsS3StreamWriter(AwsS3ConnectionSettings(
+                    bucket="benchmark", file_path=f"source/{format_size(size)}")).write(file)
+
+
+    def delete_sources(self, size: int):
+        """ Delete the payload from the sources """
+
+        os.remove(os.path.join(self.source_directory, format_size(size)))
+        if "S3" not in self.missing:
+            self.s3_client.delete_object(Bucket="benchmark", Key=f"source/{format_size(size)}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+""" Benchmark StringStreamWriter with many paginated pages """
+
+import time
+import unittest
+from unittest.mock import patch
+from test.benchmark import requires_benchmark
+from test.unit import mock_response
+
+from requests import Session
+
+from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.streaming.string import StringStreamWriter
+
+
+PAGES = 10000
+PAGE_SIZE = 50
+
+
+class ConcatenatingStringStreamWriter(StringStreamWriter):
+    """ Previous writer, concatenating the decoded value on every write """
+
+    def __init__(self):
+        super().__init__()
+        self.concatenated = ""
+
+
+    def write(self, input_stream):
+        content = input_stream if isinstance(input_stream, bytes) else input_stream.read()
+        if isinstance(content, bytes):
+            content = content.decode("utf-8")
+        if self.concatenated:
+            self.concatenated += "\n"
+        self.concatenated += content
+
+
+@requires_benchmark
+class BenchmarkStringStreamWriter(unittest.TestCase):
+    """ Compare writing paginated pages to a string by concatenation and by chunks """
+
+
+    def test_paginated_pages(self):
+        """ Ingest PAGES pages of PAGE_SIZE items to a string """
+
+        def get_pages(*args, **kwargs): # pylint: disable=unused-argument
+            for page in range(PAGES):
+                size = PAGE_SIZE if page < PAGES - 1 else PAGE_SIZE - 1
+                yield mock_response(json_data={
+                    "data": [{"id": page * PAGE_SIZE + i, "name": f"item {i}"} for i in range(size)]})
+
+        results = {}
+        print(f"\n{'writer':<16}{'pages':>8}{'MB':>8}{'seconds':>10}")
+        for name, writer in (
+                ("concatenating", ConcatenatingStringStreamWriter()),
+                ("chunked", StringStreamWriter())):
+            with patch.object(Session, "get", side_effect=get_pages()):
+                start = time.perf_counter()
+                HttpIngestor(
+                    http_request=HttpRequest(url="https://mock.com/items"),
+                    stream_writer=writer) \
+                    .with_pagination(page_size=PAGE_SIZE) \
+                    .ingest()
+                value = writer.concatenated if name == "concatenating" else writer.value
+                seconds = time.perf_counter() - start
+
+            results[name] = (value, seconds)
+            print(f"{name:<16}{PAGES:>8}{len(value) / 1024 / 1024:>8.1f}{seconds:>10.2f}")
+
+        self.assertEqual(results["chunked"][0], results["concatenating"][0])
+        self.assertLess(results["chunked"][1], results["concatenating"][1])
+
+
+if __name__ == "__main__":
+    unittest.main()
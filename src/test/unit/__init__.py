@@ -1,7 +1,14 @@
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import hashlib
 import io
 import json
+import threading
 from unittest import mock
 
+from azure.core import MatchConditions
+from azure.core.exceptions import ResourceExistsError, ResourceModifiedError, ResourceNotFoundError
+
 
 def mock_response(
         status=200,
@@ -26,3 +33,179 @@ def mock_response(
     mock_resp.raw = io.BytesIO(mock_resp.content.encode("utf-8"))
 
     return mock_resp
+
+
+@contextmanager
+def local_http_server(handler: BaseHTTPRequestHandler):
+    """ Run an HTTP server on localhost, yields its base URL """
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+class FakeDataLakeFile:
+    """ In-memory Data Lake file supporting append/flush uploads """
+
+    def __init__(self):
+        self.content = b""
+        self.uncommitted = {}
+
+
+class FakeDataLakeFileClient:
+    """ Fake azure.storage.filedatalake.DataLakeFileClient """
+
+    def __init__(self, files: dict, path: str):
+        self.files = files
+        self.path = path
+
+
+    def create_file(self):
+        """ Create or truncate file """
+        self.files[self.path] = FakeDataLakeFile()
+
+
+    def append_data(self, data, offset: int, length: int = None):
+        """ Stage data at offset """
+        file = self.files[self.path]
+        data = bytes(data)
+        assert length is None or length == len(data)
+        file.uncommitted[offset] = data
+
+
+    def flush_data(self, offset: int):
+        """ Commit staged data up to offset """
+        file = self.files[self.path]
+        content = bytearray()
+        while len(content) < offset:
+            content += file.uncommitted.pop(len(content))
+        assert len(content) == offset
+        file.content = bytes(content)
+        file.uncommitted.clear()
+
+
+    def upload_data(self, data, overwrite: bool = False, etag: str = None, match_condition=None):
+        """ Upload whole file, with overwrite False only if it does not exist and with
+        match_condition IfNotModified only if etag matches """
+        if not overwrite and self.path in self.files:
+            raise ResourceExistsError("The specified path already exists.")
+        if match_condition == MatchConditions.IfNotModified and \
+                etag != self.get_file_properties().etag:
+            raise ResourceModifiedError("The condition specified using HTTP conditional header(s) is not met.")
+        self.create_file()
+        self.files[self.path].content = data if isinstance(data, bytes) else data.read()
+        return {"etag": self.get_file_properties().etag}
+
+
+    def get_file_properties(self):
+        """ Get file properties """
+        if self.path not in self.files:
+            raise ResourceNotFoundError("The specified path does not exist.")
+        content = self.files[self.path].content
+        return mock.Mock(
+            size=len(content),
+            etag=f'"{hashlib.md5(content).hexdigest()}"',
+            last_modified=None)
+
+
+    def download_file(self, offset: int = None, length: int = None):
+        """ Download file or range, with properties if the whole file is downloaded """
+        if self.path not in self.files:
+            raise ResourceNotFoundError("The specified path does not exist.")
+        properties = self.get_file_properties() if offset is None and length is None else None
+        content = self.files[self.path].content
+        offset = offset or 0
+        content = content[offset:] if length is None else content[offset:offset + length]
+        downloader = mock.Mock(properties=properties)
+        downloader.readall.return_value = content
+        downloader.readinto.side_effect = lambda stream: stream.write(content)
+        return downloader
+
+
+class FakeDataLakeDirectoryClient:
+    """ Fake azure.storage.filedatalake.DataLakeDirectoryClient """
+
+    def __init__(self, file_system, directory: str):
+        self.file_system = file_system
+        self.directory = directory
+
+
+    def exists(self) -> bool:
+        """ Check if directory exists """
+        return self.directory in self.file_system.directories
+
+
+    def get_file_client(self, file_name: str) -> FakeDataLakeFileClient:
+        """ Get file client """
+        return FakeDataLakeFileClient(
+            self.file_system.files, f"{self.directory}/{file_name}")
+
+
+    def create_file(self, file_name: str) -> FakeDataLakeFileClient:
+        """ Create file """
+        file_client = self.get_file_client(file_name)
+        file_client.create_file()
+        return file_client
+
+
+class FakeDataLakeFileSystemClient:
+    """ Fake azure.storage.filedatalake.FileSystemClient """
+
+    def __init__(self):
+        self.directories = set()
+        self.files = {}
+        self.created = False
+
+
+    def exists(self) -> bool:
+        """ Check if file system exists """
+        return self.created
+
+
+    def get_directory_client(self, directory: str) -> FakeDataLakeDirectoryClient:
+        """ Get directory client """
+        return FakeDataLakeDirectoryClient(self, directory)
+
+
+    def create_directory(self, directory: str) -> FakeDataLakeDirectoryClient:
+        """ Create directory """
+        self.directories.add(directory)
+        return self.get_directory_client(directory)
+
+
+    def get_paths(self, path: str = None, recursive: bool = True): # pylint: disable=unused-argument
+        """ List files under path """
+        for name in sorted(self.files):
+            if not path or name.startswith(f"{path}/"):
+                content = self.files[name].content
+                properties = mock.Mock(
+                    is_directory=False,
+                    etag=f'"{hashlib.md5(content).hexdigest()}"',
+                    last_modified=None)
+                properties.name = name
+                yield properties
+
+
+class FakeDataLakeServiceClient:
+    """ Fake azure.storage.filedatalake.DataLakeServiceClient """
+
+    def __init__(self):
+        self.file_systems = {}
+
+
+    def get_file_system_client(self, file_system: str) -> FakeDataLakeFileSystemClient:
+        """ Get file system client """
+        return self.file_systems.setdefault(file_system, FakeDataLakeFileSystemClient())
+
+
+    def create_file_system(self, file_system: str) -> FakeDataLakeFileSystemClient:
+        """ Create file system """
+        file_system_client = self.get_file_system_client(file_system)
+        file_system_client.created = True
+        return file_system_client
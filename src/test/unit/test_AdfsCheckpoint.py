@@ -0,0 +1,52 @@
+""" Test AdfsCheckpoint """
+
+import unittest
+from unittest.mock import patch
+from test.unit import FakeDataLakeServiceClient
+
+from xcputils.checkpoints.az import AdfsCheckpoint
+from xcputils.streaming.az import AdfsConnectionSettings
+
+
+class TestAdfsCheckpoint(unittest.TestCase):
+    """ Test xcputils.checkpoints.az.AdfsCheckpoint """
+
+
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_get_set(self, mock_get_client):
+        """ Test get returns default until the file is written to a new file system """
+
+        client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = client
+        checkpoint = AdfsCheckpoint(name="test", container="container", directory="checkpoints")
+
+        self.assertEqual(checkpoint.get(default="default"), "default")
+        checkpoint.set("1")
+
+        self.assertTrue(client.get_file_system_client("container").exists())
+        self.assertEqual(
+            client.get_file_system_client("container").files["checkpoints/test.json"].content, b"1")
+        self.assertEqual(
+            AdfsCheckpoint(name="test", container="container", directory="checkpoints").get(), "1")
+
+
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_compare_and_set(self, mock_get_client):
+        """ Test compare_and_set writes conditionally on the ETag it read """
+
+        client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = client
+        checkpoint = AdfsCheckpoint(name="test", container="container", directory="checkpoints")
+        other = AdfsCheckpoint(name="test", container="container", directory="checkpoints")
+
+        self.assertTrue(checkpoint.compare_and_set(None, "1"))
+        self.assertFalse(other.compare_and_set(None, "2"))
+        self.assertTrue(other.compare_and_set("1", "2"))
+
+        self.assertEqual(checkpoint.get(), "1")
+        self.assertFalse(checkpoint.compare_and_set("1", "3"))
+        self.assertEqual(checkpoint.get(), "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+""" Test AdfsIngestor """
+
+import unittest
+from unittest.mock import MagicMock, patch
+from test.unit import FakeDataLakeServiceClient
+
+from xcputils.ingestion.az import AdfsIngestor
+from xcputils.streaming.az import AdfsConnectionSettings, AdfsStreamReader, AdfsStreamWriter
+
+
+class TestAdfsIngestor(unittest.TestCase):
+    """ Test xcputils.ingestion.az.AdfsIngestor """
+
+
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_ingest(self, mock_get_client):
+        """ Test file is read with ranged downloads """
+
+        client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = client
+        client.get_file_system_client("container").get_directory_client("in") \
+            .get_file_client("test.txt").upload_data(b"content")
+
+        result = AdfsIngestor(
+            AdfsConnectionSettings(container="container", directory="in", file_name="test.txt"),
+            chunk_size=3,
+            ).write_to_string()
+
+        self.assertEqual(result, "content")
+
+
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_ingest_directory(self, mock_get_client):
+        """ Test files under directory matching pattern are copied to their relative paths """
+
+        client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = client
+        file_system_client = client.get_file_system_client("container")
+        for path, content in {
+                "in/a.csv": b"a",
+                "in/b.json": b"b",
+                "in/sub/c.csv": b"c",
+                "other/d.csv": b"d"}.items():
+            directory, file_name = path.rsplit("/", 1)
+            file_system_client.get_directory_client(directory) \
+                .get_file_client(file_name).upload_data(content)
+
+        AdfsIngestor(
+            AdfsConnectionSettings(container="container", directory="in", file_name=None),
+            stream_writer=AdfsStreamWriter(AdfsConnectionSettings(
+                container="container", directory="out", file_name=None,
+                storage_account_name="other")),
+            pattern="*.csv",
+            max_concurrency=4,
+            ).ingest()
+
+        copied = {
+            path: file.content
+            for path, file in file_system_client.files.items()
+            if path.startswith("out/")
+            }
+        self.assertEqual(copied, {"out/a.csv": b"a", "out/sub/c.csv": b"c"})
+
+
+    @patch.object(AdfsConnectionSettings, "get_client", autospec=True)
+    def test_read_concurrency(self, mock_get_client):
+        """ Test readers use a small window and the pool fits every ranged read of the ingest """
+
+        settings = AdfsConnectionSettings(container="container", directory="in", file_name=None)
+        self.assertEqual(AdfsStreamReader(settings).max_concurrency, 2)
+
+        client = FakeDataLakeServiceClient()
+        for i in range(4):
+            client.get_file_system_client("container").get_directory_client("in") \
+                .get_file_client(f"{i}.txt").upload_data(b"x")
+        pool_sizes = set()
+        mock_get_client.side_effect = \
+            lambda settings: pool_sizes.add(settings.max_pool_connections) or client
+
+        AdfsIngestor(settings, max_concurrency=8, read_concurrency=4).write_to_string()
+
+        self.assertEqual(pool_sizes, {32})
+        self.assertEqual(settings.max_pool_connections, 10)
+
+
+    @patch("xcputils.streaming.az.COPY_POLL_INTERVAL", 0)
+    @patch.object(AdfsConnectionSettings, "get_blob_service_client")
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_ingest_server_side_copy(self, mock_get_client, mock_get_blob_service_client):
+        """ Test ADLS to ADLS in the same account copies server-side, else streams """
+
+        client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = client
+        file_system_client = client.get_file_system_client("container")
+        file_system_client.get_directory_client("in").get_file_client("test.txt") \
+            .upload_data(b"content")
+
+        blob_service_client = MagicMock()
+        mock_get_blob_service_client.return_value = blob_service_client
+        blob_client = MagicMock()
+        blob_client.start_copy_from_url.return_value = {"copy_status": "pending"}
+        blob_client.get_blob_properties.return_value.copy.status = "success"
+
+        def ingest(storage_account_name: str):
+            AdfsIngestor(
+                AdfsConnectionSettings(
+                    container="container", directory="in", file_name="test.txt",
+                    storage_account_name="account"),
+                stream_writer=AdfsStreamWriter(AdfsConnectionSettings(
+                    container="container", directory="out", file_name="test.txt",
+                    storage_account_name=storage_account_name)),
+                ).ingest()
+
+        blob_service_client.get_blob_client.side_effect = [
+            MagicMock(url="https://account.blob.core.windows.net/container/in/test.txt"),
+            blob_client,
+            ]
+        ingest("account")
+        blob_client.start_copy_from_url.assert_called_once_with(
+            "https://account.blob.core.windows.net/container/in/test.txt")
+        self.assertNotIn("out/test.txt", file_system_client.files)
+
+        ingest("other")
+        self.assertEqual(file_system_client.files["out/test.txt"].content, b"content")
+
+
+    @patch("xcputils.streaming.az.COPY_POLL_INTERVAL", 0)
+    @patch.object(AdfsConnectionSettings, "get_blob_service_client")
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_ingest_directory_server_side_copy(
+        self, mock_get_client, mock_get_blob_service_client):
+        """ Test a directory copied with a larger pool than the writer still copies server-side """
+
+        client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = client
+        for file_name in ("a.txt", "b.txt"):
+            client.get_file_system_client("container").get_directory_client("in") \
+                .get_file_client(file_name).upload_data(b"content")
+
+        blob_service_client = MagicMock()
+        mock_get_blob_service_client.return_value = blob_service_client
+        blob_service_client.get_blob_client.return_value.start_copy_from_url.return_value = \
+            {"copy_status": "success"}
+
+        AdfsIngestor(
+            AdfsConnectionSettings(
+                container="container", directory="in", file_name=None,
+                storage_account_name="account"),
+            stream_writer=AdfsStreamWriter(AdfsConnectionSettings(
+                container="container", directory="out", file_name=None,
+                storage_account_name="account")),
+            max_concurrency=8,
+            ).ingest()
+
+        self.assertEqual(
+            sorted(args[1] for args, _ in blob_service_client.get_blob_client.call_args_list),
+            ["in/a.txt", "in/b.txt", "out/a.txt", "out/b.txt"])
+        self.assertNotIn("out/a.txt", client.get_file_system_client("container").files)
+
+
+if __name__ == '__main__':
+    unittest.main()
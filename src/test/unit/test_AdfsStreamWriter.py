@@ -0,0 +1,106 @@
+""" Test AdfsStreamWriter """
+
+import io
+import unittest
+from unittest.mock import MagicMock, patch
+from test.unit import FakeDataLakeServiceClient
+
+from xcputils.streaming.az import (
+    AdfsConnectionSettings, AdfsStreamReader, AdfsStreamWriter, AdfsTransferConfig)
+
+
+class NonSeekableStream(io.RawIOBase):
+    """ Non-seekable stream returning short reads, like an HTTP response.raw """
+
+    def __init__(self, payload: bytes, max_read: int):
+        super().__init__()
+        self.stream = io.BytesIO(payload)
+        self.max_read = max_read
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def readinto(self, buffer) -> int:
+        data = self.stream.read(min(len(buffer), self.max_read))
+        buffer[:len(data)] = data
+        return len(data)
+
+
+class TestAdfsStreamWriter(unittest.TestCase):
+    """ Test xcputils.streaming.az.AdfsStreamWriter """
+
+
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_write_chunked(self, mock_get_client):
+        """ Test write appends chunks in parallel and flushes once """
+
+        client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = client
+        payload = "".join(f"line {i}\n" for i in range(10000)).encode("utf-8")
+
+        connection_settings = AdfsConnectionSettings(
+            container="container",
+            directory="folder",
+            file_name="test.txt",
+            storage_account_name="account",
+            transfer_config=AdfsTransferConfig(chunk_size=1000, max_concurrency=4))
+
+        AdfsStreamWriter(connection_settings).write(NonSeekableStream(payload, max_read=300))
+
+        file = client.get_file_system_client("container").files["folder/test.txt"]
+        self.assertEqual(file.content, payload)
+        self.assertEqual(AdfsStreamReader(connection_settings).read_str(), payload.decode("utf-8"))
+
+
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_write_empty(self, mock_get_client):
+        """ Test write of an empty stream """
+
+        client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = client
+
+        connection_settings = AdfsConnectionSettings(
+            container="container",
+            directory="folder",
+            file_name="empty.txt",
+            storage_account_name="account")
+
+        AdfsStreamWriter(connection_settings).write(io.BytesIO())
+
+        file = client.get_file_system_client("container").files["folder/empty.txt"]
+        self.assertEqual(file.content, b"")
+
+
+
+    @patch.object(AdfsConnectionSettings, "get_blob_service_client")
+    def test_copy_from_creates_file_system(self, mock_get_blob_service_client):
+        """ Test a server-side copy creates the missing file system before copying """
+
+        blob_service_client = MagicMock()
+        mock_get_blob_service_client.return_value = blob_service_client
+        container_client = blob_service_client.get_container_client.return_value
+        container_client.exists.return_value = False
+        blob_client = MagicMock()
+        blob_client.start_copy_from_url.return_value = {"copy_status": "success"}
+        blob_service_client.get_blob_client.side_effect = [MagicMock(url="source"), blob_client]
+        calls = MagicMock()
+        calls.attach_mock(container_client.create_container, "create_container")
+        calls.attach_mock(blob_client.start_copy_from_url, "start_copy_from_url")
+
+        copied = AdfsStreamWriter(AdfsConnectionSettings(
+            container="new", directory="out", file_name="a.txt",
+            storage_account_name="account")).copy_from(AdfsStreamReader(AdfsConnectionSettings(
+                container="container", directory="in", file_name="a.txt",
+                storage_account_name="account")))
+
+        self.assertTrue(copied)
+        blob_service_client.get_container_client.assert_called_once_with("new")
+        self.assertEqual(
+            [name for name, _, _ in calls.mock_calls],
+            ["create_container", "start_copy_from_url"])
+
+
+if __name__ == '__main__':
+    unittest.main()
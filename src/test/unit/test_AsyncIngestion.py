@@ -0,0 +1,281 @@
+""" Unit tests """
+
+import asyncio
+from http.server import BaseHTTPRequestHandler
+import io
+import json
+import unittest
+from unittest.mock import patch
+from test.unit import FakeDataLakeServiceClient, local_http_server
+from test.unit.test_Checkpoint import MemoryCheckpoint
+from xcputils.batch import Batch
+from xcputils.ingestion.aws import AwsS3Ingestor
+from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.ingestion.string import StringIngestor
+from xcputils.streaming.aws import AwsS3ConnectionSettings, AwsS3StreamWriter, AwsS3TransferConfig
+from xcputils.streaming.az import AdfsConnectionSettings, AdfsStreamReader, AdfsStreamWriter, AdfsTransferConfig
+from xcputils.streaming.string import StringStreamWriter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """ Echo the request path as JSON """
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """ Serve path """
+        body = json.dumps({"path": self.path}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+
+class FakeAsyncS3Client:
+    """ In-memory stand-in for an aiobotocore S3 client """
+
+    def __init__(self, objects: dict):
+        self.objects = objects
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, *args):
+        pass
+
+
+    async def get_object(self, Bucket, Key): # pylint: disable=invalid-name
+        """ Get object """
+        body = io.BytesIO(self.objects[(Bucket, Key)])
+
+        class Body:
+            """ Async streaming body """
+            async def __aenter__(self):
+                return self
+            async def __aexit__(self, *args):
+                pass
+            async def read(self):
+                """ Read body """
+                return body.read()
+
+        return {"Body": Body()}
+
+
+    async def put_object(self, Bucket, Key, Body): # pylint: disable=invalid-name
+        """ Put object """
+        self.objects[(Bucket, Key)] = Body
+
+
+    async def create_multipart_upload(self, Bucket, Key): # pylint: disable=invalid-name
+        """ Start multipart upload """
+        self.uploads = getattr(self, "uploads", {})
+        self.uploads[(Bucket, Key)] = {}
+        return {"UploadId": "upload"}
+
+
+    async def upload_part(self, Bucket, Key, UploadId, PartNumber, Body): # pylint: disable=invalid-name,unused-argument
+        """ Upload part """
+        await asyncio.sleep(0)
+        self.uploads[(Bucket, Key)][PartNumber] = Body
+        return {"ETag": f'"{PartNumber}"'}
+
+
+    async def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload): # pylint: disable=invalid-name,unused-argument
+        """ Complete multipart upload """
+        parts = self.uploads.pop((Bucket, Key))
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        assert numbers == sorted(parts)
+        self.objects[(Bucket, Key)] = b"".join(parts[number] for number in numbers)
+
+
+    async def abort_multipart_upload(self, Bucket, Key, UploadId): # pylint: disable=invalid-name,unused-argument
+        """ Abort multipart upload """
+        self.uploads.pop((Bucket, Key), None)
+
+
+class FakeAsyncDataLakeClient:
+    """ Async stand-in for an azure.storage.filedatalake.aio client, wrapping a fake sync
+    client and making the calls the aio SDK awaits coroutines """
+
+    ASYNC_METHODS = {
+        "exists", "create_file_system", "create_directory", "create_file", "append_data",
+        "flush_data", "download_file", "readall"}
+
+
+    def __init__(self, client):
+        self.client = client
+
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+
+        if name in self.ASYNC_METHODS:
+            async def call_async(*args, **kwargs):
+                await asyncio.sleep(0)
+                return self.wrap(attribute(*args, **kwargs))
+            return call_async
+
+        return lambda *args, **kwargs: self.wrap(attribute(*args, **kwargs))
+
+
+    @staticmethod
+    def wrap(value):
+        """ Wrap clients returned by the fake client """
+        if value is None or isinstance(value, (bool, bytes, dict)):
+            return value
+        return FakeAsyncDataLakeClient(value)
+
+
+class TestAsyncIngestion(unittest.TestCase):
+    """ Test ingest_async """
+
+
+    def test_default_ingest_async(self):
+        """ Test ingestors without non-blocking I/O run in a batch """
+
+        writers = [StringStreamWriter() for _ in range(3)]
+        batch = Batch()
+        for i, writer in enumerate(writers):
+            batch.append_async(StringIngestor(f"data {i}", writer).ingest_async())
+        batch()
+
+        self.assertEqual([writer.value for writer in writers], ["data 0", "data 1", "data 2"])
+
+
+    @patch.object(AwsS3ConnectionSettings, "create_async_client")
+    def test_aws_s3_ingest_async(self, mock_create_async_client):
+        """ Test S3 to S3 copy with non-blocking I/O """
+
+        objects = {("bucket", "in.txt"): b"payload"}
+        mock_create_async_client.side_effect = lambda: FakeAsyncS3Client(objects)
+
+        ingestor = AwsS3Ingestor(
+            AwsS3ConnectionSettings("bucket", "in.txt"),
+            AwsS3StreamWriter(AwsS3ConnectionSettings("bucket", "out.txt")))
+        asyncio.run(ingestor.ingest_async())
+
+        self.assertEqual(objects[("bucket", "out.txt")], b"payload")
+
+
+    @patch.object(AwsS3ConnectionSettings, "create_async_client")
+    def test_aws_s3_shared_async_client(self, mock_create_async_client):
+        """ Test a batch of async copies shares the client passed in the connection settings """
+
+        objects = {("bucket", f"in/{i}.txt"): f"data {i}".encode("utf-8") for i in range(5)}
+        client = FakeAsyncS3Client(objects)
+
+        async def copy_all():
+            async with client:
+                await asyncio.gather(*[
+                    AwsS3Ingestor(
+                        AwsS3ConnectionSettings("bucket", f"in/{i}.txt", async_client=client),
+                        AwsS3StreamWriter(AwsS3ConnectionSettings(
+                            "bucket", f"out/{i}.txt", async_client=client))).ingest_async()
+                    for i in range(5)])
+
+        asyncio.run(copy_all())
+
+        mock_create_async_client.assert_not_called()
+        self.assertEqual(objects[("bucket", "out/3.txt")], b"data 3")
+
+
+    def test_aws_s3_write_async_multipart(self):
+        """ Test objects larger than a part are uploaded in parts, a few at a time """
+
+        payload = bytes(range(256)) * 40
+        client = FakeAsyncS3Client({})
+        writer = AwsS3StreamWriter(AwsS3ConnectionSettings(
+            "bucket", "out.bin", async_client=client,
+            transfer_config=AwsS3TransferConfig(chunk_size=1000, max_concurrency=3)))
+
+        class Stream(io.RawIOBase):
+            """ Stream counting the bytes read """
+            def __init__(self):
+                super().__init__()
+                self.stream = io.BytesIO(payload)
+                self.max_read = 0
+            def readable(self):
+                return True
+            def read(self, size=-1):
+                self.max_read = max(self.max_read, size)
+                return self.stream.read(size)
+
+        stream = Stream()
+        asyncio.run(writer.write_async(stream))
+
+        self.assertEqual(client.objects[("bucket", "out.bin")], payload)
+        self.assertEqual(stream.max_read, 1000)
+
+        asyncio.run(writer.write_async(io.BytesIO(b"small")))
+        self.assertEqual(client.objects[("bucket", "out.bin")], b"small")
+
+
+    def test_adfs_write_async_chunked(self):
+        """ Test files are appended in chunks with a shared client """
+
+        service_client = FakeDataLakeServiceClient()
+        settings = AdfsConnectionSettings(
+            container="container", directory="directory", file_name="out.bin",
+            transfer_config=AdfsTransferConfig(chunk_size=1000, max_concurrency=3),
+            async_client=FakeAsyncDataLakeClient(service_client))
+        payload = bytes(range(256)) * 40
+
+        asyncio.run(AdfsStreamWriter(settings).write_async(io.BytesIO(payload)))
+        self.assertEqual(
+            service_client.get_file_system_client("container").files["directory/out.bin"].content,
+            payload)
+
+        self.assertEqual(asyncio.run(AdfsStreamReader(settings).read_async()), payload)
+
+
+    @unittest.skipUnless(aiohttp, "aiohttp is not installed")
+    def test_http_ingest_async(self):
+        """ Test HTTP ingestion on one event loop """
+
+        async def ingest_all(url):
+            writers = [StringStreamWriter() for _ in range(20)]
+            async with aiohttp.ClientSession() as session:
+                await asyncio.gather(*[
+                    HttpIngestor(HttpRequest(url=f"{url}/{i}"), stream_writer=writer) \
+                        .with_async_session(session) \
+                        .ingest_async()
+                    for i, writer in enumerate(writers)])
+            return [json.loads(writer.value)["path"] for writer in writers]
+
+        with local_http_server(EchoHandler) as url:
+            result = asyncio.run(ingest_all(url))
+
+        self.assertEqual(result, [f"/{i}" for i in range(20)])
+
+
+    @patch.object(HttpIngestor, "_ingest_async", side_effect=AssertionError("not in executor"))
+    def test_http_ingest_async_executor(self, _):
+        """ Test HTTP ingestion that resumes or emits metrics runs in the executor """
+
+        events = []
+        for name, configure in (
+                ("resume", lambda ingestor: ingestor.with_resume(MemoryCheckpoint())),
+                ("metrics", lambda ingestor: ingestor.with_metrics(events.append))):
+            with self.subTest(name):
+                writer = StringStreamWriter()
+                with local_http_server(EchoHandler) as url:
+                    asyncio.run(configure(
+                        HttpIngestor(HttpRequest(url=f"{url}/{name}"), stream_writer=writer)) \
+                        .ingest_async())
+
+                self.assertEqual(json.loads(writer.value)["path"], f"/{name}")
+
+        self.assertTrue(events)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+""" Test AwsS3Checkpoint """
+
+import hashlib
+import io
+import unittest
+from unittest.mock import patch, MagicMock
+
+from botocore.exceptions import ClientError
+
+from xcputils.checkpoints.aws import AwsS3Checkpoint
+from xcputils.streaming.aws import AwsS3ConnectionSettings
+
+
+def mock_s3_conditional_client(objects: dict) -> MagicMock:
+    """ Compose mock S3 client storing objects, with conditional PUTs on ETags """
+
+    client = MagicMock()
+
+    def etag(key: str) -> str:
+        return f'"{hashlib.md5(objects[key]).hexdigest()}"'
+
+    def error(code: str, operation: str) -> ClientError:
+        return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+    def get_object(Bucket, Key): # pylint: disable=invalid-name,unused-argument
+        if Key not in objects:
+            raise error("NoSuchKey", "GetObject")
+        return {"Body": io.BytesIO(objects[Key]), "ETag": etag(Key)}
+
+    def put_object(Bucket, Key, Body, IfMatch=None, IfNoneMatch=None): # pylint: disable=invalid-name,unused-argument
+        if IfNoneMatch == "*" and Key in objects:
+            raise error("PreconditionFailed", "PutObject")
+        if IfMatch is not None and (Key not in objects or etag(Key) != IfMatch):
+            raise error("PreconditionFailed", "PutObject")
+        objects[Key] = Body
+        return {"ETag": etag(Key)}
+
+    client.get_object.side_effect = get_object
+    client.put_object.side_effect = put_object
+    return client
+
+
+class TestAwsS3Checkpoint(unittest.TestCase):
+    """ Test xcputils.checkpoints.aws.AwsS3Checkpoint """
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_get(self, mock_get_client):
+        """ Test get returns default if the object is missing and raises other errors """
+
+        mock_get_client.return_value = mock_s3_conditional_client({})
+        checkpoint = AwsS3Checkpoint(name="test", bucket="bucket", directory="checkpoints")
+
+        self.assertEqual(checkpoint.get(default="default"), "default")
+
+        mock_get_client.return_value.get_object.side_effect = ClientError(
+            {"Error": {"Code": "AccessDenied", "Message": "Access Denied"}}, "GetObject")
+        with self.assertRaises(ClientError):
+            checkpoint.get(default="default", refresh=True)
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_get_cached(self, mock_get_client):
+        """ Test get does not read the object again after it was written """
+
+        client = mock_s3_conditional_client({})
+        mock_get_client.return_value = client
+        checkpoint = AwsS3Checkpoint(name="test", bucket="bucket", directory="checkpoints")
+
+        checkpoint.set("1")
+        self.assertEqual(checkpoint.get(), "1")
+        self.assertEqual(checkpoint.get(), "1")
+
+        client.get_object.assert_not_called()
+        self.assertEqual(client.put_object.call_args.kwargs["Key"], "checkpoints/test.json")
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_compare_and_set(self, mock_get_client):
+        """ Test compare_and_set writes conditionally on the ETag it read """
+
+        objects = {}
+        client = mock_s3_conditional_client(objects)
+        mock_get_client.return_value = client
+        checkpoint = AwsS3Checkpoint(name="test", bucket="bucket", directory="checkpoints")
+        other = AwsS3Checkpoint(name="test", bucket="bucket", directory="checkpoints")
+
+        self.assertTrue(checkpoint.compare_and_set(None, "1"))
+        self.assertEqual(client.put_object.call_args.kwargs["IfNoneMatch"], "*")
+
+        self.assertEqual(other.get(), "1")
+        self.assertTrue(other.compare_and_set("1", "2"))
+        self.assertEqual(
+            client.put_object.call_args.kwargs["IfMatch"], f'"{hashlib.md5(b"1").hexdigest()}"')
+
+        self.assertFalse(checkpoint.compare_and_set("1", "3"))
+        self.assertEqual(objects["checkpoints/test.json"], b"2")
+        self.assertEqual(checkpoint.get(), "2")
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_compare_and_set_conflict(self, mock_get_client):
+        """ Test compare_and_set fails if the object changed after it was read """
+
+        objects = {}
+        mock_get_client.return_value = mock_s3_conditional_client(objects)
+        checkpoint = AwsS3Checkpoint(name="test", bucket="bucket", directory="checkpoints")
+
+        checkpoint.set("1")
+        objects["checkpoints/test.json"] = b"2"
+
+        self.assertFalse(checkpoint.compare_and_set("1", "3"))
+        self.assertEqual(objects["checkpoints/test.json"], b"2")
+        self.assertEqual(checkpoint.get(), "2")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+""" Test AwsS3Ingestor """
+
+import io
+import os
+import shutil
+import unittest
+from unittest.mock import patch, MagicMock
+
+from xcputils.ingestion.aws import AwsS3Ingestor
+from xcputils.streaming.aws import AwsS3ConnectionSettings, AwsS3StreamReader, AwsS3StreamWriter, \
+    AwsS3TransferConfig
+
+
+def mock_s3_client(payload: bytes) -> MagicMock:
+    """ Compose mock S3 client serving ranged GETs of payload """
+
+    client = MagicMock()
+    client.head_object.return_value = {"ContentLength": len(payload), "ETag": '"1"'}
+
+    def get_object(Bucket, Key, Range): # pylint: disable=invalid-name,unused-argument
+        start, end = Range.replace("bytes=", "").split("-")
+        return {"Body": io.BytesIO(payload[int(start):int(end) + 1])}
+
+    client.get_object.side_effect = get_object
+    return client
+
+
+def mock_s3_bucket(objects: dict, page_size: int, events: list) -> MagicMock:
+    """ Compose mock S3 client listing objects page_size keys per page, recording events """
+
+    client = MagicMock()
+
+    def paginate(Bucket, Prefix): # pylint: disable=invalid-name,unused-argument
+        keys = sorted(key for key in objects if key.startswith(Prefix))
+        for i in range(0, len(keys), page_size):
+            events.append(f"page {i // page_size + 1}")
+            yield {"Contents": [{"Key": key, "ETag": '"1"'} for key in keys[i:i + page_size]]}
+
+    def head_object(Bucket, Key): # pylint: disable=invalid-name,unused-argument
+        return {"ContentLength": len(objects[Key])}
+
+    def get_object(Bucket, Key, Range): # pylint: disable=invalid-name,unused-argument
+        events.append(f"get {Key}")
+        start, end = Range.replace("bytes=", "").split("-")
+        return {"Body": io.BytesIO(objects[Key][int(start):int(end) + 1])}
+
+    client.get_paginator.return_value.paginate.side_effect = paginate
+    client.head_object.side_effect = head_object
+    client.get_object.side_effect = get_object
+    return client
+
+
+class TestAwsS3Ingestor(unittest.TestCase):
+    """ Test xcputils.ingestion.aws.AwsS3Ingestor """
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_ingest_streaming(self, mock_get_client):
+        """ Test ingest streams ranged GETs through a bounded buffer """
+
+        payload = "".join(f"line {i}\n" for i in range(3000)).encode("utf-8")
+        client = mock_s3_client(payload)
+        mock_get_client.return_value = client
+
+        result = AwsS3Ingestor(
+            AwsS3ConnectionSettings(bucket="bucket", file_path="test.bin"),
+            chunk_size=1000,
+            buffer_size=2000,
+            ).write_to_string()
+
+        self.assertEqual(result, payload.decode("utf-8"))
+        self.assertEqual(client.get_object.call_count, (len(payload) + 999) // 1000)
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_ingest_prefix(self, mock_get_client):
+        """ Test objects under prefix matching pattern are copied to their relative paths """
+
+        objects = {
+            "data/2024/a.csv": b"a",
+            "data/2024/b.json": b"b",
+            "data/2024/sub/c.csv": b"c",
+            "data/2025/d.csv": b"d",
+            "data/2024/": b"",
+            }
+        mock_get_client.return_value = mock_s3_bucket(objects, page_size=2, events=[])
+        directory = "./test_prefix"
+
+        try:
+            AwsS3Ingestor(
+                AwsS3ConnectionSettings(bucket="bucket", file_path=None),
+                prefix="data/2024/",
+                pattern="*.csv",
+                max_concurrency=4,
+                ).write_to_file(directory)
+
+            copied = sorted(
+                os.path.relpath(os.path.join(root, name), directory)
+                for root, _, names in os.walk(directory)
+                for name in names)
+            self.assertEqual(copied, ["a.csv", os.path.join("sub", "c.csv")])
+            with open(f"{directory}/sub/c.csv", "rb") as file:
+                self.assertEqual(file.read(), b"c")
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client", autospec=True)
+    def test_read_concurrency(self, mock_get_client):
+        """ Test readers use a small window and the pool fits every ranged GET of the ingest """
+
+        settings = AwsS3ConnectionSettings(bucket="bucket", file_path=None)
+        self.assertEqual(AwsS3StreamReader(settings).max_concurrency, 2)
+        self.assertEqual(AwsS3StreamReader(AwsS3ConnectionSettings(
+            bucket="bucket", file_path=None,
+            transfer_config=AwsS3TransferConfig(use_threads=False))).max_concurrency, 1)
+
+        client = mock_s3_bucket({f"data/{i}.txt": b"x" for i in range(4)}, page_size=2, events=[])
+        pool_sizes = set()
+        mock_get_client.side_effect = \
+            lambda settings: pool_sizes.add(settings.max_pool_connections) or client
+
+        AwsS3Ingestor(settings, prefix="data/", max_concurrency=8, read_concurrency=4) \
+            .write_to_string()
+
+        self.assertEqual(pool_sizes, {32})
+        self.assertEqual(settings.max_pool_connections, 10)
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_ingest_prefix_pipelined(self, mock_get_client):
+        """ Test the first object is copied before listing has finished """
+
+        objects = {f"data/{i}.txt": str(i).encode("utf-8") for i in range(6)}
+        events = []
+        mock_get_client.return_value = mock_s3_bucket(objects, page_size=2, events=events)
+
+        result = AwsS3Ingestor(
+            AwsS3ConnectionSettings(bucket="bucket", file_path=None),
+            prefix="data/",
+            ).write_to_string()
+
+        self.assertEqual(sorted(result.split("\n")), [str(i) for i in range(6)])
+        self.assertLess(events.index("get data/0.txt"), events.index("page 2"))
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client", autospec=True)
+    def test_ingest_server_side_copy(self, mock_get_client):
+        """ Test S3 to S3 with the same identity copies server-side, else streams """
+
+        clients = {key: mock_s3_client(b"content") for key in ("a", "b")}
+        mock_get_client.side_effect = lambda settings: clients[settings.aws_access_key_id]
+        uploaded = {}
+        clients["b"].upload_fileobj.side_effect = \
+            lambda stream, bucket, key, Config: uploaded.update({key: stream.read()}) # pylint: disable=invalid-name
+
+        def ingest(target_key_id: str):
+            AwsS3Ingestor(
+                AwsS3ConnectionSettings(
+                    bucket="source", file_path="in.txt", aws_access_key_id="a"),
+                stream_writer=AwsS3StreamWriter(AwsS3ConnectionSettings(
+                    bucket="target", file_path="out.txt", aws_access_key_id=target_key_id)),
+                ).ingest()
+
+        ingest("a")
+        clients["a"].copy.assert_called_once()
+        self.assertEqual(
+            {key: value for key, value in clients["a"].copy.call_args.kwargs.items() if key != "Config"},
+            {"CopySource": {"Bucket": "source", "Key": "in.txt"}, "Bucket": "target", "Key": "out.txt"})
+        clients["a"].get_object.assert_not_called()
+
+        ingest("b")
+        clients["b"].copy.assert_not_called()
+        self.assertEqual(uploaded, {"out.txt": b"content"})
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_ingest_prefix_server_side_copy(self, mock_get_client):
+        """ Test a prefix copied with a larger pool than the writer still copies server-side """
+
+        client = mock_s3_bucket({"data/a.txt": b"a", "data/b.txt": b"b"}, page_size=2, events=[])
+        mock_get_client.return_value = client
+
+        AwsS3Ingestor(
+            AwsS3ConnectionSettings(bucket="source", file_path=None, aws_access_key_id="a"),
+            stream_writer=AwsS3StreamWriter(AwsS3ConnectionSettings(
+                bucket="target", file_path="out", aws_access_key_id="a")),
+            prefix="data/",
+            max_concurrency=8,
+            ).ingest()
+
+        self.assertEqual(
+            sorted(call.kwargs["Key"] for call in client.copy.call_args_list),
+            ["out/a.txt", "out/b.txt"])
+        client.get_object.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
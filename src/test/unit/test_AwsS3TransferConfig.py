@@ -0,0 +1,72 @@
+""" Test AwsS3TransferConfig """
+
+import io
+import unittest
+from unittest.mock import patch, MagicMock
+
+from xcputils.streaming.aws import (
+    AwsS3ConnectionSettings, AwsS3StreamReader, AwsS3StreamWriter, AwsS3TransferConfig)
+
+
+MIB = 1024 * 1024
+
+
+class TestAwsS3TransferConfig(unittest.TestCase):
+    """ Test xcputils.streaming.aws.AwsS3TransferConfig """
+
+
+    def test_chunk_size(self):
+        """ Test part size adapts to content length within limits """
+
+        config = AwsS3TransferConfig(max_concurrency=10)
+
+        self.assertEqual(config.get_chunk_size(), 8 * MIB)
+        self.assertEqual(config.get_chunk_size(10 * MIB), 8 * MIB)
+        self.assertEqual(config.get_chunk_size(800 * MIB), 20 * MIB)
+        self.assertEqual(config.get_chunk_size(100 * 1024 * MIB), 64 * MIB)
+        self.assertEqual(config.get_chunk_size(1024 * 1024 * MIB), 1024 * 1024 * MIB // 10000 + 1)
+        self.assertEqual(AwsS3TransferConfig(chunk_size=5 * MIB).get_chunk_size(800 * MIB), 5 * MIB)
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_write_config(self, mock_get_client):
+        """ Test writer passes per connection configuration sized to the stream """
+
+        client = MagicMock()
+        mock_get_client.return_value = client
+        settings = AwsS3ConnectionSettings(
+            bucket="bucket",
+            file_path="test.bin",
+            transfer_config=AwsS3TransferConfig(
+                multipart_threshold=16 * MIB, max_concurrency=2, use_threads=False))
+
+        AwsS3StreamWriter(settings).write(io.BytesIO(bytes(800 * 1024)))
+
+        config = client.upload_fileobj.call_args.kwargs["Config"]
+        self.assertEqual(config.multipart_threshold, 16 * MIB)
+        self.assertEqual(config.multipart_chunksize, 8 * MIB)
+        self.assertEqual(config.max_request_concurrency, 2)
+        self.assertFalse(config.use_threads)
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_read_config(self, mock_get_client):
+        """ Test reader passes per connection configuration without an extra HEAD request """
+
+        client = MagicMock()
+        mock_get_client.return_value = client
+        settings = AwsS3ConnectionSettings(
+            bucket="bucket",
+            file_path="test.bin",
+            transfer_config=AwsS3TransferConfig(chunk_size=16 * MIB, max_concurrency=16))
+
+        AwsS3StreamReader(settings).read(io.BytesIO())
+
+        config = client.download_fileobj.call_args.kwargs["Config"]
+        self.assertEqual(config.multipart_chunksize, 16 * MIB)
+        self.assertEqual(config.max_request_concurrency, 16)
+        client.head_object.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()
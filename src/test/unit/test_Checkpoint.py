@@ -0,0 +1,61 @@
+""" Test Checkpoint """
+
+import json
+import unittest
+
+from xcputils.checkpoints import Checkpoint, ManifestCheckpoint, OffsetCheckpoint
+
+
+class MemoryCheckpoint(Checkpoint):
+    """ Checkpoint overriding only get and set, without calling the base constructor """
+
+    def __init__(self): # pylint: disable=super-init-not-called
+        self.value = None
+
+
+    def get(self, default: str = None, refresh: bool = False) -> str:
+        return self.value if self.value else default
+
+
+    def set(self, value: str):
+        self.value = value
+
+
+class TestCheckpoint(unittest.TestCase):
+    """ Test xcputils.checkpoints.Checkpoint """
+
+
+    def test_get_set_subclass(self):
+        """ Test manifests and offsets fall back to set for subclasses without _read and _write """
+
+        checkpoint = MemoryCheckpoint()
+        self.assertFalse(checkpoint.supports_compare_and_set())
+
+        manifest = ManifestCheckpoint(checkpoint)
+        manifest.update("a", "1")
+        manifest.save()
+        manifest.update("b", "2")
+        manifest.save()
+        self.assertEqual(json.loads(checkpoint.value), {"a": "1", "b": "2"})
+
+        offsets = OffsetCheckpoint(checkpoint, interval=1)
+        offsets.set("c", 10)
+        self.assertEqual(OffsetCheckpoint(checkpoint).get("c"), 10)
+        self.assertIsNone(OffsetCheckpoint(checkpoint).get_version("c"))
+
+        offsets.set_version("c", '"1"')
+        offsets.set("c", 20)
+        self.assertEqual(OffsetCheckpoint(checkpoint).get("c"), 20)
+        self.assertEqual(OffsetCheckpoint(checkpoint).get_version("c"), '"1"')
+
+
+    def test_state_lock_without_constructor(self):
+        """ Test the state lock is created on first use """
+
+        checkpoint = MemoryCheckpoint()
+        with checkpoint._state_lock: # pylint: disable=protected-access
+            self.assertIs(checkpoint._state_lock, checkpoint._state_lock) # pylint: disable=protected-access
+
+
+if __name__ == '__main__':
+    unittest.main()
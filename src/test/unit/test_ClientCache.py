@@ -0,0 +1,196 @@
+""" Test client caching """
+
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+
+from xcputils.streaming.aws import AwsS3ConnectionSettings
+from xcputils.streaming.az import AdfsConnectionSettings
+from xcputils.streaming.cache import ClientCache
+
+
+class TestClientCache(unittest.TestCase):
+    """ Test xcputils.streaming.cache.ClientCache """
+
+
+    def test_get(self):
+        """ Test clients are reused per key until they expire """
+
+        cache = ClientCache()
+        created = []
+        factory = lambda: created.append(object()) or created[-1]
+
+        first = cache.get("a", factory)
+        self.assertIs(cache.get("a", factory), first)
+        self.assertIsNot(cache.get("b", factory), first)
+
+        cache.evict("a")
+        self.assertIsNot(cache.get("a", factory), first)
+
+        expired = cache.get("c", factory, ttl=0)
+        self.assertIsNot(cache.get("c", factory), expired)
+        self.assertEqual(len(created), 5)
+
+
+    def test_get_concurrent(self):
+        """ Test a slow client does not block other keys and is created once per key """
+
+        cache = ClientCache()
+        started = threading.Event()
+        release = threading.Event()
+        created = []
+
+        def slow_factory():
+            created.append("slow")
+            started.set()
+            release.wait(5)
+            return "slow"
+
+        threads = [threading.Thread(target=cache.get, args=("slow", slow_factory)) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        self.assertTrue(started.wait(5))
+
+        self.assertEqual(cache.get("fast", lambda: "fast"), "fast")
+
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(created, ["slow"])
+
+
+    def test_sweep(self):
+        """ Test expired clients are dropped when a client is added """
+
+        cache = ClientCache()
+        cache.get("a", object, ttl=0)
+        cache.get("b", object)
+
+        self.assertNotIn("a", cache._clients) # pylint: disable=protected-access
+        self.assertIn("b", cache._clients) # pylint: disable=protected-access
+
+
+    def test_evict_client(self):
+        """ Test eviction of a given client keeps a client created since """
+
+        cache = ClientCache()
+        first = cache.get("a", object)
+        cache.evict("a", first)
+        second = cache.get("a", object)
+
+        cache.evict("a", first)
+        self.assertIs(cache.get("a", object), second)
+
+
+    def test_aws_s3_client(self):
+        """ Test S3 clients are shared by connections with the same identity """
+
+        settings = AwsS3ConnectionSettings(
+            bucket="bucket1",
+            file_path="a.txt",
+            aws_access_key_id="key",
+            aws_secret_access_key="secret",
+            aws_region_name="eu-west-1",
+            max_pool_connections=25)
+        client = settings.get_client()
+
+        self.assertIs(
+            AwsS3ConnectionSettings(
+                bucket="bucket2",
+                file_path="b.txt",
+                aws_access_key_id="key",
+                aws_secret_access_key="secret",
+                aws_region_name="eu-west-1",
+                max_pool_connections=25).get_client(),
+            client)
+        self.assertEqual(client.meta.config.max_pool_connections, 25)
+
+        self.assertIsNot(
+            AwsS3ConnectionSettings(
+                bucket="bucket1",
+                file_path="a.txt",
+                aws_access_key_id="other key",
+                aws_secret_access_key="secret",
+                aws_region_name="eu-west-1",
+                max_pool_connections=25).get_client(),
+            client)
+
+        settings.evict_client()
+        self.assertIsNot(settings.get_client(), client)
+
+
+    def test_aws_s3_client_expired_credentials(self):
+        """ Test S3 clients are evicted when a call fails because the credentials expired """
+
+        settings = AwsS3ConnectionSettings(
+            bucket="bucket",
+            file_path="a.txt",
+            aws_access_key_id="expiring key",
+            aws_secret_access_key="secret",
+            aws_region_name="eu-west-1")
+        client = settings.get_client()
+
+        with Stubber(client) as stubber:
+            stubber.add_client_error("head_object", service_error_code="NoSuchKey")
+            stubber.add_client_error("head_object", service_error_code="ExpiredToken")
+
+            with self.assertRaises(ClientError):
+                client.head_object(Bucket="bucket", Key="a.txt")
+            self.assertIs(settings.get_client(), client)
+
+            with self.assertRaises(ClientError):
+                client.head_object(Bucket="bucket", Key="a.txt")
+            self.assertIsNot(settings.get_client(), client)
+
+
+    @patch("azure.identity.DefaultAzureCredential")
+    def test_adfs_client(self, mock_credential):
+        """ Test ADFS clients and credentials are shared by connections with the same identity """
+
+        settings = AdfsConnectionSettings(
+            container="container", file_name="a.txt", directory="dir",
+            storage_account_name="account1")
+        client = settings.get_client()
+
+        self.assertIs(
+            AdfsConnectionSettings(
+                container="other", file_name="b.txt", directory="dir",
+                storage_account_name="account1").get_client(),
+            client)
+        self.assertIsNot(
+            AdfsConnectionSettings(
+                container="container", file_name="a.txt", directory="dir",
+                storage_account_name="account2").get_client(),
+            client)
+        self.assertEqual(mock_credential.call_count, 2)
+
+
+    @patch("azure.identity.DefaultAzureCredential")
+    def test_adfs_client_expired_credentials(self, _):
+        """ Test ADFS clients are evicted when a call fails to authenticate """
+
+        settings = AdfsConnectionSettings(
+            container="container", file_name="a.txt", directory="dir",
+            storage_account_name="expiring")
+        client = settings.get_client()
+        blob_service_client = settings.get_blob_service_client()
+        hook = settings._create_eviction_hook(settings.get_client_key()) # pylint: disable=protected-access
+
+        response = MagicMock()
+        response.http_response.status_code = 404
+        response.http_response.headers = {"x-ms-error-code": "PathNotFound"}
+        hook(response)
+        self.assertIs(settings.get_client(), client)
+
+        response.http_response.status_code = 403
+        response.http_response.headers = {"x-ms-error-code": "AuthenticationFailed"}
+        hook(response)
+        self.assertIsNot(settings.get_client(), client)
+        self.assertIsNot(settings.get_blob_service_client(), blob_service_client)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+""" Test FileCheckpoint """
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from xcputils.checkpoints import ManifestCheckpoint
+from xcputils.checkpoints.file import FileCheckpoint
+
+
+class TestFileCheckpoint(unittest.TestCase):
+    """ Test xcputils.checkpoints.file.FileCheckpoint """
+
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_set_replaces_file(self):
+        """ Test set writes a temporary file in the same folder and renames it """
+
+        checkpoint = FileCheckpoint(name="test", directory=f"{self.directory}/nested")
+        checkpoint.set("1")
+
+        with patch("os.replace", wraps=os.replace) as mock_replace:
+            checkpoint.set("2")
+
+        source, target = mock_replace.call_args.args
+        self.assertEqual(os.path.dirname(source), f"{self.directory}/nested")
+        self.assertEqual(target, checkpoint.file_path)
+        self.assertEqual(os.listdir(f"{self.directory}/nested"), ["test.json"])
+        self.assertEqual(FileCheckpoint(name="test", directory=f"{self.directory}/nested").get(), "2")
+
+
+    def test_failed_set_keeps_value(self):
+        """ Test a failed write leaves the previous value and no temporary file """
+
+        checkpoint = FileCheckpoint(name="test", directory=self.directory)
+        checkpoint.set("1")
+
+        with patch("os.fsync", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                checkpoint.set("2")
+
+        self.assertEqual(os.listdir(self.directory), ["test.json"])
+        self.assertEqual(checkpoint.get(refresh=True), "1")
+
+
+    def test_get(self):
+        """ Test get returns default only if the checkpoint is missing or empty """
+
+        checkpoint = FileCheckpoint(name="test", directory=self.directory)
+        self.assertEqual(checkpoint.get(default="default"), "default")
+
+        checkpoint.reset()
+        self.assertEqual(checkpoint.get(default="default"), "default")
+
+        os.remove(checkpoint.file_path)
+        os.mkdir(checkpoint.file_path)
+        with self.assertRaises(OSError):
+            checkpoint.get(default="default", refresh=True)
+
+
+    def test_get_cached(self):
+        """ Test get returns the value last read or written until refresh """
+
+        checkpoint = FileCheckpoint(name="test", directory=self.directory)
+        checkpoint.set("1")
+        FileCheckpoint(name="test", directory=self.directory).set("2")
+
+        with patch("builtins.open") as mock_open:
+            self.assertEqual(checkpoint.get(), "1")
+        mock_open.assert_not_called()
+
+        self.assertEqual(checkpoint.get(refresh=True), "2")
+
+
+    def test_compare_and_set(self):
+        """ Test compare_and_set writes only if the checkpoint still has the expected value """
+
+        checkpoint = FileCheckpoint(name="test", directory=self.directory)
+        other = FileCheckpoint(name="test", directory=self.directory)
+
+        self.assertTrue(checkpoint.compare_and_set(None, "1"))
+        self.assertFalse(other.compare_and_set(None, "2"))
+        self.assertEqual(other.get(), "1")
+
+        self.assertTrue(other.compare_and_set("1", "2"))
+        self.assertFalse(checkpoint.compare_and_set("1", "3"))
+        self.assertEqual(checkpoint.get(), "2")
+
+
+    def test_compare_and_set_concurrent(self):
+        """ Test concurrent increments are not lost """
+
+        def increment():
+            checkpoint = FileCheckpoint(name="counter", directory=self.directory)
+            for _ in range(20):
+                while True:
+                    value = checkpoint.get()
+                    if checkpoint.compare_and_set(value, str(int(value or 0) + 1)):
+                        break
+
+        threads = [threading.Thread(target=increment) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(FileCheckpoint(name="counter", directory=self.directory).get(), "80")
+
+
+    def test_manifest_merges_concurrent_save(self):
+        """ Test manifest save keeps versions saved by another run since it was loaded """
+
+        first = ManifestCheckpoint(FileCheckpoint(name="manifest", directory=self.directory))
+        second = ManifestCheckpoint(FileCheckpoint(name="manifest", directory=self.directory))
+        self.assertIsNone(first.get("a"))
+        self.assertIsNone(second.get("b"))
+
+        first.update("a", "1")
+        first.save()
+        second.update("b", "2")
+        second.save()
+
+        manifest = ManifestCheckpoint(FileCheckpoint(name="manifest", directory=self.directory))
+        self.assertEqual((manifest.get("a"), manifest.get("b")), ("1", "2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
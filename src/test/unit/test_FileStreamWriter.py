@@ -1,14 +1,36 @@
 """ Test File Ingestion """
 
 import datetime
-from io import BytesIO
+from io import BytesIO, RawIOBase
 import os
+import tracemalloc
 import unittest
 from xcputils.ingestion.file import FileIngestor
 
 from xcputils.streaming.file import FileStreamWriter
 
 
+ZERO_BLOCK = bytes(1024 * 1024)
+
+
+class ZeroStream(RawIOBase):
+    """ Non-seekable stream of zero bytes that allocates nothing per read """
+
+    def __init__(self, size: int):
+        super().__init__()
+        self.remaining = size
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def readinto(self, buffer) -> int:
+        size = min(len(buffer), self.remaining)
+        buffer[:size] = memoryview(ZERO_BLOCK)[:size]
+        self.remaining -= size
+        return size
+
 
 class TestStringStreamWriter(unittest.TestCase):
     """ Test FileStreamWriter """
@@ -18,7 +40,9 @@ class TestStringStreamWriter(unittest.TestCase):
 
 
     def tearDown(self):
-        os.remove(self.file_path)
+        for file_path in [self.file_path, self.file_path + ".copy"]:
+            if os.path.exists(file_path):
+                os.remove(file_path)
 
 
     def test_write(self):
@@ -35,3 +59,38 @@ class TestStringStreamWriter(unittest.TestCase):
         result = FileIngestor(self.file_path).write_to_string()
 
         self.assertEqual(result, payload)
+
+
+    def test_write_file(self):
+        """ Test write from a real file """
+
+        payload = f"Testing.\n123.\næøåÆØÅ\n{datetime.datetime.now()}" * 1000
+        with open(self.file_path, "w", encoding="utf-8") as file:
+            file.write(payload)
+
+        writer = FileStreamWriter(self.file_path + ".copy", buffer_size=1000)
+        with open(self.file_path, "rb") as stream:
+            stream.read(9)
+            writer.write(stream)
+            self.assertEqual(stream.read(), b"")
+
+        with open(self.file_path + ".copy", "rb") as file:
+            self.assertEqual(file.read(), payload.encode("utf-8")[9:])
+
+
+    def test_write_bounded_memory(self):
+        """ Test write of a multi-GB stream runs in bounded memory """
+
+        size = 2 * 1024 * 1024 * 1024
+        buffer_size = 1024 * 1024
+        stream = ZeroStream(size)
+
+        tracemalloc.start()
+        try:
+            FileStreamWriter(os.devnull, buffer_size=buffer_size).write(stream)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(stream.remaining, 0)
+        self.assertLess(peak, 4 * buffer_size)
@@ -0,0 +1,191 @@
+""" Unit tests """
+
+from ftplib import error_perm
+import os
+import shutil
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from xcputils.ingestion.ftp import FtpIngestor
+
+
+class FakeFtp:
+    """ In-memory stand-in for ftplib.FTP """
+
+    files = {}
+    directories = set()
+    supports_mlsd = True
+    lock = threading.Lock()
+    connections = []
+    active = [0, 0]
+    failing = set()
+    quit_error = None
+
+
+    def __init__(self, host, user, passwd): # pylint: disable=unused-argument
+        self.commands = []
+        self.transfers = []
+        self.closed = False
+        with self.lock:
+            self.connections.append(self)
+
+
+    def cwd(self, folder): # pylint: disable=unused-argument
+        """ Change directory """
+
+
+    def mlsd(self, facts=None): # pylint: disable=unused-argument
+        """ List directory with facts """
+        self.commands.append("MLSD")
+        if not self.supports_mlsd:
+            raise error_perm("500 Unknown command")
+        for name in self.directories:
+            yield name, {"type": "dir"}
+        for name, data in self.files.items():
+            yield name, {"type": "file", "size": str(len(data))}
+
+
+    def nlst(self):
+        """ List names """
+        self.commands.append("NLST")
+        return list(self.directories) + list(self.files)
+
+
+    def size(self, name):
+        """ File size """
+        self.commands.append("SIZE")
+        if name in self.directories:
+            raise error_perm("550 Not a file")
+        return len(self.files[name])
+
+
+    def retrbinary(self, cmd, callback, blocksize=8192, rest=None): # pylint: disable=unused-argument
+        """ Download file """
+        name = cmd[len("RETR "):]
+        if self.closed:
+            raise EOFError("Connection closed")
+        self.transfers.append(name)
+        with self.lock:
+            self.active[0] += 1
+            self.active[1] = max(self.active)
+        time.sleep(0.02)
+        if name in self.failing:
+            with self.lock:
+                self.active[0] -= 1
+            raise ConnectionResetError("Connection reset by peer")
+        data = self.files[name]
+        for i in range(0, len(data), blocksize):
+            callback(data[i:i + blocksize])
+        with self.lock:
+            self.active[0] -= 1
+
+
+    def quit(self):
+        """ Close connection politely """
+        if self.quit_error:
+            raise self.quit_error
+        self.closed = True
+
+
+    def close(self):
+        """ Close connection """
+        self.closed = True
+
+
+class TestFtpIngestor(unittest.TestCase):
+    """ Test xcputils.ingestion.ftp.FtpIngestor """
+
+    def setUp(self):
+        FakeFtp.files = {f"file{i}.txt": f"content {i}".encode("utf-8") for i in range(10)}
+        FakeFtp.directories = {"folder"}
+        FakeFtp.supports_mlsd = True
+        FakeFtp.connections = []
+        FakeFtp.active = [0, 0]
+        FakeFtp.failing = set()
+        FakeFtp.quit_error = None
+        self.download_path = "./test_ftp_download"
+        os.makedirs(self.download_path, exist_ok=True)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.download_path)
+
+
+    @patch("xcputils.ingestion.ftp.FTP", FakeFtp)
+    def test_ingest_parallel(self):
+        """ Test parallel download over a pool of connections, listing with MLSD """
+
+        FtpIngestor(url="ftp.mock.com", max_connections=4).write_to_file(self.download_path)
+
+        self.assertEqual(sorted(os.listdir(self.download_path)), sorted(FakeFtp.files))
+        for name, data in FakeFtp.files.items():
+            with open(os.path.join(self.download_path, name), "rb") as file:
+                self.assertEqual(file.read(), data)
+
+        self.assertLessEqual(len(FakeFtp.connections), 4)
+        self.assertGreater(FakeFtp.active[1], 1)
+        self.assertEqual(FakeFtp.connections[0].commands, ["MLSD"])
+
+
+    @patch("xcputils.ingestion.ftp.FTP", FakeFtp)
+    def test_ingest_without_mlsd(self):
+        """ Test listing falls back to NLST and SIZE """
+
+        FakeFtp.supports_mlsd = False
+
+        result = FtpIngestor(url="ftp.mock.com", file_name="FILE3.txt").write_to_string()
+
+        self.assertEqual(result, "content 3")
+        self.assertEqual(FakeFtp.connections[0].commands[:2], ["MLSD", "NLST"])
+
+
+    @patch("xcputils.ingestion.ftp.FTP", FakeFtp)
+    def test_ingest_blocks(self):
+        """ Test a file received in many blocks is written as one stream """
+
+        FakeFtp.files = {"big.bin": os.urandom(100000)}
+
+        FtpIngestor(url="ftp.mock.com", blocksize=1000, buffer_size=4000) \
+            .write_to_file(self.download_path)
+
+        with open(os.path.join(self.download_path, "big.bin"), "rb") as file:
+            self.assertEqual(file.read(), FakeFtp.files["big.bin"])
+
+
+
+    @patch("xcputils.ingestion.ftp.FTP", FakeFtp)
+    def test_ingest_parallel_error(self):
+        """ Test the first failed download cancels queued downloads and its connection is closed
+        instead of being reused """
+
+        FakeFtp.files = {f"file{i:02}.txt": b"content" for i in range(40)}
+        FakeFtp.failing = {"file00.txt"}
+
+        with self.assertRaises(ConnectionResetError):
+            FtpIngestor(url="ftp.mock.com", max_connections=2).write_to_file(self.download_path)
+
+        retrieved = [name for connection in FakeFtp.connections for name in connection.transfers]
+        self.assertLess(len(retrieved), len(FakeFtp.files))
+        failed = next(
+            connection for connection in FakeFtp.connections
+            if "file00.txt" in connection.transfers)
+        self.assertEqual(failed.transfers[-1], "file00.txt")
+        self.assertTrue(all(connection.closed for connection in FakeFtp.connections))
+
+
+    @patch("xcputils.ingestion.ftp.FTP", FakeFtp)
+    def test_ingest_error_quit_fails(self):
+        """ Test a failing QUIT falls back to close and does not hide the download error """
+
+        FakeFtp.files = {"a.txt": b"a", "b.txt": b"b"}
+        FakeFtp.failing = {"a.txt"}
+        FakeFtp.quit_error = EOFError("Connection closed")
+
+        with self.assertRaises(ConnectionResetError):
+            FtpIngestor(url="ftp.mock.com", max_connections=2).write_to_file(self.download_path)
+        self.assertTrue(all(connection.closed for connection in FakeFtp.connections))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,245 @@
+""" Unit tests """
+
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler
+import json
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+from test.unit import local_http_server, mock_response
+import requests
+from requests import Session
+from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.ingestion.retry import RateLimiter, RetryPolicy
+from xcputils.metrics import TransferEvent
+from xcputils.streaming.string import StringStreamWriter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+def throttled_response(status=429, retry_after=None):
+    """ Compose mock response asking to retry later """
+
+    response = mock_response(status=status, content="")
+    response.headers = {"Retry-After": retry_after} if retry_after is not None else {}
+    return response
+
+
+class ThrottlingHandler(BaseHTTPRequestHandler):
+    """ Keep-alive handler serving 10 items in pages, answering the first request with 429 """
+
+    protocol_version = "HTTP/1.1"
+    lock = threading.Lock()
+    requests = 0
+
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """ Serve page """
+
+        with self.lock:
+            ThrottlingHandler.requests += 1
+            throttle = ThrottlingHandler.requests == 1
+
+        if throttle:
+            self.send_response(429)
+            self.send_header("Retry-After", "0.1")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        query = parse_qs(urlparse(self.path).query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["10"])[0])
+        body = json.dumps({"data": list(range(10))[offset:offset + limit]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+
+class TestHttpRetry(unittest.TestCase):
+    """ Test xcputils.ingestion.retry """
+
+
+    def setUp(self):
+        ThrottlingHandler.requests = 0
+
+
+    @patch("xcputils.ingestion.http.time.sleep")
+    @patch.object(Session, "get")
+    def test_retry_after(self, mock_get, mock_sleep):
+        """ Test 429 and 503 are retried after the Retry-After seconds """
+
+        mock_get.side_effect = [
+            throttled_response(429, "2"),
+            throttled_response(503, "0"),
+            mock_response(content="CONTENT"),
+            ]
+
+        ingestor = HttpIngestor(http_request=HttpRequest(url="https://mock.com")).with_retry()
+        result = ingestor.write_to_string()
+
+        self.assertEqual(result, "CONTENT")
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual([call.args[0] for call in mock_sleep.call_args_list], [2.0, 0.0])
+        self.assertEqual(ingestor.get_retry_stats()["retries"], 2)
+
+
+    @patch("xcputils.ingestion.http.time.sleep")
+    @patch.object(Session, "get")
+    def test_max_retries(self, mock_get, _):
+        """ Test the last response is raised after max_retries """
+
+        responses = [throttled_response(503) for _ in range(3)]
+        responses[-1].raise_for_status.side_effect = requests.HTTPError("503")
+        mock_get.side_effect = responses
+
+        ingestor = HttpIngestor(http_request=HttpRequest(url="https://mock.com")) \
+            .with_retry(max_retries=2)
+
+        with self.assertRaises(requests.HTTPError):
+            ingestor.write_to_string()
+        self.assertEqual(mock_get.call_count, 3)
+
+
+    @patch.object(Session, "get")
+    def test_no_retry_by_default(self, mock_get):
+        """ Test requests are not retried without a retry policy """
+
+        mock_get.return_value = throttled_response(503)
+        mock_get.return_value.raise_for_status.side_effect = requests.HTTPError("503")
+
+        ingestor = HttpIngestor(http_request=HttpRequest(url="https://mock.com"))
+
+        with self.assertRaises(requests.HTTPError):
+            ingestor.write_to_string()
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertEqual(ingestor.get_retry_stats()["retries"], 0)
+
+
+    @patch("xcputils.ingestion.http.time.sleep")
+    @patch.object(Session, "get")
+    def test_connection_error(self, mock_get, _):
+        """ Test connection errors are retried and client errors are not """
+
+        mock_get.side_effect = [requests.ConnectionError("reset"), mock_response(content="OK")]
+        ingestor = HttpIngestor(http_request=HttpRequest(url="https://mock.com")).with_retry()
+        self.assertEqual(ingestor.write_to_string(), "OK")
+
+        mock_get.side_effect = None
+        mock_get.return_value = throttled_response(404)
+        mock_get.return_value.raise_for_status.side_effect = requests.HTTPError("404")
+        with self.assertRaises(requests.HTTPError):
+            ingestor.write_to_string()
+
+
+    def test_backoff(self):
+        """ Test exponential backoff with full jitter, capped at max_backoff """
+
+        policy = RetryPolicy(backoff_factor=0.5, max_backoff=60.0)
+
+        with patch("xcputils.ingestion.retry.random.uniform", side_effect=lambda a, b: b):
+            self.assertEqual([policy.get_delay(retry) for retry in range(1, 10)],
+                             [0.5, 1.0, 2.0, 4.0, 8.0, 16.0, 32.0, 60.0, 60.0])
+
+        for retry in range(1, 10):
+            self.assertTrue(0 <= policy.get_delay(retry) <= 60.0)
+
+        retry_after = format_datetime(
+            datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+        self.assertTrue(25 < policy.get_delay(1, retry_after) <= 30)
+        self.assertEqual(policy.get_delay(1, "5"), 5.0)
+        self.assertTrue(0 <= policy.get_delay(1, "invalid") <= 0.5)
+
+
+    def test_retry_after_cap(self):
+        """ Test Retry-After delays are capped at max_backoff """
+
+        policy = RetryPolicy(max_backoff=3.0)
+
+        self.assertEqual(policy.get_delay(1, "2"), 2.0)
+        self.assertEqual(policy.get_delay(1, "3600"), 3.0)
+        self.assertEqual(policy.get_delay(1, format_datetime(
+            datetime.now(timezone.utc) + timedelta(days=1), usegmt=True)), 3.0)
+
+
+    def test_rate_limiter(self):
+        """ Test the token bucket allows a burst, then rate requests per second """
+
+        limiter = RateLimiter(rate=50, burst=5)
+
+        started = time.monotonic()
+        waits = [limiter.acquire() for _ in range(15)]
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(waits[:5], [0.0] * 5)
+        self.assertTrue(all(wait > 0 for wait in waits[5:]))
+        self.assertGreaterEqual(elapsed, 10 / 50 - 0.02)
+
+        limiter.pause(0.1)
+        self.assertGreater(limiter.acquire(), 0.05)
+
+        with self.assertRaises(ValueError):
+            RateLimiter(rate=0)
+
+
+    def test_paginated_rate_limit(self):
+        """ Test concurrent page fetches stay under the rate limit and survive a 429 """
+
+        events = []
+
+        with local_http_server(ThrottlingHandler) as url:
+            ingestor = HttpIngestor(http_request=HttpRequest(url=url)) \
+                .with_pagination(page_size=1, max_concurrency=4) \
+                .with_retry(backoff_factor=0.01) \
+                .with_rate_limit(rate=100) \
+                .with_metrics(events.append)
+
+            started = time.monotonic()
+            result = ingestor.write_to_string()
+            elapsed = time.monotonic() - started
+            ingestor.close()
+
+        items = [item for page in result.splitlines() for item in json.loads(page)["data"]]
+        self.assertEqual(items, list(range(10)))
+
+        stats = ingestor.get_retry_stats()
+        self.assertEqual(stats["retries"], 1)
+        self.assertGreater(stats["throttle_waits"], 0)
+        self.assertGreater(stats["throttle_seconds"], 0)
+        self.assertGreaterEqual(elapsed, 0.1 + 10 / 100 - 0.05)
+
+        names = [event.name for event in events if isinstance(event, TransferEvent)]
+        self.assertIn("retry", names)
+        self.assertIn("throttle", names)
+
+
+    @unittest.skipUnless(aiohttp, "aiohttp is not installed")
+    def test_async_retry(self):
+        """ Test ingest_async retries a 429 within the rate limit """
+
+        writer = StringStreamWriter()
+
+        with local_http_server(ThrottlingHandler) as url:
+            ingestor = HttpIngestor(HttpRequest(url=url), stream_writer=writer) \
+                .with_retry() \
+                .with_rate_limit(rate=100)
+            asyncio.run(ingestor.ingest_async())
+
+        self.assertEqual(json.loads(writer.value)["data"], list(range(10)))
+        self.assertEqual(ingestor.get_retry_stats()["retries"], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+""" Unit tests """
+
+import asyncio
+import json
+import os
+import shutil
+import unittest
+from unittest.mock import patch
+from test.unit import FakeDataLakeServiceClient, mock_response
+from test.unit.test_AsyncIngestion import FakeAsyncS3Client
+from test.unit.test_AwsS3Ingestor import mock_s3_client
+from test.unit.test_FtpIngestor import FakeFtp
+from xcputils.checkpoints.file import FileCheckpoint
+from xcputils.ingestion.az import AdfsIngestor
+from xcputils.ingestion.aws import AwsS3Ingestor
+from xcputils.ingestion.ftp import FtpIngestor
+from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.streaming.aws import AwsS3ConnectionSettings
+from xcputils.streaming.az import AdfsConnectionSettings, AdfsStreamReader
+from xcputils.streaming.string import StringStreamWriter
+
+
+class ModifiedFtp(FakeFtp):
+    """ Fake FTP listing modification times """
+
+    modified = {}
+    retrieved = []
+
+
+    def mlsd(self, facts=None):
+        """ List directory with facts """
+        for name, fact in super().mlsd(facts):
+            if name in self.modified:
+                fact["modify"] = self.modified[name]
+            yield name, fact
+
+
+    def voidcmd(self, cmd):
+        """ Send command, only MDTM is supported """
+        return f"213 {self.modified[cmd[len('MDTM '):]]}"
+
+
+    def retrbinary(self, cmd, callback, blocksize=8192, rest=None):
+        """ Download file """
+        self.retrieved.append(cmd[len("RETR "):])
+        super().retrbinary(cmd, callback, blocksize, rest)
+
+
+class TestIncrementalIngestion(unittest.TestCase):
+    """ Test Ingestor.with_incremental """
+
+    def setUp(self):
+        self.directory = "./test_incremental"
+        os.makedirs(self.directory, exist_ok=True)
+        self.checkpoint = FileCheckpoint(name="manifest", directory=self.directory)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    @patch("xcputils.ingestion.ftp.FTP", ModifiedFtp)
+    def test_ftp_incremental(self):
+        """ Test only files with changed modification time or size are downloaded again """
+
+        for supports_mlsd in (True, False):
+            with self.subTest(supports_mlsd=supports_mlsd):
+                ModifiedFtp.supports_mlsd = supports_mlsd
+                self.checkpoint.reset()
+                self.__test_ftp_incremental()
+
+
+    def __test_ftp_incremental(self):
+        ModifiedFtp.files = {"a.txt": b"a", "b.txt": b"b", "c.txt": b"c"}
+        ModifiedFtp.directories = set()
+        ModifiedFtp.modified = {name: "20240101000000" for name in ModifiedFtp.files}
+        ModifiedFtp.retrieved = []
+
+        ingestor = FtpIngestor(url="ftp.mock.com").with_incremental(self.checkpoint)
+        ingestor.write_to_file(self.directory)
+        self.assertEqual(sorted(ModifiedFtp.retrieved), ["a.txt", "b.txt", "c.txt"])
+
+        ModifiedFtp.retrieved = []
+        ingestor.write_to_file(self.directory)
+        self.assertEqual(ModifiedFtp.retrieved, [])
+
+        ModifiedFtp.modified["a.txt"] = "20240102000000"
+        ModifiedFtp.files["b.txt"] = b"bb"
+        ingestor = FtpIngestor(url="ftp.mock.com").with_incremental(self.checkpoint)
+        ingestor.write_to_file(self.directory)
+        self.assertEqual(sorted(ModifiedFtp.retrieved), ["a.txt", "b.txt"])
+
+        manifest = json.loads(self.checkpoint.get())
+        self.assertEqual(manifest["a.txt"], "20240102000000:1")
+        self.assertEqual(manifest["b.txt"], "20240101000000:2")
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_aws_s3_incremental(self, mock_get_client):
+        """ Test object is only downloaded again when its ETag changes """
+
+        client = mock_s3_client(b"content")
+        client.head_object.return_value["ETag"] = '"1"'
+        mock_get_client.return_value = client
+        ingestor = AwsS3Ingestor(AwsS3ConnectionSettings(bucket="bucket", file_path="test.txt")) \
+            .with_incremental(self.checkpoint)
+
+        self.assertEqual(ingestor.write_to_string(), "content")
+        self.assertEqual(ingestor.write_to_string(), "")
+        self.assertEqual(client.get_object.call_count, 1)
+
+        client.head_object.return_value["ETag"] = '"2"'
+        self.assertEqual(ingestor.write_to_string(), "content")
+        self.assertEqual(json.loads(self.checkpoint.get()), {"s3://bucket/test.txt": '"2"'})
+
+
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_adfs_incremental(self, mock_get_client):
+        """ Test file is only downloaded again when its ETag changes """
+
+        service_client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = service_client
+        file_client = service_client.get_file_system_client("container") \
+            .get_directory_client("directory").get_file_client("test.txt")
+        file_client.upload_data(b"content")
+        ingestor = AdfsIngestor(AdfsConnectionSettings(
+            container="container", directory="directory", file_name="test.txt")) \
+            .with_incremental(self.checkpoint)
+
+        self.assertEqual(ingestor.write_to_string(), "content")
+        self.assertEqual(ingestor.write_to_string(), "")
+
+        file_client.upload_data(b"changed", overwrite=True)
+        self.assertEqual(ingestor.write_to_string(), "changed")
+
+
+    @patch.object(AwsS3ConnectionSettings, "create_async_client")
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_aws_s3_incremental_async(self, mock_get_client, mock_create_async_client):
+        """ Test ingest_async only downloads the object again when its ETag changes """
+
+        client = mock_s3_client(b"content")
+        client.head_object.return_value["ETag"] = '"1"'
+        mock_get_client.return_value = client
+        objects = {("bucket", "test.txt"): b"content"}
+        mock_create_async_client.side_effect = lambda: FakeAsyncS3Client(objects)
+
+        def ingest() -> str:
+            writer = StringStreamWriter()
+            asyncio.run(AwsS3Ingestor(
+                AwsS3ConnectionSettings(bucket="bucket", file_path="test.txt"), writer) \
+                .with_incremental(self.checkpoint) \
+                .ingest_async())
+            return writer.value
+
+        self.assertEqual(ingest(), "content")
+        self.assertEqual(ingest(), "")
+        self.assertEqual(mock_create_async_client.call_count, 1)
+
+        client.head_object.return_value["ETag"] = '"2"'
+        self.assertEqual(ingest(), "content")
+        self.assertEqual(json.loads(self.checkpoint.get(refresh=True)), {"s3://bucket/test.txt": '"2"'})
+
+
+    @patch.object(AdfsConnectionSettings, "get_client")
+    def test_adfs_incremental_async(self, mock_get_client):
+        """ Test ingest_async only downloads the file again when its ETag changes """
+
+        service_client = FakeDataLakeServiceClient()
+        mock_get_client.return_value = service_client
+        file_client = service_client.get_file_system_client("container") \
+            .get_directory_client("directory").get_file_client("test.txt")
+        file_client.upload_data(b"content")
+
+        async def read_async(reader):
+            return reader.connection_settings.get_file_client().download_file().readall()
+
+        def ingest() -> str:
+            writer = StringStreamWriter()
+            asyncio.run(AdfsIngestor(AdfsConnectionSettings(
+                container="container", directory="directory", file_name="test.txt"), writer) \
+                .with_incremental(self.checkpoint) \
+                .ingest_async())
+            return writer.value
+
+        with patch.object(AdfsStreamReader, "read_async", autospec=True,
+                          side_effect=read_async) as mock_read_async:
+            self.assertEqual(ingest(), "content")
+            self.assertEqual(ingest(), "")
+            self.assertEqual(mock_read_async.call_count, 1)
+
+            file_client.upload_data(b"changed", overwrite=True)
+            self.assertEqual(ingest(), "changed")
+
+
+    @patch('requests.Session.get')
+    def test_http_incremental(self, mock_get):
+        """ Test high-water mark of the last run is passed as since param """
+
+        mock_get.side_effect = lambda *args, **kwargs: mock_response(content="CONTENT")
+        marks = iter(["2024-01-01", "2024-01-02"])
+        ingestor = HttpIngestor(HttpRequest(url="https://api.mock.com/items")) \
+            .with_incremental(self.checkpoint, since_param="updated_since",
+                              high_water_mark=lambda: next(marks))
+
+        ingestor.write_to_string()
+        ingestor.write_to_string()
+
+        self.assertNotIn("updated_since", mock_get.call_args_list[0].kwargs["params"])
+        self.assertEqual(mock_get.call_args_list[1].kwargs["params"]["updated_since"], "2024-01-01")
+        self.assertEqual(
+            json.loads(self.checkpoint.get()), {"https://api.mock.com/items": "2024-01-02"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+""" Test imports are lazy """
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+import xcputils
+
+
+SDK_MODULES = ("boto3", "botocore", "azure", "requests", "aiohttp", "aiobotocore")
+
+IMPORT_TIME_BUDGET_US = 100000
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    """ Run code in a fresh interpreter with xcputils on the path """
+
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.dirname(os.path.dirname(xcputils.__file__)), env.get("PYTHONPATH", "")])
+
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        capture_output=True, text=True, env=env, check=True)
+
+
+def get_loaded_sdk_modules(statements: str) -> list:
+    """ Get SDK modules loaded by statements in a fresh interpreter """
+
+    result = run_python(
+        f"import json, sys\n{statements}\n"
+        "print(json.dumps(sorted(m for m in sys.modules if m.split('.')[0] in "
+        f"{SDK_MODULES!r})))")
+
+    return json.loads(result.stdout)
+
+
+class TestLazyImports(unittest.TestCase):
+    """ Test import xcputils does not load connector SDKs """
+
+
+    def test_import_package(self):
+        """ Test package import and local connectors load no SDK """
+
+        self.assertEqual(get_loaded_sdk_modules("import xcputils"), [])
+        self.assertEqual(get_loaded_sdk_modules(
+            "from xcputils import XCPUtils\n"
+            "XCPUtils().read_from_file('data.txt')\n"
+            "XCPUtils().read_from_string('data').write_to_string()"), [])
+
+
+    def test_import_cloud_connectors(self):
+        """ Test cloud connector modules only load their SDK when a client is created """
+
+        self.assertEqual(get_loaded_sdk_modules(
+            "from xcputils import AwsS3Ingestor, AdfsIngestor, AwsS3Checkpoint, AdfsCheckpoint"), [])
+        self.assertIn("boto3", get_loaded_sdk_modules(
+            "from xcputils import AwsS3ConnectionSettings\n"
+            "AwsS3ConnectionSettings(bucket='b', file_path='f', aws_region_name='eu-west-1').get_client()"))
+
+
+    def test_lazy_attributes(self):
+        """ Test lazy attributes resolve to the connector classes """
+
+        from xcputils.ingestion.ftp import FtpIngestor # pylint: disable=import-outside-toplevel
+
+        self.assertIs(xcputils.FtpIngestor, FtpIngestor)
+        self.assertIn("HttpIngestor", dir(xcputils))
+        with self.assertRaises(AttributeError):
+            xcputils.NoSuchIngestor # pylint: disable=pointless-statement
+
+
+    def test_import_time(self):
+        """ Test import xcputils stays within the import time budget """
+
+        result = run_python("import xcputils", "-X", "importtime")
+        cumulative = next(
+            int(line.split("|")[1])
+            for line in result.stderr.splitlines()
+            if line.split("|")[-1].strip() == "xcputils")
+
+        self.assertLess(cumulative, IMPORT_TIME_BUDGET_US)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,225 @@
+""" Test Metrics """
+
+import importlib.util
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+from test.unit import mock_response
+from test.unit.test_AwsS3Ingestor import mock_s3_client
+
+from requests import Session
+
+from xcputils.ingestion import Ingestor
+from xcputils.ingestion.aws import AwsS3Ingestor
+from xcputils.ingestion.file import FileIngestor
+from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.ingestion.string import StringIngestor
+from xcputils.metrics import (
+    LoggingSink, Metrics, OpenTelemetrySink, PrometheusTextFileSink, TransferEvent)
+from xcputils.streaming.aws import AwsS3ConnectionSettings
+from xcputils.streaming.file import FileStreamWriter
+
+
+class TestMetrics(unittest.TestCase):
+    """ Test xcputils.metrics """
+
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.events = []
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def get_events(self, name: str) -> list:
+        """ Get emitted events named name """
+
+        return [event for event in self.events if event.name == name]
+
+
+    def test_file_transfer(self):
+        """ Test a file transfer emits its phases with the bytes copied """
+
+        source = os.path.join(self.directory, "source.bin")
+        with open(source, "wb") as file:
+            file.write(os.urandom(100000))
+
+        FileIngestor(source, FileStreamWriter(os.path.join(self.directory, "target.bin"))) \
+            .with_metrics(self.events.append) \
+            .ingest()
+
+        self.assertEqual(
+            [event.name for event in self.events], ["read", "write", "transfer"])
+        transfer = self.get_events("transfer")[0]
+        self.assertEqual(transfer.size, 100000)
+        self.assertEqual(transfer.attributes, {
+            "ingestor": "FileIngestor", "writer": "FileStreamWriter", "key": source})
+        self.assertGreaterEqual(transfer.duration, 0)
+
+
+    def test_string_transfer(self):
+        """ Test a streamed transfer emits time to first byte and failures """
+
+        StringIngestor("content").with_metrics(self.events.append).write_to_string()
+
+        self.assertEqual(
+            [event.name for event in self.events], ["first_byte", "read", "write", "transfer"])
+        self.assertEqual(self.get_events("read")[0].size, 7)
+
+        writer = MagicMock()
+        writer.write.side_effect = lambda stream: stream.read(3) and 1 / 0
+        with self.assertRaises(ZeroDivisionError):
+            StringIngestor("content", writer).with_metrics(self.events.append).ingest()
+
+        self.assertEqual(self.get_events("transfer")[-1].attributes["error"], "ZeroDivisionError")
+        self.assertEqual(self.get_events("transfer")[-1].size, 3)
+
+
+    def test_disabled(self):
+        """ Test the writer gets the source stream if metrics are disabled """
+
+        writer = MagicMock()
+        StringIngestor("content", writer).ingest()
+
+        self.assertEqual(type(writer.write.call_args.args[0]).__name__, "BytesIO")
+
+
+    @patch.object(Session, "get")
+    def test_pages(self, mock_get):
+        """ Test paginated ingest emits a page event per page """
+
+        mock_get.side_effect = [
+            mock_response(json_data={"data": [1, 2]}),
+            mock_response(json_data={"data": [3]}),
+            ]
+
+        HttpIngestor(http_request=HttpRequest(url="https://mock.com/items")) \
+            .with_pagination(page_size=2) \
+            .with_metrics(self.events.append) \
+            .write_to_string()
+
+        pages = self.get_events("page")
+        self.assertEqual([page.attributes["page"] for page in pages], [1, 2])
+        self.assertEqual(pages[0].size, len(json.dumps({"data": [1, 2]})))
+        self.assertEqual(
+            [event.attributes["page"] for event in self.get_events("transfer")], [1, 2])
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_ranges(self, mock_get_client):
+        """ Test ranged reads emit a range event per range """
+
+        mock_get_client.return_value = mock_s3_client(b"0123456789")
+
+        AwsS3Ingestor(
+            AwsS3ConnectionSettings(bucket="bucket", file_path="test.txt"), chunk_size=4) \
+            .with_metrics(self.events.append) \
+            .write_to_string()
+
+        ranges = self.get_events("range")
+        self.assertEqual([(event.attributes["offset"], event.size) for event in ranges],
+                         [(0, 4), (4, 4), (8, 2)])
+        self.assertEqual(ranges[0].attributes["key"], "s3://bucket/test.txt")
+
+
+    def test_pool_wait(self):
+        """ Test ingest_each emits the time spent waiting for a free worker """
+
+        ingestor = Ingestor().with_metrics(self.events.append)
+        ingestor.ingest_each(range(6), lambda item: time.sleep(0.01), max_concurrency=1)
+        self.assertEqual(self.events, [])
+
+        ingestor.ingest_each(range(6), lambda item: time.sleep(0.01), max_concurrency=2)
+        waits = self.get_events("pool_wait")
+        self.assertGreaterEqual(len(waits), 1)
+        self.assertEqual(waits[0].attributes, {"ingestor": "Ingestor", "pool": "ingest_each"})
+
+
+    def test_logging_sink(self):
+        """ Test events are logged """
+
+        with self.assertLogs("xcputils.metrics", level=logging.INFO) as logs:
+            Metrics(LoggingSink()).emit("file", 0.5, 10, key="a.txt")
+
+        self.assertEqual(logs.output, ["INFO:xcputils.metrics:file 10 bytes in 0.500 s key=a.txt"])
+
+
+    def test_prometheus_sink(self):
+        """ Test counters are written in the Prometheus text format on the first event and
+        on flush """
+
+        file_path = os.path.join(self.directory, "xcputils.prom")
+        metrics = Metrics(PrometheusTextFileSink(file_path), ingestor="FileIngestor")
+        metrics.emit("transfer", 0.5, 10)
+        with open(file_path, encoding="utf-8") as file:
+            self.assertIn(
+                'xcputils_transfer_events_total{event="transfer",ingestor="FileIngestor"} 1',
+                file.read().splitlines())
+
+        metrics.emit("transfer", 0.25, 20)
+        metrics.flush()
+
+        with open(file_path, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        self.assertIn('xcputils_transfer_events_total{event="transfer",ingestor="FileIngestor"} 2', lines)
+        self.assertIn('xcputils_transfer_bytes_total{event="transfer",ingestor="FileIngestor"} 30', lines)
+        self.assertIn('xcputils_transfer_seconds_total{event="transfer",ingestor="FileIngestor"} 0.75', lines)
+        self.assertEqual(os.listdir(self.directory), ["xcputils.prom"])
+
+
+    def test_prometheus_sink_ingestor(self):
+        """ Test the file has every event of a run shorter than the interval """
+
+        file_path = os.path.join(self.directory, "xcputils.prom")
+        source_path = os.path.join(self.directory, "in.txt")
+        with open(source_path, "w", encoding="utf-8") as file:
+            file.write("data")
+
+        FileIngestor(source_path) \
+            .with_metrics(PrometheusTextFileSink(file_path, interval=3600)) \
+            .write_to_string()
+
+        with open(file_path, encoding="utf-8") as file:
+            lines = file.read().splitlines()
+        self.assertIn('xcputils_transfer_events_total{event="transfer",ingestor="FileIngestor"} 1', lines)
+        self.assertIn('xcputils_transfer_bytes_total{event="transfer",ingestor="FileIngestor"} 4', lines)
+
+
+    def test_opentelemetry_sink(self):
+        """ Test events with a duration are recorded as spans """
+
+        tracer = MagicMock()
+        metrics = Metrics(OpenTelemetrySink(tracer), ingestor="FileIngestor")
+        metrics.emit("transfer", 0.5, 10, start=100.0)
+        metrics.emit("count")
+
+        tracer.start_span.assert_called_once_with(
+            "xcputils.transfer", start_time=100 * 10**9,
+            attributes={"ingestor": "FileIngestor", "bytes": 10})
+        tracer.start_span.return_value.end.assert_called_once_with(end_time=int(100.5 * 10**9))
+
+
+    @unittest.skipIf(importlib.util.find_spec("opentelemetry"), "opentelemetry is installed")
+    def test_opentelemetry_missing(self):
+        """ Test the OpenTelemetry sink explains the missing dependency """
+
+        with self.assertRaisesRegex(ImportError, "xcputils\\[opentelemetry\\]"):
+            OpenTelemetrySink()
+
+
+    def test_event_str(self):
+        """ Test event formatting """
+
+        self.assertEqual(str(TransferEvent("pool_wait", 0, 0.25, attributes={"pool": "ftp"})),
+                         "pool_wait in 0.250 s pool=ftp")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,14 +1,42 @@
 """ Unit tests """
 
+from http.server import BaseHTTPRequestHandler
 import json
+import threading
+import time
 import unittest
 from unittest.mock import patch
-from test.unit import mock_response
+from urllib.parse import parse_qs, urlparse
+from test.unit import local_http_server, mock_response
 from requests import Session
-from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.ingestion import pagination
+from xcputils.ingestion.http import HttpIngestor, HttpRequest, PaginationHandler
 from xcputils.streaming.string import StringStreamWriter
 
 
+class PageHandler(BaseHTTPRequestHandler):
+    """ Keep-alive handler serving 10 items in pages """
+
+    protocol_version = "HTTP/1.1"
+
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """ Serve page """
+        query = parse_qs(urlparse(self.path).query)
+        offset = int(query.get("offset", ["0"])[0])
+        limit = int(query.get("limit", ["10"])[0])
+        body = json.dumps({"data": list(range(10))[offset:offset + limit]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+
 class TestPaginatedHttpIngestor(unittest.TestCase):
     """ Test xcputils.ingest.http """
 
@@ -43,5 +71,133 @@ class TestPaginatedHttpIngestor(unittest.TestCase):
             ])
 
 
+    @patch.object(Session, "get")
+    def test_get_concurrent(self, mock_get):
+        """ Test HttpIngestor with pages fetched concurrently """
+
+        lock = threading.Lock()
+        in_flight = [0]
+        max_in_flight = [0]
+
+        def get_page(**kwargs):
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            offset = kwargs["params"]["offset"]
+            time.sleep(0.05 if offset % 2 == 0 else 0.01)
+            with lock:
+                in_flight[0] -= 1
+            return mock_response(json_data={"data": list(range(offset, min(offset + 2, 15)))})
+
+        mock_get.side_effect = get_page
+
+        result = HttpIngestor(
+            http_request=HttpRequest(url="https://mock.com/ip")) \
+            .with_pagination(page_size=2, max_concurrency=4) \
+            .write_to_string()
+
+        result = [json.loads(line) for line in result.splitlines()]
+        self.assertEqual(result, [{"data": list(range(i, min(i + 2, 15)))} for i in range(0, 15, 2)])
+        self.assertGreater(max_in_flight[0], 1)
+        self.assertLessEqual(max_in_flight[0], 4)
+
+
+    @patch.object(Session, "get")
+    def test_get_raw(self, mock_get):
+        """ Test HttpIngestor with pages written unchanged """
+
+        pages = [b'{"data": [1, 2, 3],  "next": 1}', b'{"data":[4,5,6]}', b'{"data": [7]}']
+        responses = [mock_response(content=page.decode("utf-8")) for page in pages]
+        for response, page in zip(responses, pages):
+            response.content = page
+        mock_get.side_effect = responses
+
+        result = HttpIngestor(
+            http_request=HttpRequest(url="https://mock.com/ip")) \
+            .with_pagination(page_size=3, raw=True) \
+            .write_to_string()
+
+        self.assertEqual(result, "\n".join(page.decode("utf-8") for page in pages))
+
+
+    def test_count_items(self):
+        """ Test counting items in raw pages, with and without ijson """
+
+        handler = PaginationHandler(page_size=3)
+        pages = {
+            b'{"data": [1, {"data": [2, 3]}, [4, 5], "x", null, true]}': 6,
+            b'{"other": [1], "data": []}': 0,
+            b'{"data": {"a": 1}}': None,
+            b'{"other": [1]}': None,
+            b'[1, 2]': None,
+            }
+
+        for ijson in {pagination.ijson, None}:
+            with patch.object(pagination, "ijson", ijson):
+                for page, expected in pages.items():
+                    self.assertEqual(handler.count_items(page), expected, page)
+
+
+    def test_connection_reuse(self):
+        """ Test pages reuse one keep-alive connection """
+
+        with local_http_server(PageHandler) as url:
+            ingestor = HttpIngestor(http_request=HttpRequest(url=url)) \
+                .with_pagination(page_size=3)
+
+            result = ingestor.write_to_string()
+            stats = ingestor.get_connection_stats()
+            ingestor.close()
+
+        self.assertEqual(len(result.splitlines()), 4)
+        self.assertEqual(stats, {"requests": 4, "connections": 1, "reused": 3})
+
+
+    def test_session_factory(self):
+        """ Test injected session factory """
+
+        sessions = []
+
+        def session_factory():
+            sessions.append(Session())
+            return sessions[-1]
+
+        with local_http_server(PageHandler) as url:
+            ingestor = HttpIngestor(http_request=HttpRequest(url=url), session_factory=session_factory) \
+                .with_pagination(page_size=5)
+            ingestor.write_to_string()
+            other = HttpIngestor(http_request=HttpRequest(url=url)) \
+                .with_session(ingestor.get_session())
+            other.write_to_string()
+            ingestor.close()
+
+        self.assertEqual(len(sessions), 1)
+        self.assertIs(other.session, sessions[0])
+
+
+    def test_close_injected_session(self):
+        """ Test close leaves a session set with with_session open, but closes its own """
+
+        session = Session()
+
+        with local_http_server(PageHandler) as url:
+            shared = HttpIngestor(http_request=HttpRequest(url=url)).with_session(session)
+            own = HttpIngestor(http_request=HttpRequest(url=url))
+            shared.write_to_string()
+            own.write_to_string()
+            own_session = own.session
+
+            with patch.object(session, "close") as close_shared, \
+                    patch.object(own_session, "close") as close_own:
+                shared.close()
+                own.close()
+
+        close_shared.assert_not_called()
+        self.assertIs(shared.session, session)
+        close_own.assert_called_once()
+        self.assertIsNone(own.session)
+        session.close()
+
+
 if __name__ == "__main__":
     unittest.main()
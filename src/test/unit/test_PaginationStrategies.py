@@ -0,0 +1,134 @@
+""" Unit tests """
+
+import asyncio
+from http.server import BaseHTTPRequestHandler
+import json
+import unittest
+from urllib.parse import parse_qs, urlparse
+from test.unit import local_http_server
+from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.ingestion.pagination import PaginationStrategy
+from xcputils.streaming.string import StringStreamWriter
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+ITEMS = list(range(7))
+
+
+class StrategyHandler(BaseHTTPRequestHandler):
+    """ Serve ITEMS with page number, cursor, next URL and Link header pagination """
+
+    protocol_version = "HTTP/1.1"
+
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """ Serve page """
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        limit = int(query.get("limit", 3))
+        headers = {}
+
+        if url.path == "/page":
+            start = (int(query["page"]) - 1) * limit
+            payload = {"data": ITEMS[start:start + limit]}
+        elif url.path == "/cursor":
+            start = int(query.get("cursor", 0))
+            more = start + limit < len(ITEMS)
+            payload = {"data": ITEMS[start:start + limit],
+                       "meta": {"next_cursor": str(start + limit) if more else None}}
+        elif url.path == "/next":
+            start = int(query.get("start", 0))
+            more = start + limit < len(ITEMS)
+            payload = {"data": ITEMS[start:start + limit],
+                       "next": f"/next?start={start + limit}&limit={limit}" if more else None}
+        else:
+            start = int(query.get("start", 0))
+            payload = {"data": ITEMS[start:start + limit]}
+            if start + limit < len(ITEMS):
+                headers["Link"] = \
+                    f'</link?start={start + limit}&limit={limit}>; rel="next", </link>; rel="first"'
+
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+
+class TestPaginationStrategies(unittest.TestCase):
+    """ Test xcputils.ingestion.pagination strategies """
+
+
+    def ingest(self, path: str, **kwargs) -> list:
+        """ Ingest all pages and return the data items """
+
+        with local_http_server(StrategyHandler) as url:
+            ingestor = HttpIngestor(http_request=HttpRequest(url=f"{url}{path}")) \
+                .with_pagination(page_size=3, **kwargs)
+            result = ingestor.write_to_string()
+            ingestor.close()
+
+        return [item for line in result.splitlines() for item in json.loads(line)["data"]]
+
+
+    def test_page_number(self):
+        """ Test page number pagination """
+
+        self.assertEqual(
+            self.ingest("/page", strategy=PaginationStrategy.PAGE_NUMBER, max_concurrency=2),
+            ITEMS)
+
+
+    def test_cursor(self):
+        """ Test cursor pagination """
+
+        self.assertEqual(
+            self.ingest("/cursor", strategy=PaginationStrategy.CURSOR, cursor_property="meta.next_cursor"),
+            ITEMS)
+
+
+    def test_next_url(self):
+        """ Test next URL in body pagination """
+
+        self.assertEqual(self.ingest("/next", strategy=PaginationStrategy.NEXT_URL), ITEMS)
+
+
+    def test_link_header(self):
+        """ Test Link header pagination """
+
+        self.assertEqual(
+            self.ingest("/link", strategy=PaginationStrategy.LINK_HEADER, raw=True), ITEMS)
+
+
+    @unittest.skipUnless(aiohttp, "aiohttp is not installed")
+    def test_ingest_async(self):
+        """ Test paginated ingest_async """
+
+        for path, strategy in [
+            ("/page", PaginationStrategy.PAGE_NUMBER),
+            ("/link", PaginationStrategy.LINK_HEADER)]:
+
+            writer = StringStreamWriter()
+            with local_http_server(StrategyHandler) as url:
+                asyncio.run(
+                    HttpIngestor(http_request=HttpRequest(url=f"{url}{path}"), stream_writer=writer) \
+                        .with_pagination(page_size=3, strategy=strategy, max_concurrency=3) \
+                        .ingest_async())
+
+            items = [item for line in writer.value.splitlines() for item in json.loads(line)["data"]]
+            self.assertEqual(items, ITEMS)
+
+
+if __name__ == "__main__":
+    unittest.main()
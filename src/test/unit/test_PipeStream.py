@@ -0,0 +1,90 @@
+""" Test PipeStream """
+
+import threading
+import unittest
+
+from xcputils.streaming.pipe import PipeStream
+
+
+class TestPipeStream(unittest.TestCase):
+    """ Test xcputils.streaming.pipe.PipeStream """
+
+
+    def test_bounded_buffer(self):
+        """ Test that the producer blocks while the buffer is full """
+
+        pipe = PipeStream(buffer_size=10)
+        payload = bytes(range(256)) * 4
+        max_buffered = []
+
+        def produce():
+            for i in range(0, len(payload), 7):
+                pipe.write(payload[i:i + 7])
+                max_buffered.append(pipe._size) # pylint: disable=protected-access
+            pipe.close_writer()
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        result = pipe.read()
+        producer.join()
+
+        self.assertEqual(result, payload)
+        self.assertLessEqual(max(max_buffered), 10)
+
+
+    def test_error(self):
+        """ Test that a producer error is raised in the reader """
+
+        pipe = PipeStream(buffer_size=10)
+        pipe.write(b"abc")
+        pipe.close_writer(IOError("Connection reset"))
+
+        self.assertEqual(pipe.read(3), b"abc")
+        with self.assertRaises(IOError):
+            pipe.read(3)
+
+
+    def test_read_full(self):
+        """ Test that read waits for size bytes, like a buffered file, and returns the bytes
+        read before a producer error """
+
+        pipe = PipeStream(buffer_size=4)
+
+        def produce():
+            for i in range(0, 10, 3):
+                pipe.write(b"0123456789"[i:i + 3])
+            pipe.close_writer(IOError("Connection reset"))
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        self.assertEqual(pipe.read(8), b"01234567")
+        self.assertEqual(pipe.read(8), b"89")
+        with self.assertRaises(IOError):
+            pipe.read(8)
+        producer.join()
+
+
+    def test_close_reader(self):
+        """ Test that closing the reader unblocks the producer """
+
+        pipe = PipeStream(buffer_size=4)
+        errors = []
+
+        def produce():
+            try:
+                pipe.write(b"0123456789")
+            except BrokenPipeError as error:
+                errors.append(error)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        self.assertEqual(pipe.read(2), b"01")
+        pipe.close()
+        producer.join(timeout=5)
+
+        self.assertFalse(producer.is_alive())
+        self.assertEqual(len(errors), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
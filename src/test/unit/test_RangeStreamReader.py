@@ -0,0 +1,112 @@
+""" Test RangeStreamReader """
+
+import io
+import os
+import random
+import shutil
+import threading
+import time
+import unittest
+
+from xcputils.streaming import RangeStreamReader
+from xcputils.streaming.file import FileStreamWriter
+
+
+class FakeRangeReader(RangeStreamReader):
+    """ Ranged reads of an in-memory payload with random latency """
+
+    def __init__(self, payload: bytes, chunk_size: int, max_concurrency: int):
+        super().__init__(chunk_size=chunk_size, max_concurrency=max_concurrency)
+        self.payload = payload
+        self.starts = []
+        self.active = [0, 0]
+        self.lock = threading.Lock()
+
+
+    def get_size(self) -> int:
+        return len(self.payload)
+
+
+    def read_range(self, start: int, length: int) -> bytes:
+        with self.lock:
+            self.starts.append(start)
+            self.active[0] += 1
+            self.active[1] = max(self.active)
+        time.sleep(random.random() / 200)
+        with self.lock:
+            self.active[0] -= 1
+        return self.payload[start:start + length]
+
+
+class TestRangeStreamReader(unittest.TestCase):
+    """ Test xcputils.streaming.RangeStreamReader """
+
+    def setUp(self):
+        self.payload = os.urandom(100000)
+        self.directory = "./test_ranges"
+        os.makedirs(self.directory, exist_ok=True)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def test_read_chunked(self):
+        """ Test parallel ranges are written in order with a bounded window """
+
+        reader = FakeRangeReader(self.payload, chunk_size=1000, max_concurrency=4)
+        output = io.BytesIO()
+
+        reader.read_chunked(output, offset=500)
+
+        self.assertEqual(output.getvalue(), self.payload[500:])
+        self.assertLessEqual(reader.active[1], 4)
+        self.assertGreater(reader.active[1], 1)
+
+
+    def test_read_into_file(self):
+        """ Test parallel ranges are written at their positions with contiguous progress """
+
+        reader = FakeRangeReader(self.payload, chunk_size=1000, max_concurrency=8)
+        file_path = f"{self.directory}/payload.bin"
+        progress = []
+
+        reader.read_into_file(file_path, progress=progress.append)
+
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), self.payload)
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(progress[-1], len(self.payload))
+
+
+    def test_read_into_file_offset(self):
+        """ Test only ranges after offset are read, keeping the start of the file """
+
+        reader = FakeRangeReader(self.payload, chunk_size=1000, max_concurrency=8)
+        file_path = f"{self.directory}/payload.bin"
+        with open(file_path, "wb") as file:
+            file.write(self.payload[:30000])
+
+        reader.read_into_file(file_path, offset=30000)
+
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), self.payload)
+        self.assertEqual(min(reader.starts), 30000)
+
+
+    def test_file_writer_copy_from(self):
+        """ Test file writer downloads ranges in parallel only with concurrency """
+
+        file_path = f"{self.directory}/sub/payload.bin"
+
+        self.assertFalse(FileStreamWriter(file_path).copy_from(
+            FakeRangeReader(self.payload, chunk_size=1000, max_concurrency=1)))
+        self.assertTrue(FileStreamWriter(file_path).copy_from(
+            FakeRangeReader(self.payload, chunk_size=1000, max_concurrency=4)))
+
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), self.payload)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,303 @@
+""" Unit tests """
+
+from http.server import BaseHTTPRequestHandler
+import json
+import os
+import shutil
+import unittest
+from unittest.mock import patch
+from test.unit import local_http_server
+from test.unit.test_AwsS3Ingestor import mock_s3_client
+from test.unit.test_FtpIngestor import FakeFtp
+from xcputils.checkpoints.file import FileCheckpoint
+from xcputils.ingestion.aws import AwsS3Ingestor
+from xcputils.ingestion.ftp import FtpIngestor
+from xcputils.ingestion.http import HttpIngestor, HttpRequest
+from xcputils.streaming.aws import AwsS3ConnectionSettings
+from xcputils.streaming.file import FileStreamWriter
+
+
+PAYLOAD = os.urandom(300000)
+
+
+class DroppingHandler(BaseHTTPRequestHandler):
+    """ Serve payload with an ETag and Range support honoring If-Range,
+    dropping the first drops full responses halfway """
+
+    protocol_version = "HTTP/1.1"
+    payload = PAYLOAD
+    etag = '"1"'
+    drops = 1
+    requests = []
+
+
+    def do_GET(self): # pylint: disable=invalid-name
+        """ Serve payload """
+        self.requests.append(
+            {name: self.headers.get(name) for name in ("Range", "If-Range", "Accept-Encoding")})
+        range_header = self.headers.get("Range")
+        payload = type(self).payload
+
+        if range_header and self.headers.get("If-Range") in (None, self.etag):
+            start = int(range_header.replace("bytes=", "").rstrip("-"))
+            if start >= len(payload):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(payload)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(payload) - 1}/{len(payload)}")
+            self.send_header("Content-Length", str(len(payload) - start))
+            self.end_headers()
+            self.wfile.write(payload[start:])
+            return
+
+        self.send_response(200)
+        if self.etag:
+            self.send_header("ETag", self.etag)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        if type(self).drops:
+            type(self).drops -= 1
+            self.wfile.write(payload[:len(payload) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(payload)
+
+
+    def log_message(self, format, *args): # pylint: disable=redefined-builtin
+        pass
+
+
+class DroppingFtp(FakeFtp):
+    """ Fake FTP dropping the first transfer of each file halfway """
+
+    dropped = set()
+    rests = []
+
+
+    def retrbinary(self, cmd, callback, blocksize=8192, rest=None):
+        """ Download file from rest """
+        name = cmd[len("RETR "):]
+        data = self.files[name]
+        self.rests.append(rest)
+        start = int(rest or 0)
+        end = len(data) if name in self.dropped else len(data) // 2
+        for i in range(start, end, blocksize):
+            callback(data[i:min(i + blocksize, end)])
+        if name not in self.dropped:
+            self.dropped.add(name)
+            raise ConnectionResetError("Connection reset by peer")
+
+
+class TestResumableIngestion(unittest.TestCase):
+    """ Test Ingestor.with_resume """
+
+    def setUp(self):
+        self.directory = "./test_resume"
+        os.makedirs(self.directory, exist_ok=True)
+        self.checkpoint = FileCheckpoint(name="offsets", directory=self.directory)
+
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+
+    def serve(self, payload: bytes = PAYLOAD, etag: str = '"1"', drops: int = 1):
+        """ Reset DroppingHandler to serve payload """
+
+        DroppingHandler.payload = payload
+        DroppingHandler.etag = etag
+        DroppingHandler.drops = drops
+        DroppingHandler.requests = []
+
+
+    def create_ingestor(self, url: str, file_path: str) -> HttpIngestor:
+        """ Create resumable ingestor of url writing to file_path """
+
+        return HttpIngestor(HttpRequest(url=f"{url}/payload.bin")) \
+            .with_stream_writer(FileStreamWriter(file_path, buffer_size=16384)) \
+            .with_resume(self.checkpoint, interval=1024)
+
+
+    def test_http_resume(self):
+        """ Test HTTP download resumes with a Range request after the connection drops """
+
+        file_path = f"{self.directory}/payload.bin"
+        self.serve()
+
+        with local_http_server(DroppingHandler) as url:
+            ingestor = self.create_ingestor(url, file_path)
+
+            with self.assertRaises(Exception):
+                ingestor.ingest()
+
+            entry = json.loads(self.checkpoint.get())[f"{url}/payload.bin"]
+            offset = entry["offset"]
+            self.assertEqual(entry["version"], '"1"')
+            self.assertGreater(offset, 0)
+            self.assertLessEqual(offset, len(PAYLOAD) // 2)
+
+            ingestor.ingest()
+
+        self.assertEqual(DroppingHandler.requests, [
+            {"Range": None, "If-Range": None, "Accept-Encoding": "identity"},
+            {"Range": f"bytes={offset}-", "If-Range": '"1"', "Accept-Encoding": "identity"}])
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), PAYLOAD)
+        self.assertEqual(json.loads(self.checkpoint.get()), {})
+
+
+    def test_http_resume_changed(self):
+        """ Test HTTP download starts over if the resource changed since it was interrupted """
+
+        file_path = f"{self.directory}/payload.bin"
+        changed = os.urandom(200000)
+        self.serve()
+
+        with local_http_server(DroppingHandler) as url:
+            ingestor = self.create_ingestor(url, file_path)
+
+            with self.assertRaises(Exception):
+                ingestor.ingest()
+
+            DroppingHandler.payload = changed
+            DroppingHandler.etag = '"2"'
+            ingestor.ingest()
+
+        self.assertEqual(DroppingHandler.requests[-1]["If-Range"], '"1"')
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), changed)
+
+
+    def test_http_resume_not_satisfiable(self):
+        """ Test HTTP download starts over if the server rejects the resume range """
+
+        file_path = f"{self.directory}/payload.bin"
+        self.serve(drops=0)
+
+        with local_http_server(DroppingHandler) as url:
+            offset = len(PAYLOAD) + 1000
+            with open(file_path, "wb") as file:
+                file.write(os.urandom(offset))
+            self.checkpoint.set(json.dumps(
+                {f"{url}/payload.bin": {"offset": offset, "version": '"1"'}}))
+
+            self.create_ingestor(url, file_path).ingest()
+
+        self.assertEqual(
+            [request["Range"] for request in DroppingHandler.requests], [f"bytes={offset}-", None])
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), PAYLOAD)
+
+
+    def test_http_resume_without_validator(self):
+        """ Test HTTP download without ETag or Last-Modified starts over instead of resuming """
+
+        file_path = f"{self.directory}/payload.bin"
+        self.serve(etag=None)
+
+        with local_http_server(DroppingHandler) as url:
+            ingestor = self.create_ingestor(url, file_path)
+
+            with self.assertRaises(Exception):
+                ingestor.ingest()
+            ingestor.ingest()
+
+        self.assertEqual([request["Range"] for request in DroppingHandler.requests], [None, None])
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), PAYLOAD)
+
+
+    @patch("xcputils.ingestion.ftp.FTP", DroppingFtp)
+    def test_ftp_resume(self):
+        """ Test FTP download resumes with REST after the connection drops """
+
+        DroppingFtp.files = {"payload.bin": PAYLOAD}
+        DroppingFtp.directories = set()
+        DroppingFtp.dropped = set()
+        DroppingFtp.rests = []
+
+        ingestor = FtpIngestor(url="ftp.mock.com", blocksize=1000) \
+            .with_resume(self.checkpoint)
+
+        with self.assertRaises(ConnectionResetError):
+            ingestor.write_to_file(self.directory)
+
+        offset = json.loads(self.checkpoint.get())["payload.bin"]
+        self.assertEqual(offset, len(PAYLOAD) // 2)
+
+        ingestor.write_to_file(self.directory)
+
+        self.assertEqual(DroppingFtp.rests, [None, offset])
+        with open(f"{self.directory}/payload.bin", "rb") as file:
+            self.assertEqual(file.read(), PAYLOAD)
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_aws_s3_parallel_resume(self, mock_get_client):
+        """ Test parallel ranged download into a file resumes after the last contiguous range """
+
+        client = mock_s3_client(PAYLOAD)
+        get_object = client.get_object.side_effect
+        failed_start = 150000
+
+        def get_object_failing(Bucket, Key, Range): # pylint: disable=invalid-name
+            if Range.startswith(f"bytes={failed_start}-"):
+                raise ConnectionResetError("Connection reset by peer")
+            return get_object(Bucket=Bucket, Key=Key, Range=Range)
+
+        client.get_object.side_effect = get_object_failing
+        mock_get_client.return_value = client
+        file_path = f"{self.directory}/payload.bin"
+
+        def ingest():
+            AwsS3Ingestor(
+                AwsS3ConnectionSettings(bucket="bucket", file_path="payload.bin"),
+                chunk_size=10000,
+                ).with_resume(self.checkpoint, interval=1).write_to_file(file_path)
+
+        with self.assertRaises(ConnectionResetError):
+            ingest()
+
+        self.assertEqual(
+            json.loads(self.checkpoint.get()),
+            {"s3://bucket/payload.bin": {"offset": failed_start, "version": '"1"'}})
+
+        client.get_object.side_effect = get_object
+        client.get_object.reset_mock()
+        ingest()
+
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), PAYLOAD)
+        self.assertEqual(client.get_object.call_count, (len(PAYLOAD) - failed_start + 9999) // 10000)
+        self.assertEqual(json.loads(self.checkpoint.get()), {})
+
+
+    @patch.object(AwsS3ConnectionSettings, "get_client")
+    def test_aws_s3_resume_changed(self, mock_get_client):
+        """ Test ranged download starts over if the object changed since it was interrupted """
+
+        client = mock_s3_client(PAYLOAD)
+        client.head_object.return_value["ETag"] = '"2"'
+        mock_get_client.return_value = client
+        file_path = f"{self.directory}/payload.bin"
+        with open(file_path, "wb") as file:
+            file.write(os.urandom(150000))
+        self.checkpoint.set(json.dumps(
+            {"s3://bucket/payload.bin": {"offset": 150000, "version": '"1"'}}))
+
+        AwsS3Ingestor(
+            AwsS3ConnectionSettings(bucket="bucket", file_path="payload.bin"),
+            chunk_size=10000,
+            ).with_resume(self.checkpoint).write_to_file(file_path)
+
+        with open(file_path, "rb") as file:
+            self.assertEqual(file.read(), PAYLOAD)
+        self.assertEqual(client.get_object.call_count, (len(PAYLOAD) + 9999) // 10000)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+""" Test StreamReader """
+
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from xcputils.streaming import StreamReader
+
+
+class BytesReader(StreamReader):
+    """ Reader writing an in-memory payload block_size bytes at a time """
+
+    def __init__(self, payload: bytes, block_size: int = 3):
+        super().__init__()
+        self.payload = payload
+        self.block_size = block_size
+
+
+    def read(self, output_stream):
+        for start in range(0, len(self.payload), self.block_size):
+            output_stream.write(self.payload[start:start + self.block_size])
+
+
+class TestStreamReader(unittest.TestCase):
+    """ Test xcputils.streaming.StreamReader """
+
+
+    def test_read_str(self):
+        """ Test read_str buffers in memory up to spool_size and spills to disk beyond """
+
+        payload = "æøå" * 100
+
+        with patch("tempfile.SpooledTemporaryFile", wraps=tempfile.SpooledTemporaryFile) as spool:
+            self.assertEqual(BytesReader(payload.encode("utf-8")).read_str(), payload)
+            self.assertEqual(
+                BytesReader(payload.encode("utf-8")).read_str(spool_size=10), payload)
+
+        self.assertEqual(
+            [call.kwargs["max_size"] for call in spool.call_args_list], [16 * 1024 * 1024, 10])
+
+
+    def test_read_str_chunks(self):
+        """ Test characters split between chunks are decoded whole """
+
+        payload = "aæøå€" * 100
+        reader = BytesReader(payload.encode("utf-8"))
+
+        chunks = list(reader.read_str_chunks(chunk_size=4, buffer_size=16))
+
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), payload)
+
+
+    def test_read_str_chunks_invalid(self):
+        """ Test invalid text at the end of the stream is reported or replaced """
+
+        reader = BytesReader("æ".encode("utf-8")[:1])
+
+        with self.assertRaises(UnicodeDecodeError):
+            list(reader.read_str_chunks())
+
+        self.assertEqual(list(reader.read_str_chunks(errors="replace")), ["�"])
+
+
+    def test_read_str_chunks_close(self):
+        """ Test closing the generator early stops the read """
+
+        chunks = BytesReader(b"x" * 1024 * 1024, block_size=1024).read_str_chunks(
+            chunk_size=1024, buffer_size=4096)
+
+        self.assertEqual(next(chunks), "x" * 1024)
+        chunks.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -15,3 +15,13 @@ class TestStringIngestor(unittest.TestCase):
         result = StringIngestor(payload).write_to_string()
 
         self.assertEqual(result, payload)
+
+
+    def test_write_to_bytes(self):
+        """ Test write_to_bytes returns the raw bytes """
+
+        payload = "æøåÆØÅ"
+        result = StringIngestor(payload).write_to_bytes()
+
+        self.assertIsInstance(result, memoryview)
+        self.assertEqual(result.tobytes(), payload.encode("utf-8"))
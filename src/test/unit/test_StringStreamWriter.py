@@ -0,0 +1,43 @@
+""" Test StringStreamWriter """
+
+import io
+import unittest
+
+from xcputils.streaming.string import StringStreamWriter
+
+
+class TestStringStreamWriter(unittest.TestCase):
+    """ Test xcputils.streaming.string.StringStreamWriter """
+
+
+    def test_write(self):
+        """ Test writes are separated by newlines and decoded once they are joined """
+
+        writer = StringStreamWriter()
+        writer.write(b"")
+        writer.write(io.BytesIO("æø".encode("utf-8")))
+        writer.write(bytearray(b"b"))
+        writer.write(io.StringIO("c"))
+
+        self.assertEqual(writer.value, "æø\nb\nc")
+        self.assertEqual(writer.get_buffer().tobytes(), "æø\nb\nc".encode("utf-8"))
+
+        writer.write(b"d")
+        self.assertEqual(writer.value, "æø\nb\nc\nd")
+
+
+    def test_write_invalid_utf8(self):
+        """ Test invalid UTF-8 is kept as written and only fails when it is decoded """
+
+        writer = StringStreamWriter()
+        writer.value = "a"
+        encoded = "å".encode("utf-8")
+        writer.write(encoded[:1])
+
+        self.assertEqual(writer.get_buffer().tobytes(), b"a\n" + encoded[:1])
+        with self.assertRaises(UnicodeDecodeError):
+            _ = writer.value
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,9 @@
 """ Unit tests """
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
 import unittest
 from xcputils.batch import Batch, async_wrap
 
@@ -24,5 +28,67 @@ class BatchTestCase(unittest.TestCase):
         self.assertEqual(result, [2, 3, 4])
 
 
+    def test_max_concurrency(self):
+        """ Test at most max_concurrency tasks run at a time """
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def task(x):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return x
+
+        async def task_async(x):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            await asyncio.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return x
+
+        batch = Batch(max_concurrency=3)
+        for i in range(20):
+            batch.append(task, i).append_async(task_async, i)
+
+        self.assertEqual(batch(), [i for i in range(20) for _ in range(2)])
+        self.assertEqual(running[1], 3)
+
+
+    def test_as_completed(self):
+        """ Test results are yielded as tasks complete, exceptions included """
+        error = ValueError("failed")
+
+        def fail():
+            raise error
+
+        batch = Batch(max_concurrency=2) \
+            .append(time.sleep, 0.2) \
+            .append(lambda: "fast") \
+            .append(fail)
+
+        results = list(batch.as_completed())
+        self.assertEqual(results, [(1, "fast"), (2, error), (0, None)])
+
+
+    def test_executor(self):
+        """ Test sync tasks run in the given executor, and are not started before the batch runs """
+        started = []
+
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="batch-test") as executor:
+            batch = Batch(executor=executor)
+            for _ in range(5):
+                batch.append(lambda: started.append(threading.current_thread().name))
+            self.assertEqual(started, [])
+            batch()
+
+        self.assertEqual(len(started), 5)
+        self.assertTrue(all(name.startswith("batch-test") for name in started))
+
+
 if __name__ == '__main__':
     unittest.main()
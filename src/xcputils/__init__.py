@@ -1,17 +1,62 @@
-""" Package xcputils """
-
-from xcputils.checkpoints import Checkpoint
-from xcputils.checkpoints.aws import AwsS3Checkpoint
-from xcputils.checkpoints.az import AdfsCheckpoint
-from xcputils.checkpoints.file import FileCheckpoint
-from xcputils.ingestion.aws import AwsS3Ingestor
-from xcputils.ingestion.az import AdfsIngestor
-from xcputils.ingestion.file import FileIngestor
-from xcputils.ingestion.ftp import FtpIngestor
-from xcputils.ingestion.http import HttpIngestor, HttpMethod, HttpRequest
-from xcputils.ingestion.string import StringIngestor
-from xcputils.streaming.aws import AwsS3ConnectionSettings
-from xcputils.streaming.az import AdfsConnectionSettings
+""" Package xcputils, connectors are imported on first use """
+
+from __future__ import annotations
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from xcputils.checkpoints import Checkpoint
+    from xcputils.checkpoints.aws import AwsS3Checkpoint
+    from xcputils.checkpoints.az import AdfsCheckpoint
+    from xcputils.checkpoints.file import FileCheckpoint
+    from xcputils.ingestion.aws import AwsS3Ingestor
+    from xcputils.ingestion.az import AdfsIngestor
+    from xcputils.ingestion.file import FileIngestor
+    from xcputils.ingestion.ftp import FtpIngestor
+    from xcputils.ingestion.http import HttpIngestor, HttpMethod, HttpRequest
+    from xcputils.ingestion.string import StringIngestor
+    from xcputils.metrics import (
+        CallbackSink, LoggingSink, Metrics, OpenTelemetrySink, PrometheusTextFileSink)
+    from xcputils.streaming.aws import AwsS3ConnectionSettings
+    from xcputils.streaming.az import AdfsConnectionSettings
+
+
+_LAZY_IMPORTS = {
+    "Checkpoint": "xcputils.checkpoints",
+    "AwsS3Checkpoint": "xcputils.checkpoints.aws",
+    "AdfsCheckpoint": "xcputils.checkpoints.az",
+    "FileCheckpoint": "xcputils.checkpoints.file",
+    "AwsS3Ingestor": "xcputils.ingestion.aws",
+    "AdfsIngestor": "xcputils.ingestion.az",
+    "FileIngestor": "xcputils.ingestion.file",
+    "FtpIngestor": "xcputils.ingestion.ftp",
+    "HttpIngestor": "xcputils.ingestion.http",
+    "HttpMethod": "xcputils.ingestion.http",
+    "HttpRequest": "xcputils.ingestion.http",
+    "StringIngestor": "xcputils.ingestion.string",
+    "CallbackSink": "xcputils.metrics",
+    "LoggingSink": "xcputils.metrics",
+    "Metrics": "xcputils.metrics",
+    "OpenTelemetrySink": "xcputils.metrics",
+    "PrometheusTextFileSink": "xcputils.metrics",
+    "AwsS3ConnectionSettings": "xcputils.streaming.aws",
+    "AdfsConnectionSettings": "xcputils.streaming.az",
+    }
+
+
+def __getattr__(name: str):
+    """ Import connector classes on first access """
+
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY_IMPORTS))
 
 
 class XCPUtils():
@@ -21,30 +66,36 @@ class XCPUtils():
     def read_from_string(self, data: str) -> StringIngestor:
         """ Ingest from string """
 
+        from xcputils.ingestion.string import StringIngestor # pylint: disable=import-outside-toplevel
+
         return StringIngestor(data)
 
 
     def read_from_file(self, file_path: str) -> FileIngestor:
         """ Ingest from file """
 
+        from xcputils.ingestion.file import FileIngestor # pylint: disable=import-outside-toplevel
+
         return FileIngestor(file_path=file_path)
 
 
     def read_from_http(
         self,
         url: str,
-        method: HttpMethod = HttpMethod.GET,
+        method: HttpMethod = None,
         params: dict = None,
         body: dict = None,
         headers: dict = None,
         auth = None,
         ) -> HttpIngestor:
-        """ Ingest from HTTP """
+        """ Ingest from HTTP, GET if method is None """
+
+        from xcputils.ingestion.http import HttpIngestor, HttpMethod, HttpRequest # pylint: disable=import-outside-toplevel
 
         return HttpIngestor(
             http_request=HttpRequest(
                 url=url,
-                method=method,
+                method=method if method else HttpMethod.GET,
                 params=params,
                 body=body,
                 headers=headers,
@@ -55,13 +106,21 @@ class XCPUtils():
     def read_from_aws_s3(
         self,
         bucket: str,
-        file_path: str,
+        file_path: str = None,
         aws_access_key_id: str = None,
         aws_secret_access_key: str = None,
         aws_session_token: str = None,
         aws_region_name: str = None,
+        prefix: str = None,
+        pattern: str = None,
+        max_concurrency: int = 1,
     ) -> AwsS3Ingestor:
-        """ Ingest from AWS S3 """
+        """ Ingest from AWS S3, the object at file_path or the objects under prefix
+        matching pattern, max_concurrency at a time """
+
+        # pylint: disable=import-outside-toplevel
+        from xcputils.ingestion.aws import AwsS3Ingestor
+        from xcputils.streaming.aws import AwsS3ConnectionSettings
 
         return AwsS3Ingestor(
             connection_settings=AwsS3ConnectionSettings(
@@ -71,7 +130,10 @@ class XCPUtils():
                 aws_secret_access_key=aws_secret_access_key,
                 aws_session_token=aws_session_token,
                 aws_region_name=aws_region_name,
-            )
+            ),
+            prefix=prefix,
+            pattern=pattern,
+            max_concurrency=max_concurrency,
         )
 
 
@@ -84,8 +146,15 @@ class XCPUtils():
         tenant_id: str = None,
         client_id: str = None,
         client_secret: str = None,
+        pattern: str = None,
+        max_concurrency: int = 1,
     ) -> AdfsIngestor:
-        """ Ingest from AWS S3 """
+        """ Ingest from Azure Data Lake Storage, the file file_name or, if file_name is None,
+        the files under directory matching pattern, max_concurrency at a time """
+
+        # pylint: disable=import-outside-toplevel
+        from xcputils.ingestion.az import AdfsIngestor
+        from xcputils.streaming.az import AdfsConnectionSettings
 
         return AdfsIngestor(
             connection_settings=AdfsConnectionSettings(
@@ -96,7 +165,9 @@ class XCPUtils():
                 tenant_id=tenant_id,
                 client_id=client_id,
                 client_secret=client_secret
-            )
+            ),
+            pattern=pattern,
+            max_concurrency=max_concurrency,
         )
 
 
@@ -107,20 +178,26 @@ class XCPUtils():
         file_name: str = None,
         user: str = None,
         password: str = None,
+        max_connections: int = 1,
     ) -> FtpIngestor:
         """ Ingest frm FTP """
 
+        from xcputils.ingestion.ftp import FtpIngestor # pylint: disable=import-outside-toplevel
+
         return FtpIngestor(
             url=url,
             folder=folder,
             file_name=file_name,
             user=user,
             password=password,
+            max_connections=max_connections,
             )
 
     def get_checkpoint_file(self, name: str, directory: str) -> Checkpoint:
         """ Get file checkpoint """
 
+        from xcputils.checkpoints.file import FileCheckpoint # pylint: disable=import-outside-toplevel
+
         return FileCheckpoint(name=name,directory=directory)
 
 
@@ -136,6 +213,8 @@ class XCPUtils():
         ) -> Checkpoint:
         """ Get ADFS checkpoint """
 
+        from xcputils.checkpoints.az import AdfsCheckpoint # pylint: disable=import-outside-toplevel
+
         return AdfsCheckpoint(
             name=name,
             container=container,
@@ -159,6 +238,8 @@ class XCPUtils():
         ):
         """ Get AWS S3 checkpoint """
 
+        from xcputils.checkpoints.aws import AwsS3Checkpoint # pylint: disable=import-outside-toplevel
+
         return AwsS3Checkpoint(
             name=name,
             bucket=bucket,
@@ -2,7 +2,8 @@
 
 from __future__ import annotations
 import asyncio
-from typing import Coroutine, Callable
+from concurrent.futures import Executor
+from typing import Any, Coroutine, Callable, Iterator, Tuple
 from functools import wraps, partial
 import nest_asyncio
 
@@ -18,34 +19,79 @@ def async_wrap(func):
 
 
 class Batch(list[Callable]):
-    """ Runs tasks in batches asynchronously """
+    """ Runs tasks in batches asynchronously, at most max_concurrency at a time.
+    Sync tasks run in executor, the default thread pool if None """
+
+
+    def __init__(self, max_concurrency: int = None, executor: Executor = None):
+        super().__init__()
+        self.max_concurrency = max_concurrency
+        self.executor = executor
 
 
     def append(self, task: Callable, *args, **kwargs) -> Batch:
-        """ Append task """
-        atask = async_wrap(task)
-        super().append(atask(*args, **kwargs))
+        """ Append task, it is not started or wrapped until the batch runs """
+        super().append(partial(task, *args, **kwargs))
         return self
 
 
-    def append_async(self, task: Coroutine) -> Batch:
-        """ Append async task """
-        super().append(task)
+    def append_async(self, task: Coroutine | Callable[..., Coroutine], *args, **kwargs) -> Batch:
+        """ Append async task, a coroutine or a coroutine function called when the batch runs """
+        super().append(partial(task, *args, **kwargs) if callable(task) else task)
         return self
 
 
-    async def __execute_in_parrallel(self) -> Coroutine:
-        tasks = []
-        for coroutine in self:
-            tasks.append(coroutine)
-        return await asyncio.gather(*tasks, return_exceptions=True)        
+    async def __run(self, task) -> Any:
+        if asyncio.iscoroutine(task):
+            return await task
+        if asyncio.iscoroutinefunction(task):
+            return await task()
+        return await asyncio.get_running_loop().run_in_executor(self.executor, task)
 
 
-    def __call__(self):
+    def as_completed(self) -> Iterator[Tuple[int, Any]]:
+        """ Run tasks and yield (index, result) as each task completes,
+        exceptions are yielded as results """
+
         nest_asyncio.apply()
-        asyncio.set_event_loop(asyncio.new_event_loop())
-        return asyncio.get_event_loop().run_until_complete(self.__execute_in_parrallel())
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+
+        tasks = enumerate(self)
+        pending = {}
+        limit = self.max_concurrency if self.max_concurrency else len(self)
+
+        def start_tasks():
+            while len(pending) < limit:
+                next_task = next(tasks, None)
+                if next_task is None:
+                    return
+                index, task = next_task
+                pending[loop.create_task(self.__run(task))] = index
+
+        try:
+            start_tasks()
+            while pending:
+                done, _ = loop.run_until_complete(
+                    asyncio.wait(pending.keys(), return_when=asyncio.FIRST_COMPLETED))
+                for future in done:
+                    index = pending.pop(future)
+                    yield index, future.exception() or future.result()
+                start_tasks()
+        finally:
+            for future in pending:
+                future.cancel()
+            if pending:
+                loop.run_until_complete(
+                    asyncio.gather(*pending.keys(), return_exceptions=True))
+
+
+    def __call__(self):
+        results = [None] * len(self)
+        for index, result in self.as_completed():
+            results[index] = result
+        return results
 
 
     def __repr__(self):
-        return f"{self.__class__.__name__}({list.__repr__(self)})" 
+        return f"{self.__class__.__name__}({list.__repr__(self)})"
@@ -1,14 +1,316 @@
 """ Checkpoints """
 
+import io
+import json
+import threading
+from typing import Any, Tuple
+
+
+DEFAULT_OFFSET_INTERVAL = 64 * 1024 * 1024
+
+_STATE_LOCK_LOCK = threading.Lock()
+
+
+class CheckpointConflictError(Exception):
+    """ Conditional checkpoint write failed because the checkpoint changed since it was read """
+
+
 class Checkpoint:
-    """ Checkpoint base class """
+    """ Checkpoint base class, stores implement _read and _write, the value last read or
+    written is cached so get does not read the store again unless refresh """
+
+    _state = None
+    _state_rlock = None
+
+
+    def __init__(self):
+        """ Constructor """
+
+        self._state = None
+        self._state_rlock = threading.RLock()
+
+
+    @property
+    def _state_lock(self) -> threading.RLock:
+        """ Lock of the cached state, created on first use for subclasses not calling __init__ """
+
+        if self._state_rlock is None:
+            with _STATE_LOCK_LOCK:
+                if self._state_rlock is None:
+                    self._state_rlock = threading.RLock()
+        return self._state_rlock
+
+
+    def supports_compare_and_set(self) -> bool:
+        """ Check if the store implements _read and _write, subclasses overriding only get and
+        set do not """
+
+        return type(self)._read is not Checkpoint._read \
+            and type(self)._write is not Checkpoint._write
+
+
+    def get(self, default: str = None, refresh: bool = False) -> str:
+        """ Get checkpoint, default if it is not set or empty """
+
+        value, _ = self.__get_state(refresh)
+
+        return value if value else default
 
-    def get(self, default: str = None) -> str:
-        """ Get checkpoint """
 
     def set(self, value: str):
         """ Set checkpoint """
 
+        with self._state_lock:
+            self._state = None
+            self._state = (value, self._write(value))
+
+
+    def compare_and_set(self, expected: str, value: str) -> bool:
+        """ Set checkpoint to value if it is expected, None or empty if it is not set,
+        False if the checkpoint has another value or was changed concurrently """
+
+        with self._state_lock:
+            state = self.__get_state(refresh=False)
+            if (state[0] or None) != (expected or None):
+                state = self.__get_state(refresh=True)
+                if (state[0] or None) != (expected or None):
+                    return False
+
+            try:
+                version = self._write(value, state)
+            except CheckpointConflictError:
+                self._state = None
+                return False
+
+            self._state = (value, version)
+            return True
+
+
     def reset(self):
         """ Reset checkpoint """
-        self.set("")        
+        self.set("")
+
+
+    def _read(self) -> Tuple[str, str]:
+        """ Read (value, version) from the store, value None if the checkpoint does not exist """
+
+        raise NotImplementedError(f"{type(self).__name__} does not support reads")
+
+
+    def _write(self, value: str, expected: Tuple[str, str] = None) -> str:
+        """ Write value to the store and return its version, if expected is given only if the
+        store still holds that (value, version), else raise CheckpointConflictError """
+
+        raise NotImplementedError(f"{type(self).__name__} does not support writes")
+
+
+    def __get_state(self, refresh: bool) -> Tuple[str, str]:
+        with self._state_lock:
+            if refresh or self._state is None:
+                self._state = self._read()
+            return self._state
+
+
+class OffsetCheckpoint:
+    """ Byte offsets of partially written transfers, stored as JSON in a checkpoint
+    with the version of the source they were read from if it is known """
+
+    def __init__(self, checkpoint: Checkpoint, interval: int = DEFAULT_OFFSET_INTERVAL):
+        """ Constructor, offsets are persisted at most every interval bytes per transfer """
+
+        self.checkpoint = checkpoint
+        self.interval = interval
+        self._offsets = None
+        self._versions = {}
+        self._saved = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, key: str) -> int:
+        """ Get offset of transfer, 0 if not started or completed """
+
+        with self._lock:
+            return self.__load().get(key, 0)
+
+
+    def get_version(self, key: str) -> str:
+        """ Get version of the source of transfer, None if unknown """
+
+        with self._lock:
+            self.__load()
+            return self._versions.get(key)
+
+
+    def set_version(self, key: str, version: str):
+        """ Set version of the source of transfer, persisted with its offset,
+        None if the source has no version a transfer can be resumed against """
+
+        with self._lock:
+            self.__load()
+            if version is None:
+                self._versions.pop(key, None)
+            else:
+                self._versions[key] = version
+
+
+    def set(self, key: str, offset: int, force: bool = False):
+        """ Set offset of transfer, persisted if force or interval bytes since last persisted """
+
+        with self._lock:
+            offsets = self.__load()
+            offsets[key] = offset
+            if force or abs(offset - self._saved.get(key, 0)) >= self.interval:
+                self._saved[key] = offset
+                self.checkpoint.set(self.__dump())
+
+
+    def remove(self, key: str):
+        """ Remove offset of completed transfer """
+
+        with self._lock:
+            offsets = self.__load()
+            self._versions.pop(key, None)
+            if key in offsets or key in self._saved:
+                offsets.pop(key, None)
+                self._saved.pop(key, None)
+                self.checkpoint.set(self.__dump())
+
+
+    def track(self, key: str, stream: Any, offset: int) -> "OffsetTrackingStream":
+        """ Wrap stream read from offset, so offsets are set as a writer consumes it """
+
+        return OffsetTrackingStream(self, key, stream, offset)
+
+
+    def __load(self) -> dict:
+        if self._offsets is None:
+            value = self.checkpoint.get(default="")
+            self._offsets = {}
+            self._versions = {}
+            for key, entry in (json.loads(value) if value else {}).items():
+                if isinstance(entry, dict):
+                    self._offsets[key] = entry["offset"]
+                    if entry.get("version") is not None:
+                        self._versions[key] = entry["version"]
+                else:
+                    self._offsets[key] = entry
+            self._saved = dict(self._offsets)
+        return self._offsets
+
+
+    def __dump(self) -> str:
+        return json.dumps({
+            key: {"offset": offset, "version": self._versions[key]}
+                if key in self._versions else offset
+            for key, offset in self._offsets.items()
+            })
+
+
+class ManifestCheckpoint:
+    """ Versions of ingested sources, e.g. ETags, modification times or high-water marks,
+    stored as JSON in a checkpoint """
+
+    def __init__(self, checkpoint: Checkpoint):
+        """ Constructor """
+
+        self.checkpoint = checkpoint
+        self._value = None
+        self._versions = None
+        self._updated = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, key: str, default: str = None) -> str:
+        """ Get version of source at the end of the last saved run """
+
+        with self._lock:
+            return self.__load().get(key, default)
+
+
+    def is_changed(self, key: str, version: str) -> bool:
+        """ Check if source has changed since the last saved run, unknown versions are changed """
+
+        return version is None or self.get(key) != version
+
+
+    def update(self, key: str, version: str):
+        """ Stage new version of source, persisted by save """
+
+        with self._lock:
+            self._updated[key] = version
+
+
+    def save(self):
+        """ Persist staged versions in a single checkpoint write, merged into versions saved
+        concurrently by other runs if the checkpoint supports compare_and_set """
+
+        with self._lock:
+            if not self._updated:
+                return
+            while True:
+                versions = dict(self.__load())
+                versions.update(self._updated)
+                value = json.dumps(versions)
+                if self.__store(value):
+                    break
+                self._versions = None
+            self._value = value
+            self._versions = versions
+            self._updated = {}
+
+
+    def __store(self, value: str) -> bool:
+        if not self.checkpoint.supports_compare_and_set():
+            self.checkpoint.set(value)
+            return True
+
+        try:
+            return self.checkpoint.compare_and_set(self._value, value)
+        except NotImplementedError:
+            self.checkpoint.set(value)
+            return True
+
+
+    def __load(self) -> dict:
+        if self._versions is None:
+            self._value = self.checkpoint.get(default="")
+            self._versions = json.loads(self._value) if self._value else {}
+        return self._versions
+
+
+class OffsetTrackingStream(io.RawIOBase):
+    """ Stream that sets the offset of the bytes a writer has consumed before each read,
+    assuming the writer writes what it reads before reading again """
+
+    def __init__(self, offsets: OffsetCheckpoint, key: str, stream: Any, offset: int):
+        super().__init__()
+        self.offsets = offsets
+        self.key = key
+        self.stream = stream
+        self.committed = offset
+        self.position = offset
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def readinto(self, buffer) -> int:
+        self.committed = self.position
+        self.offsets.set(self.key, self.committed)
+
+        if hasattr(self.stream, "readinto"):
+            size = self.stream.readinto(buffer)
+        else:
+            data = self.stream.read(len(buffer))
+            size = len(data)
+            buffer[:size] = data
+
+        self.position += size or 0
+        return size
+
+
+    def save(self):
+        """ Persist the offset of the bytes consumed before the last read """
+
+        self.offsets.set(self.key, self.committed, force=True)
@@ -1,13 +1,13 @@
-""" ADFS Checkpoint """
+""" AWS S3 Checkpoint """
 
-from xcputils.checkpoints import Checkpoint
-from xcputils.ingestion.aws import AwsS3Ingestor
-from xcputils.ingestion.string import StringIngestor
-from xcputils.streaming.aws import AwsS3ConnectionSettings, AwsS3StreamWriter
+from typing import Tuple
+
+from xcputils.checkpoints import Checkpoint, CheckpointConflictError
+from xcputils.streaming.aws import AwsS3ConnectionSettings
 
 
 class AwsS3Checkpoint(Checkpoint):
-    """ ADFS Checkpoint """
+    """ AWS S3 Checkpoint, compare_and_set uses conditional writes on the ETag of the object """
 
     def __init__(
         self,
@@ -20,6 +20,7 @@ class AwsS3Checkpoint(Checkpoint):
         aws_region_name: str = None,
         ):
         """ Constructor """
+        super().__init__()
         self.awss3_connection_settings = AwsS3ConnectionSettings(
             bucket=bucket,
             file_path=f"{directory}/{name}.json",
@@ -29,18 +30,45 @@ class AwsS3Checkpoint(Checkpoint):
             aws_region_name=aws_region_name,
             )
 
-    def get(self, default: str = None):
-        """ Get checkpoint """
+
+    def _read(self) -> Tuple[str, str]:
+        from botocore.exceptions import ClientError # pylint: disable=import-outside-toplevel
+
+        try:
+            response = self.awss3_connection_settings.get_client().get_object(
+                Bucket=self.awss3_connection_settings.bucket,
+                Key=self.awss3_connection_settings.file_path)
+        except ClientError as error:
+            if error.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None, None
+            raise
+
+        with response["Body"] as body:
+            return body.read().decode("utf-8"), response["ETag"]
+
+
+    def _write(self, value: str, expected: Tuple[str, str] = None) -> str:
+        from botocore.exceptions import ClientError # pylint: disable=import-outside-toplevel
+
+        kwargs = {}
+        if expected is not None:
+            if expected[0] is None:
+                kwargs["IfNoneMatch"] = "*"
+            else:
+                kwargs["IfMatch"] = expected[1]
+
         try:
-            checkpoint = AwsS3Ingestor(self.awss3_connection_settings).write_to_string()
-        except:
-            checkpoint = ""
-        
-        if checkpoint == "":
-            checkpoint = default
-
-        return checkpoint
-
-    def set(self, value: str):
-        """ Set checkpoint """
-        StringIngestor(value, AwsS3StreamWriter(self.awss3_connection_settings)).ingest()
+            response = self.awss3_connection_settings.get_client().put_object(
+                Bucket=self.awss3_connection_settings.bucket,
+                Key=self.awss3_connection_settings.file_path,
+                Body=value.encode("utf-8"),
+                **kwargs)
+        except ClientError as error:
+            if kwargs and error.response.get("Error", {}).get("Code") in (
+                    "PreconditionFailed", "ConditionalRequestConflict", "412", "409"):
+                raise CheckpointConflictError(
+                    f"{self.awss3_connection_settings.file_path} changed since it was read") \
+                    from error
+            raise
+
+        return response.get("ETag")
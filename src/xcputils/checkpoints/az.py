@@ -1,13 +1,13 @@
 """ ADFS Checkpoint """
 
-from xcputils.checkpoints import Checkpoint
-from xcputils.ingestion.az import AdfsConnectionSettings, AdfsIngestor
-from xcputils.ingestion.string import StringIngestor
-from xcputils.streaming.az import AdfsStreamWriter
+from typing import Tuple
+
+from xcputils.checkpoints import Checkpoint, CheckpointConflictError
+from xcputils.streaming.az import AdfsConnectionSettings
 
 
 class AdfsCheckpoint(Checkpoint):
-    """ ADFS Checkpoint """
+    """ ADFS Checkpoint, compare_and_set uses conditional writes on the ETag of the file """
 
     def __init__(
         self,
@@ -20,6 +20,7 @@ class AdfsCheckpoint(Checkpoint):
         client_secret: str = None,
         ):
         """ Constructor """
+        super().__init__()
         self.adfs_connection_settings = AdfsConnectionSettings(
             container=container,
             file_name=f"{name}.json",
@@ -29,20 +30,53 @@ class AdfsCheckpoint(Checkpoint):
             client_id=client_id,
             client_secret=client_secret,
             )
+        self._file_system_exists = False
+
+
+    def _read(self) -> Tuple[str, str]:
+        from azure.core.exceptions import ResourceNotFoundError # pylint: disable=import-outside-toplevel
+
+        try:
+            downloader = self.adfs_connection_settings.get_file_client().download_file()
+        except ResourceNotFoundError:
+            return None, None
+
+        return downloader.readall().decode("utf-8"), downloader.properties.etag
+
+
+    def _write(self, value: str, expected: Tuple[str, str] = None) -> str:
+        # pylint: disable=import-outside-toplevel
+        from azure.core import MatchConditions
+        from azure.core.exceptions import ResourceExistsError, ResourceModifiedError
+
+        kwargs = {"overwrite": True}
+        if expected is not None:
+            if expected[0] is None:
+                kwargs = {"overwrite": False}
+            else:
+                kwargs.update(etag=expected[1], match_condition=MatchConditions.IfNotModified)
+
+        self.__create_file_system()
 
-    def get(self, default: str = None):
-        """ Get checkpoint """
         try:
-            checkpoint = AdfsIngestor(self.adfs_connection_settings).write_to_string()
-        except:
-            checkpoint = ""
-        
-        if checkpoint == "":
-            checkpoint = default
-
-        return checkpoint
-    
-
-    def set(self, value: str):
-        """ Set checkpoint """
-        StringIngestor(value, AdfsStreamWriter(self.adfs_connection_settings)).ingest()
+            response = self.adfs_connection_settings.get_file_client().upload_data(
+                value.encode("utf-8"), **kwargs)
+        except (ResourceExistsError, ResourceModifiedError) as error:
+            if expected is None:
+                raise
+            raise CheckpointConflictError(
+                f"{self.adfs_connection_settings.get_path()} changed since it was read") from error
+
+        return response.get("etag")
+
+
+    def __create_file_system(self):
+        if self._file_system_exists:
+            return
+
+        client = self.adfs_connection_settings.get_client()
+        file_system_client = client.get_file_system_client(
+            file_system=self.adfs_connection_settings.container)
+        if not file_system_client.exists():
+            client.create_file_system(file_system=self.adfs_connection_settings.container)
+        self._file_system_exists = True
@@ -1,13 +1,26 @@
 """ File Checkpoint """
 
-from xcputils.checkpoints import Checkpoint
-from xcputils.ingestion.file import FileIngestor
-from xcputils.ingestion.string import StringIngestor
-from xcputils.streaming.file import FileStreamWriter
+from contextlib import contextmanager
+import os
+import tempfile
+import threading
+from typing import Tuple
+
+from xcputils.checkpoints import Checkpoint, CheckpointConflictError
+
+try:
+    import fcntl
+except ImportError: # pragma: no cover, e.g. on Windows
+    fcntl = None
+
+
+_lock = threading.Lock()
 
 
 class FileCheckpoint(Checkpoint):
-    """ File Checkpoint """
+    """ File Checkpoint, written to a temporary file that replaces the checkpoint file, so
+    readers never see a partial write. compare_and_set locks {file_path}.lock where the
+    platform supports it, else it is only atomic within the process """
 
     def __init__(
         self,
@@ -15,20 +28,66 @@ class FileCheckpoint(Checkpoint):
         directory: str,
         ):
         """ Constructor """
+        super().__init__()
         self.file_path=f"{directory}/{name}.json"
 
-    def get(self, default: str = None) -> str:
-        """ Get checkpoint """
+
+    def _read(self) -> Tuple[str, str]:
         try:
-            checkpoint = FileIngestor(self.file_path).write_to_string()
-        except:
-            checkpoint = ""
-        
-        if checkpoint == "":
-            checkpoint = default
-
-        return checkpoint
-
-    def set(self, value: str):
-        """ Set checkpoint """
-        StringIngestor(value, FileStreamWriter(self.file_path)).ingest()
+            with open(self.file_path, "rb") as file:
+                return file.read().decode("utf-8"), None
+        except FileNotFoundError:
+            return None, None
+
+
+    def _write(self, value: str, expected: Tuple[str, str] = None) -> str:
+        directory = os.path.dirname(self.file_path) or "."
+        os.makedirs(directory, exist_ok=True)
+
+        if expected is None:
+            self.__replace(directory, value)
+            return None
+
+        with self.__locked():
+            current, _ = self._read()
+            if (current or None) != (expected[0] or None):
+                raise CheckpointConflictError(f"{self.file_path} changed since it was read")
+            self.__replace(directory, value)
+            return None
+
+
+    def __replace(self, directory: str, value: str):
+        with tempfile.NamedTemporaryFile(
+                "wb",
+                dir=directory,
+                prefix=f".{os.path.basename(self.file_path)}.",
+                suffix=".tmp",
+                delete=False) as file:
+            try:
+                file.write(value.encode("utf-8"))
+                file.flush()
+                os.fsync(file.fileno())
+            except BaseException:
+                file.close()
+                os.remove(file.name)
+                raise
+
+        try:
+            os.replace(file.name, self.file_path)
+        except BaseException:
+            os.remove(file.name)
+            raise
+
+
+    @contextmanager
+    def __locked(self):
+        with _lock:
+            if fcntl is None:
+                yield
+                return
+            with open(f"{self.file_path}.lock", "a", encoding="utf-8") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -1,9 +1,16 @@
 """ Ingestors """
 
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+import time
+from typing import Any, Callable, Iterable
 
-from xcputils.streaming import StreamWriter
-from xcputils.streaming.aws import AwsS3ConnectionSettings, AwsS3StreamWriter
-from xcputils.streaming.az import AdfsConnectionSettings, AdfsStreamWriter
+from xcputils.checkpoints import (
+    Checkpoint, ManifestCheckpoint, OffsetCheckpoint, DEFAULT_OFFSET_INTERVAL)
+from xcputils.metrics import Metrics, MetricsSink
+from xcputils.streaming import StreamReader, StreamWriter
+from xcputils.streaming.aws import AwsS3ConnectionSettings, AwsS3StreamWriter, AwsS3TransferConfig
+from xcputils.streaming.az import AdfsConnectionSettings, AdfsStreamWriter, AdfsTransferConfig
 from xcputils.streaming.file import FileStreamWriter
 from xcputils.streaming.string import StringStreamWriter
 
@@ -15,6 +22,171 @@ class Ingestor():
         """ Constructor """
 
         self.stream_writer = stream_writer
+        self.offset_checkpoint = None
+        self.manifest = None
+        self.metrics = None
+
+
+    def with_resume(
+        self,
+        checkpoint: Checkpoint,
+        interval: int = DEFAULT_OFFSET_INTERVAL) -> "Ingestor":
+        """ Resume failed transfers from byte offsets stored in checkpoint every interval bytes,
+        the writer must support append, e.g. FileStreamWriter, or it starts over. Transfers
+        also start over if the ETag or modification time of the source changed """
+
+        self.offset_checkpoint = OffsetCheckpoint(checkpoint, interval=interval)
+
+        return self
+
+
+    def with_incremental(self, checkpoint: Checkpoint) -> "Ingestor":
+        """ Only copy sources that changed since the last run, versions of copied sources
+        are stored in checkpoint at the end of each run """
+
+        self.manifest = ManifestCheckpoint(checkpoint)
+
+        return self
+
+
+    def with_metrics(self, *sinks: MetricsSink) -> "Ingestor":
+        """ Emit transfer events to sinks, callables are called with each event """
+
+        self.metrics = Metrics(*sinks, ingestor=type(self).__name__)
+
+        return self
+
+
+    def get_resume_offset(self, stream_writer: StreamWriter, key: str, version: str = None) -> int:
+        """ Get offset to resume transfer identified by key from. If the version of the source
+        is given, it is stored with the offset and a transfer of another version starts over """
+
+        if not self.offset_checkpoint:
+            return 0
+
+        offset = stream_writer.get_resume_offset(self.offset_checkpoint.get(key))
+
+        if version is not None:
+            if offset and self.offset_checkpoint.get_version(key) != version:
+                offset = 0
+            self.offset_checkpoint.set_version(key, version)
+
+        return offset
+
+
+    def write(self, stream_writer: StreamWriter, input_stream: Any, **attributes):
+        """ Write input_stream, emitting the phases of the transfer if metrics are enabled """
+
+        if not self.metrics:
+            stream_writer.write(input_stream)
+            return
+
+        with self.metrics.meter_stream(
+                input_stream, writer=type(stream_writer).__name__, **attributes) as stream:
+            stream_writer.write(stream)
+
+
+    def write_resumable(self, stream_writer: StreamWriter, input_stream: Any, offset: int, key: str):
+        """ Write input_stream, read from offset, tracking the offset if resume is enabled """
+
+        if not self.offset_checkpoint:
+            self.write(stream_writer, input_stream, key=key)
+            return
+
+        tracked_stream = self.offset_checkpoint.track(key, input_stream, offset)
+        try:
+            if self.metrics:
+                with self.metrics.meter_stream(
+                        tracked_stream, writer=type(stream_writer).__name__, key=key,
+                        offset=offset) as stream:
+                    stream_writer.append(stream, offset)
+            else:
+                stream_writer.append(tracked_stream, offset)
+        except BaseException:
+            tracked_stream.save()
+            raise
+
+        self.offset_checkpoint.remove(key)
+
+
+    def ingest_each(self, items: Iterable, ingest_item: Callable[[Any], None], max_concurrency: int = 1):
+        """ Call ingest_item for each item while items are enumerated, at most max_concurrency
+        at a time and at most max_concurrency more items taken ahead, the first error is raised """
+
+        if max_concurrency <= 1:
+            for item in items:
+                ingest_item(item)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            pending = set()
+            try:
+                for item in items:
+                    if len(pending) >= 2 * max_concurrency:
+                        started = time.perf_counter()
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        if self.metrics:
+                            self.metrics.emit(
+                                "pool_wait", time.perf_counter() - started, pool="ingest_each")
+                        for future in done:
+                            future.result()
+                    pending.add(executor.submit(ingest_item, item))
+
+                for future in pending:
+                    future.result()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+    def copy_resumable(
+        self,
+        stream_writer: StreamWriter,
+        stream_reader: StreamReader,
+        offset: int,
+        key: str) -> bool:
+        """ Copy with stream_writer.copy_from, tracking the offset if resume is enabled,
+        False if the writer cannot copy directly """
+
+        if not self.metrics:
+            return self.__copy_resumable(stream_writer, stream_reader, offset, key)
+
+        started = time.perf_counter()
+        copied = self.__copy_resumable(stream_writer, stream_reader, offset, key)
+        if copied:
+            self.metrics.emit(
+                "copy", time.perf_counter() - started, key=key,
+                reader=type(stream_reader).__name__, writer=type(stream_writer).__name__)
+
+        return copied
+
+
+    def __copy_resumable(
+        self,
+        stream_writer: StreamWriter,
+        stream_reader: StreamReader,
+        offset: int,
+        key: str) -> bool:
+
+        if not self.offset_checkpoint:
+            return stream_writer.copy_from(stream_reader)
+
+        committed = [offset]
+
+        def progress(copied: int):
+            committed[0] = copied
+            self.offset_checkpoint.set(key, copied)
+
+        try:
+            copied = stream_writer.copy_from(stream_reader, offset, progress)
+        except BaseException:
+            self.offset_checkpoint.set(key, committed[0], force=True)
+            raise
+
+        if copied:
+            self.offset_checkpoint.remove(key)
+
+        return copied
 
 
     def write_to_aws_s3(
@@ -24,7 +196,8 @@ class Ingestor():
         aws_access_key_id: str = None,
         aws_secret_access_key: str = None,
         aws_session_token: str = None,
-        aws_region_name: str = None):
+        aws_region_name: str = None,
+        transfer_config: AwsS3TransferConfig = None):
         """ Write to AWS S3 """
 
         aws_s3_connection_settings = AwsS3ConnectionSettings(
@@ -33,11 +206,12 @@ class Ingestor():
             aws_access_key_id=aws_access_key_id,
             aws_secret_access_key=aws_secret_access_key,
             aws_session_token=aws_session_token,
-            aws_region_name=aws_region_name)
+            aws_region_name=aws_region_name,
+            transfer_config=transfer_config)
 
         self.stream_writer = AwsS3StreamWriter(aws_s3_connection_settings)
 
-        self.ingest()
+        self.__ingest_and_flush()
 
 
     def write_to_adfs(
@@ -49,6 +223,7 @@ class Ingestor():
         tenant_id: str = None,
         client_id: str = None,
         client_secret: str = None,
+        transfer_config: AdfsTransferConfig = None,
         ):
         """ Write to Azure Data Lake Storage """
         adfs_connection_settings = AdfsConnectionSettings(
@@ -59,32 +234,58 @@ class Ingestor():
             tenant_id=tenant_id,
             client_id=client_id,
             client_secret=client_secret,
+            transfer_config=transfer_config,
             )
 
         self.stream_writer = AdfsStreamWriter(adfs_connection_settings)
 
-        self.ingest()
+        self.__ingest_and_flush()
 
 
     def write_to_string(
         self,
         ) -> str:
-        """ Write to Azure Data Lake Storage """
+        """ Write to string """
 
         self.stream_writer = StringStreamWriter()
 
-        self.ingest()
+        self.__ingest_and_flush()
 
         return self.stream_writer.value
 
 
+    def write_to_bytes(self) -> memoryview:
+        """ Write to memory, the raw bytes are returned without decoding """
+
+        self.stream_writer = StringStreamWriter()
+
+        self.__ingest_and_flush()
+
+        return self.stream_writer.get_buffer()
+
+
     def write_to_file(self, file_path: str):
         """ Write to file """
 
         self.stream_writer = FileStreamWriter(file_path=file_path)
 
-        self.ingest()
+        self.__ingest_and_flush()
+
+
+    def __ingest_and_flush(self):
+        try:
+            self.ingest()
+        finally:
+            if self.metrics:
+                self.metrics.flush()
 
 
     def ingest(self):
         """ Ingest """
+
+
+    async def ingest_async(self):
+        """ Ingest without blocking the event loop, runs ingest in the default executor
+        unless the ingestor has non-blocking I/O """
+
+        await asyncio.get_running_loop().run_in_executor(None, self.ingest)
@@ -1,29 +1,166 @@
 """ Ingest from AWS S3 """
 
+import asyncio
+import copy
+from fnmatch import fnmatchcase
 from io import BytesIO
+from typing import Iterator, Tuple
 from xcputils.ingestion import Ingestor
 from xcputils.streaming import StreamWriter
-from xcputils.streaming.aws import AwsS3ConnectionSettings, AwsS3StreamReader
+from xcputils.streaming.aws import AwsS3ConnectionSettings, AwsS3StreamReader, DEFAULT_CHUNK_SIZE, \
+    DEFAULT_READ_CONCURRENCY
+from xcputils.streaming.pipe import DEFAULT_BUFFER_SIZE
 
 
 class AwsS3Ingestor(Ingestor):
-    """ Ingest from AWS S3 """
+    """ Ingest from AWS S3, the object at file_path or every object under prefix
+    whose path relative to the prefix folder matches pattern, max_concurrency objects at a time
+    with read_concurrency ranged GETs each, by default the reader window """
 
     def __init__(
         self,
         connection_settings: AwsS3ConnectionSettings,
         stream_writer: StreamWriter = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        prefix: str = None,
+        pattern: str = None,
+        max_concurrency: int = 1,
+        read_concurrency: int = None,
         ):
 
         super().__init__(stream_writer)
         self.connection_settings = connection_settings
+        self.chunk_size = chunk_size
+        self.buffer_size = buffer_size
+        self.prefix = prefix
+        self.pattern = pattern
+        self.max_concurrency = max_concurrency
+        self.read_concurrency = read_concurrency
+
+
+    def list_objects(self) -> Iterator[Tuple[str, str]]:
+        """ List (key, ETag) of objects under prefix matching pattern, one page at a time """
+
+        paginator = self.connection_settings.get_client().get_paginator("list_objects_v2")
+        pages = paginator.paginate(Bucket=self.connection_settings.bucket, Prefix=self.prefix)
+
+        for page in pages:
+            for obj in page.get("Contents", []):
+                key = obj["Key"]
+                if key.endswith("/"):
+                    continue
+                if self.pattern and not fnmatchcase(self.get_relative_path(key), self.pattern):
+                    continue
+                yield key, obj.get("ETag")
+
+
+    def get_relative_path(self, key: str) -> str:
+        """ Get path of key relative to the folder of prefix """
+
+        folder = self.prefix.rpartition("/")[0]
+        return key[len(folder) + 1:] if folder else key
+
+
+    @staticmethod
+    def get_key(connection_settings: AwsS3ConnectionSettings) -> str:
+        """ Get key of the object in manifests, resume offsets and metrics """
+
+        return f"s3://{connection_settings.bucket}/{connection_settings.file_path}"
+
+
+    def size_connection_pool(self):
+        """ Grow the connection pool to the max_concurrency transfers of read_concurrency
+        ranged reads each, so they do not wait for connections """
+
+        read_concurrency = self.read_concurrency or DEFAULT_READ_CONCURRENCY
+        max_pool_connections = self.max_concurrency * read_concurrency
+        if self.connection_settings.max_pool_connections < max_pool_connections:
+            self.connection_settings = copy.copy(self.connection_settings)
+            self.connection_settings.max_pool_connections = max_pool_connections
 
 
     def ingest(self):
-        """ Ingest """
+        """ Ingest, copying server-side if the writer can, else streaming ranged GETs to the
+        writer while they download. Objects under prefix are copied max_concurrency at a time
+        while they are listed """
+
+        self.size_connection_pool()
+
+        if self.prefix is None:
+            self.__ingest_object(self.connection_settings, self.stream_writer)
+            if self.manifest:
+                self.manifest.save()
+            return
+
+        hold_filename = self.stream_writer.get_file_path()
+
+        def ingest_object(listed_object: Tuple[str, str]):
+            key, version = listed_object
+            relative_path = self.get_relative_path(key)
+            connection_settings = copy.copy(self.connection_settings)
+            connection_settings.file_path = key
+            stream_writer = self.stream_writer.for_file_path(
+                relative_path if not hold_filename else f"{hold_filename}/{relative_path}")
+            self.__ingest_object(connection_settings, stream_writer, version)
+
+        try:
+            self.ingest_each(self.list_objects(), ingest_object, self.max_concurrency)
+        finally:
+            if self.manifest:
+                self.manifest.save()
+
+
+    def __ingest_object(
+        self,
+        connection_settings: AwsS3ConnectionSettings,
+        stream_writer: StreamWriter,
+        version: str = None):
+
+        reader = AwsS3StreamReader(
+            connection_settings, chunk_size=self.chunk_size, max_concurrency=self.read_concurrency)
+        key = self.get_key(connection_settings)
+        if self.metrics:
+            reader.metrics = self.metrics.with_attributes(key=key)
+
+        if self.manifest or self.offset_checkpoint:
+            version = version or reader.get_version()
+
+        if self.manifest and not self.manifest.is_changed(key, version):
+            return
+
+        offset = self.get_resume_offset(stream_writer, key, version)
+
+        if not self.copy_resumable(stream_writer, reader, offset, key):
+            with reader.open(buffer_size=self.buffer_size, offset=offset) as stream:
+                self.write_resumable(stream_writer, stream, offset, key)
+
+        if self.manifest and version:
+            self.manifest.update(key, version)
+
+
+    async def ingest_async(self):
+        """ Ingest with non-blocking I/O, reads the object into memory. Objects under prefix
+        and transfers that resume or emit metrics are ingested in the default executor """
+
+        if self.prefix is not None or self.offset_checkpoint or self.metrics:
+            await super().ingest_async()
+            return
+
+        reader = AwsS3StreamReader(self.connection_settings)
+        key = self.get_key(self.connection_settings)
+        version = None
+
+        if self.manifest:
+            version = await asyncio.get_running_loop().run_in_executor(None, reader.get_version)
+            if not self.manifest.is_changed(key, version):
+                return
+
+        data = await reader.read_async()
+        with BytesIO(data) as stream:
+            await self.stream_writer.write_async(stream)
 
-        with BytesIO() as stream:
-            AwsS3StreamReader(self.connection_settings) \
-                .read(stream)
-            stream.seek(0)
-            self.stream_writer.write(stream)
+        if self.manifest:
+            if version:
+                self.manifest.update(key, version)
+            self.manifest.save()
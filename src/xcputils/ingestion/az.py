@@ -1,29 +1,165 @@
-""" Ingest from AWS S3 """
+""" Ingest from Azure Data Lake Storage """
 
+import asyncio
+import copy
+from fnmatch import fnmatchcase
 from io import BytesIO
+import posixpath
+from typing import Iterator, Tuple
 from xcputils.ingestion import Ingestor
 from xcputils.streaming import StreamWriter
-from xcputils.streaming.az import AdfsConnectionSettings, AdfsStreamReader
+from xcputils.streaming.az import AdfsConnectionSettings, AdfsStreamReader, DEFAULT_CHUNK_SIZE, \
+    DEFAULT_READ_CONCURRENCY
+from xcputils.streaming.pipe import DEFAULT_BUFFER_SIZE
 
 
 class AdfsIngestor(Ingestor):
-    """ Ingest from AWS S3 """
+    """ Ingest from Azure Data Lake Storage, the file file_name in directory or, if file_name
+    is None, every file under directory whose path relative to it matches pattern,
+    max_concurrency files at a time with read_concurrency ranged reads each,
+    by default the reader window """
 
     def __init__(
         self,
         connection_settings: AdfsConnectionSettings,
         stream_writer: StreamWriter = None,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        pattern: str = None,
+        max_concurrency: int = 1,
+        read_concurrency: int = None,
         ):
 
         super().__init__(stream_writer)
         self.connection_settings = connection_settings
+        self.chunk_size = chunk_size
+        self.buffer_size = buffer_size
+        self.pattern = pattern
+        self.max_concurrency = max_concurrency
+        self.read_concurrency = read_concurrency
+
+
+    def list_files(self) -> Iterator[Tuple[str, str]]:
+        """ List (path, ETag) of files under directory matching pattern, one page at a time """
+
+        file_system_client = self.connection_settings.get_client().get_file_system_client(
+            file_system=self.connection_settings.container)
+
+        for path in file_system_client.get_paths(
+                path=self.connection_settings.directory or None, recursive=True):
+            if path.is_directory:
+                continue
+            if self.pattern and not fnmatchcase(self.get_relative_path(path.name), self.pattern):
+                continue
+            yield path.name, path.etag or str(path.last_modified)
+
+
+    def get_relative_path(self, path: str) -> str:
+        """ Get path relative to directory """
+
+        directory = (self.connection_settings.directory or "").strip("/")
+        return path[len(directory) + 1:] if directory else path
+
+
+    @staticmethod
+    def get_key(connection_settings: AdfsConnectionSettings) -> str:
+        """ Get key of the file in manifests, resume offsets and metrics """
+
+        return f"{connection_settings.container}/{connection_settings.directory}/{connection_settings.file_name}"
+
+
+    def size_connection_pool(self):
+        """ Grow the connection pool to the max_concurrency transfers of read_concurrency
+        ranged reads each, so they do not wait for connections """
+
+        read_concurrency = self.read_concurrency or DEFAULT_READ_CONCURRENCY
+        max_pool_connections = self.max_concurrency * read_concurrency
+        if self.connection_settings.max_pool_connections < max_pool_connections:
+            self.connection_settings = copy.copy(self.connection_settings)
+            self.connection_settings.max_pool_connections = max_pool_connections
 
 
     def ingest(self):
-        """ Ingest """
+        """ Ingest, copying server-side if the writer can, else streaming ranged GETs to the
+        writer while they download. Files under directory are copied max_concurrency at a time
+        while they are listed """
+
+        self.size_connection_pool()
+
+        if self.connection_settings.file_name is not None:
+            self.__ingest_file(self.connection_settings, self.stream_writer)
+            if self.manifest:
+                self.manifest.save()
+            return
+
+        hold_filename = self.stream_writer.get_file_path()
+
+        def ingest_file(listed_file: Tuple[str, str]):
+            path, version = listed_file
+            relative_path = self.get_relative_path(path)
+            connection_settings = copy.copy(self.connection_settings)
+            connection_settings.directory, connection_settings.file_name = posixpath.split(path)
+            stream_writer = self.stream_writer.for_file_path(
+                relative_path if not hold_filename else f"{hold_filename}/{relative_path}")
+            self.__ingest_file(connection_settings, stream_writer, version)
+
+        try:
+            self.ingest_each(self.list_files(), ingest_file, self.max_concurrency)
+        finally:
+            if self.manifest:
+                self.manifest.save()
+
+
+    def __ingest_file(
+        self,
+        connection_settings: AdfsConnectionSettings,
+        stream_writer: StreamWriter,
+        version: str = None):
+
+        reader = AdfsStreamReader(
+            connection_settings, chunk_size=self.chunk_size, max_concurrency=self.read_concurrency)
+        key = self.get_key(connection_settings)
+        if self.metrics:
+            reader.metrics = self.metrics.with_attributes(key=key)
+
+        if self.manifest or self.offset_checkpoint:
+            version = version or reader.get_version()
+
+        if self.manifest and not self.manifest.is_changed(key, version):
+            return
+
+        offset = self.get_resume_offset(stream_writer, key, version)
+
+        if not self.copy_resumable(stream_writer, reader, offset, key):
+            with reader.open(buffer_size=self.buffer_size, offset=offset) as stream:
+                self.write_resumable(stream_writer, stream, offset, key)
+
+        if self.manifest and version:
+            self.manifest.update(key, version)
+
+
+    async def ingest_async(self):
+        """ Ingest with non-blocking I/O, reads the file into memory. Files under directory
+        and transfers that resume or emit metrics are ingested in the default executor """
+
+        if self.connection_settings.file_name is None or self.offset_checkpoint or self.metrics:
+            await super().ingest_async()
+            return
+
+        reader = AdfsStreamReader(self.connection_settings)
+        key = self.get_key(self.connection_settings)
+        version = None
+
+        if self.manifest:
+            version = await asyncio.get_running_loop().run_in_executor(None, reader.get_version)
+            if not self.manifest.is_changed(key, version):
+                return
+
+        data = await reader.read_async()
+        with BytesIO(data) as stream:
+            await self.stream_writer.write_async(stream)
 
-        with BytesIO() as stream:
-            AdfsStreamReader(self.connection_settings) \
-                .read(stream)
-            stream.seek(0)
-            self.stream_writer.write(stream)
+        if self.manifest:
+            if version:
+                self.manifest.update(key, version)
+            self.manifest.save()
@@ -22,4 +22,4 @@ class FileIngestor(Ingestor):
         """ Ingest """
 
         with open(self.file_path, "rb") as file_stream:
-            self.stream_writer.write(file_stream)
+            self.write(self.stream_writer, file_stream, key=self.file_path)
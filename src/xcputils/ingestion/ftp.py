@@ -1,9 +1,13 @@
 """ File ingestion """
 
-from ftplib import FTP
-from io import BytesIO
+from ftplib import FTP, error_perm
+from queue import Queue
+import threading
+import time
 from xcputils.ingestion import Ingestor
 from xcputils.streaming import StreamWriter
+from xcputils.streaming.ftp import FtpStreamReader, DEFAULT_BLOCKSIZE
+from xcputils.streaming.pipe import DEFAULT_BUFFER_SIZE
 
 
 class FtpIngestor(Ingestor):
@@ -17,6 +21,9 @@ class FtpIngestor(Ingestor):
         user: str = None,
         password: str = None,
         stream_writer: StreamWriter = None,
+        max_connections: int = 1,
+        blocksize: int = DEFAULT_BLOCKSIZE,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
     ):
 
         super().__init__(stream_writer)
@@ -26,37 +33,155 @@ class FtpIngestor(Ingestor):
         self.file_name = file_name
         self.user = user
         self.password = password
+        self.max_connections = max_connections
+        self.blocksize = blocksize
+        self.buffer_size = buffer_size
 
 
-    def __is_dir(self, ftp, filename):
+    def __connect(self) -> FTP:
+        ftp = FTP(host=self.url, user=self.user, passwd=self.password)
+
+        if self.folder:
+            ftp.cwd(self.folder)
+
+        return ftp
+
+
+    def __size(self, ftp, filename):
         try:
-            ftp.size(filename)
-            return False
+            return ftp.size(filename)
         except:
-            return True
+            return None
+
+
+    def __modified(self, ftp, filename):
+        try:
+            return ftp.voidcmd(f"MDTM {filename}").split()[-1]
+        except error_perm:
+            return None
+
+
+    def list_files(self, ftp: FTP) -> dict:
+        """ List files to ingest with their facts, in one MLSD call where the server supports it """
+
+        try:
+            files = {
+                name: facts
+                for name, facts in ftp.mlsd(facts=["type", "size", "modify"])
+                if facts.get("type", "").lower() == "file"
+                }
+        except error_perm:
+            sizes = {name: self.__size(ftp, name) for name in ftp.nlst()}
+            files = {
+                name: {"size": str(size)}
+                for name, size in sizes.items()
+                if size is not None
+                }
+
+        return {
+            name: facts
+            for name, facts in files.items()
+            if not self.file_name or self.file_name.lower() == name.lower()
+            }
+
+
+    def get_version(self, ftp: FTP, file_name: str, facts: dict) -> str:
+        """ Get version of file from its modification time and size, MDTM if not listed """
+
+        modified = facts.get("modify") or self.__modified(ftp, file_name)
+        size = facts.get("size")
+
+        return None if not modified and not size else f"{modified}:{size}"
 
 
     def ingest(self):
-        """ Ingest """
+        """ Ingest, downloading files in parallel over up to max_connections connections,
+        skipping files with unchanged modification time and size in incremental mode.
+        A connection whose transfer failed is closed and replaced by a new one """
 
-        ftp = FTP(host=self.url, user=self.user, passwd=self.password)
+        ftp = self.__connect()
+        connections = Queue()
+        connections.put(ftp)
+        opened = [ftp]
+        slots = [1]
+        lock = threading.Lock()
 
-        if self.folder:
-            ftp.cwd(self.folder)
+        def download(listed_file: tuple):
+            file_name, version = listed_file
+            with lock:
+                if connections.empty() and slots[0] < self.max_connections:
+                    slots[0] += 1
+                    connections.put(None)
+            started = time.perf_counter()
+            connection = connections.get()
+            if self.metrics:
+                self.metrics.emit("pool_wait", time.perf_counter() - started, pool="ftp")
+            try:
+                if connection is None:
+                    connection = self.__connect()
+                    with lock:
+                        opened.append(connection)
+                self.__download(connection, file_name, version)
+            except BaseException:
+                if connection is not None:
+                    with lock:
+                        opened.remove(connection)
+                    self.__close(connection)
+                connections.put(None)
+                raise
+            connections.put(connection)
+
+        try:
+            files = self.list_files(ftp)
+            versions = self.__get_changed_versions(ftp, files) if self.manifest \
+                else dict.fromkeys(files)
+
+            self.ingest_each(versions.items(), download, self.max_connections)
+        finally:
+            if self.manifest:
+                self.manifest.save()
+            for connection in opened:
+                self.__close(connection)
+
+
+    @staticmethod
+    def __close(ftp: FTP):
+        try:
+            ftp.quit()
+        except Exception: # pylint: disable=broad-except
+            try:
+                ftp.close()
+            except Exception: # pylint: disable=broad-except
+                pass
+
+
+    def __get_changed_versions(self, ftp: FTP, files: dict) -> dict:
+        versions = {
+            file_name: self.get_version(ftp, file_name, facts)
+            for file_name, facts in files.items()
+            }
+        return {
+            file_name: version
+            for file_name, version in versions.items()
+            if self.manifest.is_changed(self.__key(file_name), version)
+            }
+
+
+    def __key(self, file_name: str) -> str:
+        return file_name if not self.folder else f"{self.folder}/{file_name}"
+
+
+    def __download(self, ftp: FTP, file_name: str, version: str = None):
+        hold_filename = self.stream_writer.get_file_path()
+        stream_writer = self.stream_writer.for_file_path(
+            file_name if not hold_filename else f"{hold_filename}/{file_name}")
+
+        key = self.__key(file_name)
+        offset = self.get_resume_offset(stream_writer, key)
+
+        reader = FtpStreamReader(ftp, file_name, blocksize=self.blocksize)
+        with reader.open(buffer_size=self.buffer_size, offset=offset) as stream:
+            self.write_resumable(stream_writer, stream, offset, key)
 
-        for file_name in ftp.nlst():
-            if not self.__is_dir(ftp, file_name) \
-                and (not self.file_name or self.file_name.lower() == file_name.lower()):
-                hold_filename = self.stream_writer.get_file_path()
-                self.stream_writer.set_file_path(
-                    file_name if not hold_filename else f"{hold_filename}/{file_name}")
-                ftp.retrbinary(f"RETR {file_name}", self.__write)
-                self.stream_writer.set_file_path(hold_filename)
-
-        ftp.quit()
-
-    def __write(self, bytes):
-        with BytesIO() as stream:
-            stream.write(bytes)
-            stream.seek(0)
-            self.stream_writer.write(stream)
+        if version:
+            self.manifest.update(key, version)
@@ -1,17 +1,57 @@
 """ HTTP Request callable """
 
+import asyncio
+from collections import deque
+import copy
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from io import BytesIO
 import json
 import os
-from typing import ContextManager
+import threading
+import time
+from typing import Callable, ContextManager
 from enum import Enum
-import copy
 import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+from xcputils.checkpoints import Checkpoint
 from xcputils.ingestion import Ingestor
+from xcputils.ingestion.pagination import (
+    CursorPaginationHandler, HttpPage, LinkHeaderPaginationHandler, NextUrlPaginationHandler,
+    PageNumberPaginationHandler, PaginationHandler, PaginationStrategy)
+from xcputils.ingestion.retry import RETRY_STATUSES, RateLimiter, RetryPolicy
 
 from xcputils.streaming import StreamWriter
 
 
+DEFAULT_POOL_SIZE = 10
+
+
+def create_session(pool_size: int = DEFAULT_POOL_SIZE) -> requests.Session:
+    """ Create a keep-alive session with a connection pool of pool_size per host """
+
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_resume_version(headers: dict) -> str:
+    """ Get validator of a response a Range request can resume against with If-Range,
+    its strong ETag or Last-Modified, None if it has neither or is content-encoded """
+
+    if headers.get("Content-Encoding", "identity").lower() != "identity":
+        return None
+
+    etag = headers.get("ETag")
+    if etag and not etag.startswith("W/"):
+        return etag
+
+    return headers.get("Last-Modified")
+
+
 class HttpMethod(Enum):
     """ HTTP method """
 
@@ -39,49 +79,6 @@ class HttpRequest():
         self.auth = auth
 
 
-class PaginationHandler:
-    """ Paginated HTTP request pagination_handler """
-
-    def __init__(
-        self,
-        page_size: int,
-        page_size_param: str = "limit",
-        data_property: str = "data",
-        max_pages: int = 1000):
-
-        self.page_size = page_size
-        self.page_size_param = page_size_param
-        self.data_property = data_property
-        self.max_pages = max_pages
-
-
-    def get_page_request(self, request: HttpRequest, page_number: int) -> HttpRequest:
-        """ Compose HTTP request for a page """
-
-        page_request = copy.deepcopy(request)
-        page_request.params[self.page_size_param] = self.page_size
-        page_request.params["offset"] = (page_number - 1) * self.page_size
-        return page_request
-
-
-    def is_last_page(self, payload: dict, page_number: int) -> bool:
-        """ Check if last page """
-
-        if page_number >= self.max_pages:
-            return True
-
-        if not self.data_property in payload.keys():
-            return True
-
-        if not isinstance(payload[self.data_property], list):
-            return True
-
-        if len(payload[self.data_property]) < self.page_size:
-            return True
-
-        return False
-
-
 class HttpIngestor(Ingestor):
     """ HTTP ingestor """
 
@@ -90,6 +87,7 @@ class HttpIngestor(Ingestor):
         http_request: HttpRequest = None,
         pagination_handler: PaginationHandler = None,
         stream_writer: StreamWriter = None,
+        session_factory: Callable[[], requests.Session] = None,
         ):
         """ Constructor """
 
@@ -97,6 +95,17 @@ class HttpIngestor(Ingestor):
 
         self.http_request = http_request
         self.pagination_handler = pagination_handler
+        self.session_factory = session_factory
+        self.session = None
+        self._owns_session = False
+        self.async_session = None
+        self._session_lock = threading.Lock()
+        self.since_param = "since"
+        self.high_water_mark = None
+        self.retry_policy = None
+        self.rate_limiter = None
+        self._retry_stats = {"retries": 0, "throttle_waits": 0, "throttle_seconds": 0.0}
+        self._retry_stats_lock = threading.Lock()
 
         self.http_methods = {
             HttpMethod.GET: self._get,
@@ -104,19 +113,88 @@ class HttpIngestor(Ingestor):
             }
 
 
+    def with_incremental(
+        self,
+        checkpoint: Checkpoint,
+        since_param: str = "since",
+        high_water_mark: Callable[[], str] = None) -> "HttpIngestor":
+        """ Only request data changed since the last run by passing its high-water mark as
+        since_param. The high-water mark is taken when a run starts, by default the UTC time """
+
+        super().with_incremental(checkpoint)
+        self.since_param = since_param
+        self.high_water_mark = high_water_mark
+
+        return self
+
+
+    def get_incremental_request(self) -> HttpRequest:
+        """ Get request with the high-water mark of the last run as since_param, if any """
+
+        since = self.manifest.get(self.http_request.url) if self.manifest else None
+        if not since:
+            return self.http_request
+
+        request = copy.deepcopy(self.http_request)
+        request.params[self.since_param] = since
+        return request
+
+
+    def __get_high_water_mark(self) -> str:
+        if self.high_water_mark:
+            return self.high_water_mark()
+        return datetime.now(timezone.utc).isoformat()
+
+
     def with_pagination(
         self,
         page_size: int=1000,
         page_size_param: str = "limit",
         data_property: str = "data",
-        max_pages: int = 1000) -> "HttpIngestor":
-        """ Pagination parameters"""
+        max_pages: int = 1000,
+        max_concurrency: int = 1,
+        raw: bool = False,
+        strategy: PaginationStrategy = PaginationStrategy.OFFSET,
+        page_param: str = "page",
+        cursor_param: str = "cursor",
+        cursor_property: str = "next_cursor",
+        next_url_property: str = "next") -> "HttpIngestor":
+        """ Pagination parameters, max_concurrency is the number of pages fetched in parallel
+        and raw writes response bytes unchanged instead of re-serializing the parsed JSON.
+        Cursor, next URL and Link header strategies fetch one page at a time """
+
+        common = {
+            "page_size": page_size,
+            "page_size_param": page_size_param,
+            "data_property": data_property,
+            "max_pages": max_pages,
+            "raw": raw,
+            }
+
+        if strategy == PaginationStrategy.OFFSET:
+            handler = PaginationHandler(max_concurrency=max_concurrency, **common)
+        elif strategy == PaginationStrategy.PAGE_NUMBER:
+            handler = PageNumberPaginationHandler(
+                max_concurrency=max_concurrency, page_param=page_param, **common)
+        elif strategy == PaginationStrategy.CURSOR:
+            handler = CursorPaginationHandler(
+                cursor_param=cursor_param, cursor_property=cursor_property, **common)
+        elif strategy == PaginationStrategy.NEXT_URL:
+            handler = NextUrlPaginationHandler(next_url_property=next_url_property, **common)
+        elif strategy == PaginationStrategy.LINK_HEADER:
+            handler = LinkHeaderPaginationHandler(**common)
+        else:
+            raise ValueError(f"Unsupported pagination strategy: {strategy}")
+
+        return self.with_pagination_handler(handler)
+
+
+    def with_pagination_handler(
+        self,
+        pagination_handler: PaginationHandler) -> "HttpIngestor":
+        """ Set pagination handler, e.g. a custom PaginationHandler subclass """
 
-        self.pagination_handler = PaginationHandler(
-            page_size=page_size,
-            page_size_param=page_size_param,
-            data_property=data_property,
-            max_pages=max_pages)
+        self.pagination_handler = pagination_handler
 
         return self
 
@@ -131,6 +209,112 @@ class HttpIngestor(Ingestor):
         return self
 
 
+    def with_session(
+        self,
+        session: requests.Session) -> "HttpIngestor":
+        """ Set session, e.g. to share a connection pool between ingestors,
+        the caller owns it and close leaves it open """
+
+        self.session = session
+        self._owns_session = False
+
+        return self
+
+
+    def get_session(self) -> requests.Session:
+        """ Get session, created on first use and reused for all requests """
+
+        with self._session_lock:
+            if self.session is None:
+                if self.session_factory:
+                    self.session = self.session_factory()
+                else:
+                    max_concurrency = self.pagination_handler.max_concurrency \
+                        if self.pagination_handler else 1
+                    self.session = create_session(max(DEFAULT_POOL_SIZE, max_concurrency))
+                self._owns_session = True
+
+            return self.session
+
+
+    def get_connection_stats(self) -> dict:
+        """ Get number of requests sent and connections opened by the session's pools """
+
+        stats = {"requests": 0, "connections": 0, "reused": 0}
+
+        if self.session is None:
+            return stats
+
+        for adapter in set(self.session.adapters.values()):
+            pools = getattr(getattr(adapter, "poolmanager", None), "pools", None)
+            if pools is None:
+                continue
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                stats["requests"] += pool.num_requests
+                stats["connections"] += pool.num_connections
+
+        stats["reused"] = max(stats["requests"] - stats["connections"], 0)
+
+        return stats
+
+
+    def with_retry(
+        self,
+        max_retries: int = 5,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 60.0,
+        retry_statuses: tuple = RETRY_STATUSES) -> "HttpIngestor":
+        """ Retry requests failing with a connection error or a status in retry_statuses, waiting
+        as long as the Retry-After header says, else with exponential backoff and full jitter,
+        at most max_backoff seconds. POST requests are retried too, so they must be safe to repeat """
+
+        self.retry_policy = RetryPolicy(max_retries, backoff_factor, max_backoff, retry_statuses)
+
+        return self
+
+
+    def with_rate_limit(
+        self,
+        rate: float,
+        burst: int = 1) -> "HttpIngestor":
+        """ Send at most rate requests per second, in bursts of up to burst, shared by pages
+        fetched concurrently. A 429 or Retry-After response holds back all requests """
+
+        self.rate_limiter = RateLimiter(rate, burst)
+
+        return self
+
+
+    def get_retry_stats(self) -> dict:
+        """ Get number of retries, waits for the rate limit and seconds spent waiting for it """
+
+        with self._retry_stats_lock:
+            return dict(self._retry_stats)
+
+
+    def with_async_session(
+        self,
+        session) -> "HttpIngestor":
+        """ Set aiohttp.ClientSession for ingest_async, e.g. to share it between ingestors """
+
+        self.async_session = session
+
+        return self
+
+
+    def close(self):
+        """ Close session if the ingestor created it, a session set with with_session is left
+        open for its owner """
+
+        if self.session is not None and self._owns_session:
+            self.session.close()
+            self.session = None
+            self._owns_session = False
+
+
     def _get(self, session, request, stream):
         return session.get(
             url=request.url,
@@ -150,58 +334,328 @@ class HttpIngestor(Ingestor):
             stream=stream)
 
 
+    def _send(self, session, request: HttpRequest, stream: bool) -> requests.Response:
+        """ Send request within the rate limit, retrying it by the retry policy """
+
+        http_method = self.http_methods[request.method]
+        retry = 0
+
+        while True:
+            self.__count_throttle(self.rate_limiter.acquire() if self.rate_limiter else 0.0)
+
+            try:
+                response = http_method(session=session, request=request, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as error:
+                delay = self.__get_retry_delay(request, retry, reason=type(error).__name__)
+                if delay is None:
+                    raise
+            else:
+                delay = self.__get_retry_delay(
+                    request, retry, response.status_code, response.headers)
+                if delay is None:
+                    return response
+                response.close()
+
+            retry += 1
+            time.sleep(delay)
+
+
+    def __get_retry_delay(
+        self,
+        request: HttpRequest,
+        retry: int,
+        status_code: int = None,
+        headers = None,
+        reason: str = None) -> float:
+        """ Get seconds to wait before retrying request, None if it should not be retried """
+
+        if not self.retry_policy or retry >= self.retry_policy.max_retries:
+            return None
+
+        if status_code is not None and not self.retry_policy.is_retryable(status_code):
+            return None
+
+        retry_after = headers.get("Retry-After") if headers is not None else None
+        delay = self.retry_policy.get_delay(retry + 1, retry_after)
+
+        if self.rate_limiter and (retry_after or status_code == 429):
+            self.rate_limiter.pause(delay)
+
+        with self._retry_stats_lock:
+            self._retry_stats["retries"] += 1
+
+        if self.metrics:
+            self.metrics.emit(
+                "retry", delay, url=request.url, retry=retry + 1,
+                reason=status_code if status_code is not None else reason)
+
+        return delay
+
+
+    def __count_throttle(self, seconds: float):
+        if seconds <= 0:
+            return
+
+        with self._retry_stats_lock:
+            self._retry_stats["throttle_waits"] += 1
+            self._retry_stats["throttle_seconds"] += seconds
+
+        if self.metrics:
+            self.metrics.emit("throttle", seconds)
+
+
     def ingest(self):
-        """ Ingest """
+        """ Ingest, only data changed since the last run in incremental mode """
+
+        high_water_mark = self.__get_high_water_mark() if self.manifest else None
+        request = self.get_incremental_request()
 
         if self.pagination_handler:
-            self.ingest_paginated()
-            return
+            self.ingest_paginated(request)
+        else:
+            self.__ingest(request)
 
-        with requests.Session() as session:
-            http_method = self.http_methods[self.http_request.method]
-            response = http_method(session=session, request=self.http_request, stream=True)
+        if high_water_mark:
+            self.manifest.update(self.http_request.url, high_water_mark)
+            self.manifest.save()
 
-            response.raise_for_status()
 
-            if isinstance(response, ContextManager):
-                with response as part:
-                    part.raw.decode_content = True
-                    self.stream_writer.write(part.raw)
-            else:
-                response.raw.decode_content = True
-                self.stream_writer.write(response.raw)
+    def __ingest(self, request: HttpRequest):
+        key = self.http_request.url
+        offset = self.get_resume_offset(self.stream_writer, key)
+
+        if offset and not self.offset_checkpoint.get_version(key):
+            offset = 0
+
+        response = self.__send_resumable(request, key, offset)
+
+        if offset and response.status_code == 416:
+            response.close()
+            offset = 0
+            response = self.__send_resumable(request, key, offset)
+
+        response.raise_for_status()
+
+        if response.status_code != 206:
+            offset = 0
+
+        if self.offset_checkpoint:
+            self.offset_checkpoint.set_version(key, get_resume_version(response.headers))
+
+        if isinstance(response, ContextManager):
+            with response as part:
+                part.raw.decode_content = True
+                self.write_resumable(self.stream_writer, part.raw, offset, key)
+        else:
+            response.raw.decode_content = True
+            self.write_resumable(self.stream_writer, response.raw, offset, key)
+
+
+    def __send_resumable(self, request: HttpRequest, key: str, offset: int) -> requests.Response:
+        """ Send request, if resume is enabled without content encoding, so offsets count the
+        bytes a Range addresses, and from offset if the stored version is still current """
+
+        if self.offset_checkpoint:
+            request = copy.deepcopy(request)
+            request.headers["Accept-Encoding"] = "identity"
+            if offset:
+                request.headers["Range"] = f"bytes={offset}-"
+                request.headers["If-Range"] = self.offset_checkpoint.get_version(key)
+
+        return self._send(self.get_session(), request, stream=True)
 
 
-    def ingest_paginated(self):
-        """ Ingest paginated """
+    def ingest_paginated(self, http_request: HttpRequest = None):
+        """ Ingest paginated, fetching up to max_concurrency pages ahead and writing in page order """
 
-        page_number = 1
-        is_last_page = False
+        http_request = http_request or self.http_request
+        max_concurrency = self.pagination_handler.max_concurrency
+        max_pages = self.pagination_handler.max_pages
 
-        while not is_last_page:
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            pages = deque()
+            next_page_number = 1
+            previous_page = None
 
-            page_request = self.pagination_handler \
-                .get_page_request(self.http_request, page_number=page_number)
+            try:
+                while True:
+                    while len(pages) < max_concurrency and next_page_number <= max_pages:
+                        page_request = self.pagination_handler.get_page_request(
+                            http_request,
+                            page_number=next_page_number,
+                            previous_page=previous_page)
+                        pages.append(
+                            executor.submit(self._fetch_page, page_request, next_page_number))
+                        next_page_number += 1
 
-            with requests.Session() as session:
-                http_method = self.http_methods[self.http_request.method]
-                response = http_method(session=session, request=page_request, stream=False)
+                    page = pages.popleft().result()
+                    self._write_page(page)
 
-                response.raise_for_status()
-                payload = response.json()
+                    if self.pagination_handler.is_last(page):
+                        break
+
+                    previous_page = page
+            finally:
+                for page in pages:
+                    page.cancel()
+
+
+    def _fetch_page(self, page_request: HttpRequest, page_number: int) -> HttpPage:
+        if not self.metrics:
+            return self.__fetch_page(page_request, page_number)
+
+        with self.metrics.measure("page", page=page_number) as event:
+            page = self.__fetch_page(page_request, page_number)
+            event["size"] = len(page.content)
+        return page
+
+
+    def __fetch_page(self, page_request: HttpRequest, page_number: int) -> HttpPage:
+        response = self._send(self.get_session(), page_request, stream=False)
+
+        response.raise_for_status()
+
+        if self.pagination_handler.raw:
+            return HttpPage(page_number, response.content, response.headers)
+
+        payload = response.json()
+        return HttpPage(
+            page_number, json.dumps(payload).encode('utf-8'), response.headers, payload=payload)
+
+
+    def _write_page(self, page: HttpPage):
+        hold_filename = self.stream_writer.get_file_path()
+        filename, ext = os.path.splitext(hold_filename)
+        self.stream_writer.set_file_path(f"{filename}.{page.number}{ext}")
+
+        with BytesIO(page.content) as stream:
+            self.write(self.stream_writer, stream, page=page.number)
+
+        self.stream_writer.set_file_path(hold_filename)
+
+
+    async def ingest_async(self):
+        """ Ingest with non-blocking I/O using aiohttp, reads each response into memory.
+        Ingests that resume or emit metrics are run in the default executor """
+
+        if self.offset_checkpoint or self.metrics:
+            await super().ingest_async()
+            return
+
+        try:
+            import aiohttp # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ImportError("ingest_async requires aiohttp, install xcputils[async]") from error
+
+        high_water_mark = self.__get_high_water_mark() if self.manifest else None
+        request = self.get_incremental_request()
+
+        if self.async_session is not None:
+            await self._ingest_async(self.async_session, request)
+        else:
+            async with aiohttp.ClientSession() as session:
+                await self._ingest_async(session, request)
+
+        if high_water_mark:
+            self.manifest.update(self.http_request.url, high_water_mark)
+            self.manifest.save()
+
+
+    async def _ingest_async(self, session, http_request: HttpRequest):
+        if not self.pagination_handler:
+            content, _ = await self._request_async(session, http_request)
+            with BytesIO(content) as stream:
+                await self.stream_writer.write_async(stream)
+            return
+
+        max_concurrency = self.pagination_handler.max_concurrency
+        max_pages = self.pagination_handler.max_pages
+        pages = deque()
+        next_page_number = 1
+        previous_page = None
+
+        try:
+            while True:
+                while len(pages) < max_concurrency and next_page_number <= max_pages:
+                    page_request = self.pagination_handler.get_page_request(
+                        http_request,
+                        page_number=next_page_number,
+                        previous_page=previous_page)
+                    pages.append(asyncio.ensure_future(
+                        self._fetch_page_async(session, page_request, next_page_number)))
+                    next_page_number += 1
+
+                page = await pages.popleft()
 
                 hold_filename = self.stream_writer.get_file_path()
                 filename, ext = os.path.splitext(hold_filename)
-                self.stream_writer.set_file_path(f"{filename}.{page_number}{ext}")
+                self.stream_writer.set_file_path(f"{filename}.{page.number}{ext}")
+                with BytesIO(page.content) as stream:
+                    await self.stream_writer.write_async(stream)
+                self.stream_writer.set_file_path(hold_filename)
 
-                with BytesIO() as stream:
-                    stream.write(json.dumps(payload).encode('utf-8'))
-                    stream.seek(0)
-                    self.stream_writer.write(stream)
+                if self.pagination_handler.is_last(page):
+                    break
 
-                self.stream_writer.set_file_path(hold_filename)
+                previous_page = page
+        finally:
+            for page in pages:
+                page.cancel()
+
+
+    async def _fetch_page_async(self, session, page_request: HttpRequest, page_number: int) -> HttpPage:
+        if not self.metrics:
+            return await self.__fetch_page_async(session, page_request, page_number)
+
+        with self.metrics.measure("page", page=page_number) as event:
+            page = await self.__fetch_page_async(session, page_request, page_number)
+            event["size"] = len(page.content)
+        return page
+
+
+    async def __fetch_page_async(self, session, page_request: HttpRequest, page_number: int) -> HttpPage:
+        content, headers = await self._request_async(session, page_request)
+
+        if self.pagination_handler.raw:
+            return HttpPage(page_number, content, headers)
+
+        payload = json.loads(content)
+        return HttpPage(page_number, json.dumps(payload).encode('utf-8'), headers, payload=payload)
+
+
+    async def _request_async(self, session, request: HttpRequest) -> tuple:
+        import aiohttp # pylint: disable=import-outside-toplevel
+
+        auth = request.auth
+        if isinstance(auth, HTTPBasicAuth):
+            auth = aiohttp.BasicAuth(auth.username, auth.password)
+        elif auth is not None:
+            raise ValueError(f"Unsupported auth for ingest_async: {type(auth).__name__}")
+
+        retry = 0
+
+        while True:
+            self.__count_throttle(
+                await self.rate_limiter.acquire_async() if self.rate_limiter else 0.0)
+
+            try:
+                async with session.request(
+                    request.method.value,
+                    request.url,
+                    params={key: str(value) for key, value in request.params.items()},
+                    data=json.dumps(request.body) if request.method == HttpMethod.POST else None,
+                    headers=request.headers,
+                    auth=auth) as response:
 
-            is_last_page = self.pagination_handler \
-                .is_last_page(payload=payload, page_number=page_number)
+                    delay = self.__get_retry_delay(
+                        request, retry, response.status, response.headers)
+                    if delay is None:
+                        response.raise_for_status()
+                        return await response.read(), response.headers
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as error:
+                delay = self.__get_retry_delay(request, retry, reason=type(error).__name__)
+                if delay is None:
+                    raise
 
-            page_number += 1
+            retry += 1
+            await asyncio.sleep(delay)
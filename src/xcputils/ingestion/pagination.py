@@ -0,0 +1,346 @@
+""" HTTP pagination strategies """
+
+from __future__ import annotations
+import copy
+from enum import Enum
+from io import BytesIO
+import json
+from typing import Any, Optional, TYPE_CHECKING
+from urllib.parse import urljoin
+
+from requests.utils import parse_header_links
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+if TYPE_CHECKING:
+    from xcputils.ingestion.http import HttpRequest
+
+
+class PaginationStrategy(Enum):
+    """ Pagination strategy """
+
+    OFFSET = "offset"
+    PAGE_NUMBER = "page_number"
+    CURSOR = "cursor"
+    NEXT_URL = "next_url"
+    LINK_HEADER = "link_header"
+
+
+class HttpPage():
+    """ Fetched page """
+
+    def __init__(
+        self,
+        number: int,
+        content: bytes,
+        headers: dict = None,
+        payload: Any = None):
+
+        self.number = number
+        self.content = content
+        self.headers = {} if not headers else headers
+        self._payload = payload
+
+
+    @property
+    def payload(self) -> Any:
+        """ Parsed JSON content, parsed on first access """
+
+        if self._payload is None:
+            self._payload = json.loads(self.content)
+        return self._payload
+
+
+    def is_parsed(self) -> bool:
+        """ Check if content has been parsed """
+
+        return self._payload is not None
+
+
+class PaginationHandler:
+    """ Paginated HTTP request pagination_handler using limit/offset,
+    subclass and override get_page_request and is_last to add strategies """
+
+    sequential = False
+    """ True if a page request depends on the previous page, which disables concurrency """
+
+    def __init__(
+        self,
+        page_size: int,
+        page_size_param: str = "limit",
+        data_property: str = "data",
+        max_pages: int = 1000,
+        max_concurrency: int = 1,
+        raw: bool = False):
+
+        self.page_size = page_size
+        self.page_size_param = page_size_param
+        self.data_property = data_property
+        self.max_pages = max_pages
+        self.max_concurrency = 1 if self.sequential else max_concurrency
+        self.raw = raw
+
+
+    def get_page_request(
+        self,
+        request: HttpRequest,
+        page_number: int,
+        previous_page: HttpPage = None) -> HttpRequest:
+        """ Compose HTTP request for a page """
+
+        page_request = self._copy_request(request)
+        page_request.params["offset"] = (page_number - 1) * self.page_size
+        return page_request
+
+
+    def is_last(self, page: HttpPage) -> bool:
+        """ Check if page is the last page """
+
+        return self.is_last_page_count(
+            item_count=self.get_page_item_count(page),
+            page_number=page.number)
+
+
+    def is_last_page(self, payload: dict, page_number: int) -> bool:
+        """ Check if last page """
+
+        return self.is_last_page_count(
+            item_count=self.get_item_count(payload),
+            page_number=page_number)
+
+
+    def is_last_page_count(self, item_count: Optional[int], page_number: int) -> bool:
+        """ Check if last page from the number of items, None if there is no data array """
+
+        if page_number >= self.max_pages:
+            return True
+
+        if item_count is None:
+            return True
+
+        if item_count < self.page_size:
+            return True
+
+        return False
+
+
+    def get_page_item_count(self, page: HttpPage) -> Optional[int]:
+        """ Count items in the data array of a page, without parsing it if still raw """
+
+        if page.is_parsed():
+            return self.get_item_count(page.payload)
+
+        return self.count_items(page.content)
+
+
+    def get_item_count(self, payload: dict) -> Optional[int]:
+        """ Count items in the data array of a parsed page, None if there is no data array """
+
+        items = payload.get(self.data_property) if isinstance(payload, dict) else None
+
+        return len(items) if isinstance(items, list) else None
+
+
+    def count_items(self, content: bytes) -> Optional[int]:
+        """ Count items in the data array of a raw JSON page, None if there is no data array """
+
+        if ijson is None:
+            return self.get_item_count(json.loads(content))
+
+        item_prefix = f"{self.data_property}.item"
+        item_count = None
+
+        for prefix, event, _ in ijson.parse(BytesIO(content)):
+            if prefix == self.data_property:
+                if event == "start_array":
+                    item_count = 0
+                elif event == "end_array":
+                    break
+            elif prefix == item_prefix and item_count is not None \
+                and event not in ("map_key", "end_map", "end_array"):
+                item_count += 1
+
+        return item_count
+
+
+    def _copy_request(self, request: HttpRequest) -> HttpRequest:
+        page_request = copy.deepcopy(request)
+        if self.page_size and self.page_size_param:
+            page_request.params[self.page_size_param] = self.page_size
+        return page_request
+
+
+class PageNumberPaginationHandler(PaginationHandler):
+    """ Pagination with a page number parameter """
+
+    def __init__(
+        self,
+        page_size: int,
+        page_size_param: str = "limit",
+        data_property: str = "data",
+        max_pages: int = 1000,
+        max_concurrency: int = 1,
+        raw: bool = False,
+        page_param: str = "page",
+        first_page: int = 1):
+
+        super().__init__(
+            page_size=page_size,
+            page_size_param=page_size_param,
+            data_property=data_property,
+            max_pages=max_pages,
+            max_concurrency=max_concurrency,
+            raw=raw)
+
+        self.page_param = page_param
+        self.first_page = first_page
+
+
+    def get_page_request(
+        self,
+        request: HttpRequest,
+        page_number: int,
+        previous_page: HttpPage = None) -> HttpRequest:
+        """ Compose HTTP request for a page """
+
+        page_request = self._copy_request(request)
+        page_request.params[self.page_param] = self.first_page + page_number - 1
+        return page_request
+
+
+class CursorPaginationHandler(PaginationHandler):
+    """ Pagination with a cursor token taken from a property of the previous page """
+
+    sequential = True
+
+    def __init__(
+        self,
+        page_size: int = None,
+        page_size_param: str = "limit",
+        data_property: str = "data",
+        max_pages: int = 1000,
+        raw: bool = False,
+        cursor_param: str = "cursor",
+        cursor_property: str = "next_cursor"):
+
+        super().__init__(
+            page_size=page_size,
+            page_size_param=page_size_param,
+            data_property=data_property,
+            max_pages=max_pages,
+            raw=raw)
+
+        self.cursor_param = cursor_param
+        self.cursor_property = cursor_property
+
+
+    def get_page_request(
+        self,
+        request: HttpRequest,
+        page_number: int,
+        previous_page: HttpPage = None) -> HttpRequest:
+        """ Compose HTTP request for a page """
+
+        page_request = self._copy_request(request)
+        if previous_page is not None:
+            page_request.params[self.cursor_param] = self._get_cursor(previous_page)
+        return page_request
+
+
+    def is_last(self, page: HttpPage) -> bool:
+        """ Check if page is the last page """
+
+        return page.number >= self.max_pages or not self._get_cursor(page)
+
+
+    def _get_cursor(self, page: HttpPage) -> Any:
+        return _get_property(page.payload, self.cursor_property)
+
+
+class NextUrlPaginationHandler(PaginationHandler):
+    """ Pagination with the URL of the next page in a property of the previous page """
+
+    sequential = True
+
+    def __init__(
+        self,
+        page_size: int = None,
+        page_size_param: str = "limit",
+        data_property: str = "data",
+        max_pages: int = 1000,
+        raw: bool = False,
+        next_url_property: str = "next"):
+
+        super().__init__(
+            page_size=page_size,
+            page_size_param=page_size_param,
+            data_property=data_property,
+            max_pages=max_pages,
+            raw=raw)
+
+        self.next_url_property = next_url_property
+
+
+    def get_page_request(
+        self,
+        request: HttpRequest,
+        page_number: int,
+        previous_page: HttpPage = None) -> HttpRequest:
+        """ Compose HTTP request for a page """
+
+        if previous_page is None:
+            return self._copy_request(request)
+
+        page_request = copy.deepcopy(request)
+        page_request.url = urljoin(request.url, self._get_next_url(previous_page))
+        page_request.params = {}
+        return page_request
+
+
+    def is_last(self, page: HttpPage) -> bool:
+        """ Check if page is the last page """
+
+        return page.number >= self.max_pages or not self._get_next_url(page)
+
+
+    def _get_next_url(self, page: HttpPage) -> Optional[str]:
+        return _get_property(page.payload, self.next_url_property)
+
+
+class LinkHeaderPaginationHandler(NextUrlPaginationHandler):
+    """ Pagination with the URL of the next page in an RFC 5988 Link header """
+
+    def __init__(
+        self,
+        page_size: int = None,
+        page_size_param: str = "limit",
+        data_property: str = "data",
+        max_pages: int = 1000,
+        raw: bool = False):
+
+        super().__init__(
+            page_size=page_size,
+            page_size_param=page_size_param,
+            data_property=data_property,
+            max_pages=max_pages,
+            raw=raw)
+
+
+    def _get_next_url(self, page: HttpPage) -> Optional[str]:
+        for link in parse_header_links(page.headers.get("Link", "")):
+            if "next" in link.get("rel", "").split():
+                return link.get("url")
+        return None
+
+
+def _get_property(payload: Any, path: str) -> Any:
+    """ Get property by dotted path, None if missing """
+
+    for name in path.split("."):
+        if not isinstance(payload, dict):
+            return None
+        payload = payload.get(name)
+    return payload
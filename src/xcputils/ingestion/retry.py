@@ -0,0 +1,119 @@
+""" Retry policy and client-side rate limit of HTTP requests """
+
+import asyncio
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Iterable
+
+
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class RetryPolicy():
+    """ Retry requests failing with a connection error or a status in retry_statuses up to
+    max_retries times, waiting as long as a Retry-After header says, else a random time up to
+    backoff_factor * 2 ** (retry - 1) seconds, either capped at max_backoff """
+
+    def __init__(
+        self,
+        max_retries: int = 5,
+        backoff_factor: float = 0.5,
+        max_backoff: float = 60.0,
+        retry_statuses: Iterable[int] = RETRY_STATUSES,
+        ):
+
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = set(retry_statuses)
+
+
+    def is_retryable(self, status_code: int) -> bool:
+        """ Check if a response with status_code should be retried """
+
+        return status_code in self.retry_statuses
+
+
+    def get_delay(self, retry: int, retry_after: str = None) -> float:
+        """ Get seconds to wait before retry number retry, counted from 1 """
+
+        delay = parse_retry_after(retry_after)
+        if delay is not None:
+            return min(delay, self.max_backoff)
+
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** (retry - 1)))
+
+
+class RateLimiter():
+    """ Token bucket allowing rate requests per second in bursts of up to burst requests,
+    shared by the threads or tasks sending them """
+
+    def __init__(self, rate: float, burst: int = 1):
+        if rate <= 0:
+            raise ValueError(f"rate must be positive: {rate}")
+
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+
+    def acquire(self) -> float:
+        """ Take a token, waiting until one is available, returns the seconds waited """
+
+        delay = self.__reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+    async def acquire_async(self) -> float:
+        """ Take a token without blocking the event loop, returns the seconds waited """
+
+        delay = self.__reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+
+    def pause(self, seconds: float):
+        """ Hold back all requests for seconds, e.g. when the server asks to retry later """
+
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+    def __reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(delay, self._paused_until - now)
+
+
+def parse_retry_after(retry_after: str) -> float:
+    """ Parse a Retry-After header, seconds or an HTTP date, None if missing or invalid """
+
+    if not isinstance(retry_after, str):
+        return None
+
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+
+    try:
+        date = parsedate_to_datetime(retry_after)
+    except (TypeError, ValueError):
+        return None
+
+    if date.tzinfo is None:
+        date = date.replace(tzinfo=timezone.utc)
+    return max((date - datetime.now(timezone.utc)).total_seconds(), 0.0)
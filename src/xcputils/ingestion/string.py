@@ -25,4 +25,4 @@ class StringIngestor(Ingestor):
         with BytesIO() as stream:
             stream.write(self.data.encode('utf-8'))
             stream.seek(0)
-            self.stream_writer.write(stream)
+            self.write(self.stream_writer, stream)
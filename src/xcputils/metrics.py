@@ -0,0 +1,331 @@
+""" Per-transfer metrics, emitted as events to pluggable sinks """
+
+from contextlib import contextmanager
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+
+class TransferEvent():
+    """ Transfer event, e.g. a phase of a file transfer, a page or a pool wait, with its
+    start as epoch seconds, duration in seconds and size in bytes where they apply """
+
+    def __init__(
+        self,
+        name: str,
+        start: float,
+        duration: float = None,
+        size: int = None,
+        attributes: dict = None,
+        ):
+
+        self.name = name
+        self.start = start
+        self.duration = duration
+        self.size = size
+        self.attributes = attributes if attributes else {}
+
+
+    def __str__(self) -> str:
+        parts = [self.name]
+        if self.size is not None:
+            parts.append(f"{self.size} bytes")
+        if self.duration is not None:
+            parts.append(f"in {self.duration:.3f} s")
+        parts.extend(f"{key}={value}" for key, value in self.attributes.items())
+        return " ".join(parts)
+
+
+class MetricsSink():
+    """ Metrics sink base class """
+
+    def emit(self, event: TransferEvent):
+        """ Emit event """
+
+
+    def flush(self):
+        """ Flush buffered metrics """
+
+
+class CallbackSink(MetricsSink):
+    """ Call callback with each event """
+
+    def __init__(self, callback: Callable[[TransferEvent], None]):
+        self.callback = callback
+
+
+    def emit(self, event: TransferEvent):
+        """ Emit event """
+
+        self.callback(event)
+
+
+class LoggingSink(MetricsSink):
+    """ Log each event, by default to the xcputils.metrics logger at INFO level """
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger if logger else logging.getLogger("xcputils.metrics")
+        self.level = level
+
+
+    def emit(self, event: TransferEvent):
+        """ Emit event """
+
+        if self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, "%s", event)
+
+
+class PrometheusTextFileSink(MetricsSink):
+    """ Count events, bytes and seconds per event name and ingestor, written in the Prometheus
+    text format to file_path, e.g. for the node exporter textfile collector, on the first event,
+    on flush and at most every interval seconds while events are emitted """
+
+    def __init__(self, file_path: str, interval: float = 10.0, prefix: str = "xcputils_transfer"):
+        self.file_path = file_path
+        self.interval = interval
+        self.prefix = prefix
+        self._counters = {}
+        self._flushed = None
+        self._lock = threading.Lock()
+
+
+    def emit(self, event: TransferEvent):
+        """ Emit event """
+
+        with self._lock:
+            labels = (event.name, event.attributes.get("ingestor", ""))
+            counters = self._counters.setdefault(labels, [0, 0, 0.0])
+            counters[0] += 1
+            counters[1] += event.size or 0
+            counters[2] += event.duration or 0.0
+            if self._flushed is not None and time.monotonic() - self._flushed < self.interval:
+                return
+
+        self.flush()
+
+
+    def flush(self):
+        """ Write counters to file_path, replacing it atomically """
+
+        with self._lock:
+            self._flushed = time.monotonic()
+            lines = []
+            for index, (metric, help_text) in enumerate((
+                    ("events_total", "Number of transfer events"),
+                    ("bytes_total", "Bytes transferred"),
+                    ("seconds_total", "Seconds spent"))):
+                lines.append(f"# HELP {self.prefix}_{metric} {help_text}")
+                lines.append(f"# TYPE {self.prefix}_{metric} counter")
+                for (name, ingestor), counters in sorted(self._counters.items()):
+                    lines.append(
+                        f'{self.prefix}_{metric}{{event="{name}",ingestor="{ingestor}"}} '
+                        f"{counters[index]}")
+            content = "\n".join(lines) + "\n"
+
+            directory = os.path.dirname(self.file_path) or "."
+            with tempfile.NamedTemporaryFile(
+                    "w", dir=directory, suffix=".tmp", delete=False, encoding="utf-8") as file:
+                file.write(content)
+            os.replace(file.name, self.file_path)
+
+
+class OpenTelemetrySink(MetricsSink):
+    """ Record events with a duration as OpenTelemetry spans named xcputils.{event name},
+    by default with the tracer of the global tracer provider """
+
+    def __init__(self, tracer: Any = None):
+        if tracer is None:
+            try:
+                from opentelemetry import trace # pylint: disable=import-outside-toplevel
+            except ImportError as error:
+                raise ImportError(
+                    "OpenTelemetry spans require opentelemetry-api, "
+                    "install xcputils[opentelemetry]") from error
+            tracer = trace.get_tracer("xcputils")
+
+        self.tracer = tracer
+
+
+    def emit(self, event: TransferEvent):
+        """ Emit event """
+
+        if event.duration is None:
+            return
+
+        attributes = {
+            key: value if isinstance(value, (str, bool, int, float)) else str(value)
+            for key, value in event.attributes.items()
+            }
+        if event.size is not None:
+            attributes["bytes"] = event.size
+
+        start_time = int(event.start * 1e9)
+        span = self.tracer.start_span(
+            f"xcputils.{event.name}", start_time=start_time, attributes=attributes)
+        span.end(end_time=start_time + int(event.duration * 1e9))
+
+
+class Metrics():
+    """ Emit transfer events to sinks, with attributes added to every event """
+
+    def __init__(self, *sinks: MetricsSink, **attributes):
+        self.sinks = [
+            sink if isinstance(sink, MetricsSink) else CallbackSink(sink) for sink in sinks]
+        self.attributes = attributes
+
+
+    def with_attributes(self, **attributes) -> "Metrics":
+        """ Get metrics emitting to the same sinks with more attributes """
+
+        metrics = Metrics(*self.sinks)
+        metrics.attributes = {**self.attributes, **attributes}
+        return metrics
+
+
+    def emit(
+        self,
+        name: str,
+        duration: float = None,
+        size: int = None,
+        start: float = None,
+        **attributes):
+        """ Emit event, started duration seconds ago unless start is given """
+
+        if start is None:
+            start = time.time() - (duration or 0.0)
+
+        event = TransferEvent(name, start, duration, size, {**self.attributes, **attributes})
+        for sink in self.sinks:
+            sink.emit(event)
+
+
+    @contextmanager
+    def measure(self, name: str, **attributes) -> Iterator[dict]:
+        """ Emit an event with the duration of the block, the block can add attributes and
+        the size in bytes to the yielded dict, failures add the error type """
+
+        start = time.time()
+        started = time.perf_counter()
+        event_attributes = dict(attributes)
+        try:
+            yield event_attributes
+        except BaseException as error:
+            event_attributes["error"] = type(error).__name__
+            raise
+        finally:
+            size = event_attributes.pop("size", None)
+            self.emit(name, time.perf_counter() - started, size, start, **event_attributes)
+
+
+    @contextmanager
+    def meter_stream(self, input_stream: Any, **attributes) -> Iterator["MeteredStream"]:
+        """ Wrap input_stream for the block and emit its transfer: first_byte, the time until
+        the first bytes were read, read, the time spent waiting for the source, write, the rest,
+        and transfer, the total """
+
+        stream = MeteredStream(input_stream)
+        start = time.time()
+        with self.measure("transfer", **attributes) as event:
+            try:
+                yield stream
+            finally:
+                size = stream.get_size()
+                event["size"] = size
+                if stream.first_byte_seconds is not None:
+                    self.emit("first_byte", stream.first_byte_seconds, start=start, **attributes)
+                self.emit("read", stream.read_seconds, size, start, **attributes)
+                self.emit("write", stream.get_elapsed() - stream.read_seconds, size, start,
+                          **attributes)
+
+
+    def flush(self):
+        """ Flush buffered metrics of all sinks """
+
+        for sink in self.sinks:
+            sink.flush()
+
+
+class MeteredStream(io.RawIOBase):
+    """ Readable stream counting the bytes read from stream and the time spent reading them,
+    streams of regular files keep their file number, so bytes copied with it are counted
+    from the stream position """
+
+    def __init__(self, stream: Any):
+        super().__init__()
+        self.stream = stream
+        self.read_seconds = 0.0
+        self.first_byte_seconds = None
+        self._size = 0
+        self._opened = time.perf_counter()
+        try:
+            self._position = stream.tell() if stream.seekable() else None
+        except (AttributeError, OSError, ValueError):
+            self._position = None
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def seekable(self) -> bool:
+        return self._position is not None
+
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self.stream.seek(offset, whence)
+
+
+    def tell(self) -> int:
+        return self.stream.tell()
+
+
+    def fileno(self) -> int:
+        return self.stream.fileno()
+
+
+    def read(self, size: int = -1) -> bytes:
+        started = time.perf_counter()
+        data = self.stream.read(size)
+        self.__count(len(data) if data else 0, started)
+        return data
+
+
+    def readinto(self, buffer) -> int:
+        started = time.perf_counter()
+        if hasattr(self.stream, "readinto"):
+            count = self.stream.readinto(buffer)
+        else:
+            data = self.stream.read(len(buffer))
+            count = len(data)
+            buffer[:count] = data
+        self.__count(count or 0, started)
+        return count
+
+
+    def get_size(self) -> int:
+        """ Get number of bytes read """
+
+        if self._position is not None:
+            try:
+                return max(self._size, self.stream.tell() - self._position)
+            except (OSError, ValueError):
+                pass
+        return self._size
+
+
+    def get_elapsed(self) -> float:
+        """ Get seconds since the stream was wrapped """
+
+        return time.perf_counter() - self._opened
+
+
+    def __count(self, count: int, started: float):
+        now = time.perf_counter()
+        self.read_seconds += now - started
+        self._size += count
+        if count and self.first_byte_seconds is None:
+            self.first_byte_seconds = now - self._opened
@@ -1,8 +1,21 @@
 """ Connectors to read and write streams """
 
-from io import BytesIO
+import asyncio
+import codecs
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import copy
+import os
 import tempfile
-from typing import Any
+import threading
+from typing import Any, Awaitable, Callable, Iterable, Iterator
+
+from xcputils.streaming.pipe import DEFAULT_BUFFER_SIZE, PipeStream
+
+
+DEFAULT_SPOOL_SIZE = 16 * 1024 * 1024
+DEFAULT_TEXT_CHUNK_SIZE = 1024 * 1024
 
 
 class StreamReader():
@@ -13,13 +26,196 @@ class StreamReader():
         """ Read from stream """
 
 
-    def read_str(self) -> str:
-        """ Read from stream to a string """
+    def get_version(self) -> str:
+        """ Get version of source, e.g. an ETag, None if unknown """
+
+        return None
+
+
+    def read_chunked(self, output_stream: Any, offset: int = 0):
+        """ Read from stream in chunks starting at byte offset, used when streaming through a pipe """
+
+        if offset:
+            raise ValueError(f"{self.__class__.__name__} cannot read from an offset")
+
+        self.read(output_stream)
+
+
+    def read_str(self, spool_size: int = DEFAULT_SPOOL_SIZE, encoding: str = "utf-8") -> str:
+        """ Read from stream to a string, buffered in memory up to spool_size bytes
+        and in a temporary file beyond """
 
-        with tempfile.TemporaryFile() as data:
+        with tempfile.SpooledTemporaryFile(max_size=spool_size) as data:
             self.read(data)
             data.seek(0)
-            return data.read().decode('utf-8')
+            return codecs.decode(data.read(), encoding)
+
+
+    def read_str_chunks(
+        self,
+        chunk_size: int = DEFAULT_TEXT_CHUNK_SIZE,
+        encoding: str = "utf-8",
+        errors: str = "strict",
+        buffer_size: int = DEFAULT_BUFFER_SIZE) -> Iterator[str]:
+        """ Read from stream as text, decoded chunk_size bytes at a time while the stream is
+        read, so characters split between chunks are decoded whole """
+
+        decoder = codecs.getincrementaldecoder(encoding)(errors)
+
+        with self.open(buffer_size=buffer_size) as stream:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                text = decoder.decode(chunk)
+                if text:
+                    yield text
+
+        text = decoder.decode(b"", final=True)
+        if text:
+            yield text
+
+
+    @contextmanager
+    def open(
+        self,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        offset: int = 0) -> Iterator[PipeStream]:
+        """ Open a readable stream fed by a background read with bounded memory """
+
+        pipe = PipeStream(buffer_size=buffer_size)
+
+        def produce():
+            try:
+                self.read_chunked(pipe, offset=offset)
+            except BaseException as error: # pylint: disable=broad-except
+                pipe.close_writer(error)
+            else:
+                pipe.close_writer()
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+
+        try:
+            yield pipe
+        finally:
+            pipe.close()
+            producer.join()
+
+
+class RangeStreamReader(StreamReader):
+    """ Stream reader of sources that support ranged reads, fetching up to max_concurrency
+    ranges of chunk_size bytes in parallel, emitting a range event per read if metrics is set """
+
+    def __init__(self, chunk_size: int, max_concurrency: int = 1):
+        super().__init__()
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.metrics = None
+
+
+    def get_size(self) -> int:
+        """ Get size of source in bytes """
+
+        raise NotImplementedError()
+
+
+    def read_range(self, start: int, length: int) -> bytes:
+        """ Read length bytes from start """
+
+        raise NotImplementedError()
+
+
+    def _read_range(self, start: int, length: int) -> bytes:
+        if not self.metrics:
+            return self.read_range(start, length)
+
+        with self.metrics.measure("range", offset=start) as event:
+            data = self.read_range(start, length)
+            event["size"] = len(data)
+        return data
+
+
+    def get_ranges(self, size: int, offset: int = 0) -> Iterator[tuple]:
+        """ Get (start, length) of the chunks of size bytes from offset """
+
+        for start in range(offset, size, self.chunk_size):
+            yield start, min(self.chunk_size, size - start)
+
+
+    def read_chunked(self, output_stream: Any, offset: int = 0):
+        """ Read from stream with ranged reads of chunk_size bytes, written in order
+        with at most max_concurrency chunks in memory """
+
+        ranges = self.get_ranges(self.get_size(), offset)
+
+        if self.max_concurrency <= 1:
+            for start, length in ranges:
+                output_stream.write(self._read_range(start, length))
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            pending = deque()
+            try:
+                for start, length in ranges:
+                    if len(pending) >= self.max_concurrency:
+                        output_stream.write(pending.popleft().result())
+                    pending.append(executor.submit(self._read_range, start, length))
+
+                while pending:
+                    output_stream.write(pending.popleft().result())
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+    def read_into_file(
+        self,
+        file_path: str,
+        offset: int = 0,
+        progress: Callable[[int], None] = None):
+        """ Read into file with max_concurrency parallel ranged reads, each written at its
+        position in the file preallocated to the size of the source. The first offset bytes
+        of the file are kept and progress is called with the number of bytes written
+        without gaps as it grows """
+
+        size = self.get_size()
+        lock = threading.Lock()
+        done = {}
+        written = [offset]
+
+        def read_range(chunk: tuple):
+            start, length = chunk
+            data = memoryview(self._read_range(start, length))
+            if hasattr(os, "pwrite"):
+                while data:
+                    data = data[os.pwrite(file.fileno(), data, start + length - len(data)):]
+            else:
+                with lock:
+                    file.seek(start)
+                    file.write(data)
+
+            with lock:
+                done[start] = length
+                while written[0] in done:
+                    written[0] += done.pop(written[0])
+                if progress:
+                    progress(written[0])
+
+        with open(file_path, "r+b" if offset else "wb") as file:
+            file.truncate(size)
+
+            with ThreadPoolExecutor(max_workers=max(self.max_concurrency, 1)) as executor:
+                futures = [
+                    executor.submit(read_range, chunk)
+                    for chunk in self.get_ranges(size, offset)
+                    ]
+                try:
+                    for future in futures:
+                        future.result()
+                finally:
+                    for future in futures:
+                        future.cancel()
 
 
 class StreamWriter():
@@ -35,5 +231,91 @@ class StreamWriter():
         """ Set filename """
 
 
+    def for_file_path(self, file_path: str) -> "StreamWriter":
+        """ Get a writer for file_path, leaving this writer unchanged,
+        so several files can be written concurrently """
+
+        writer = copy.copy(self)
+        writer.set_file_path(file_path)
+        return writer
+
+
     def write(self, input_stream: Any):
         """ Write stream """
+
+
+    def copy_from(
+        self,
+        stream_reader: StreamReader,
+        offset: int = 0,
+        progress: Callable[[int], None] = None) -> bool:
+        """ Copy the source of stream_reader without streaming it through a pipe, e.g.
+        server-side, after the first offset bytes the writer already has, calling progress
+        with the number of bytes copied. False if the writer cannot, then the caller streams """
+
+        return False
+
+
+    def get_resume_offset(self, offset: int) -> int:
+        """ Get the offset append can continue from, given a checkpointed offset,
+        0 if the writer cannot append """
+
+        return 0
+
+
+    def append(self, input_stream: Any, offset: int):
+        """ Write stream after the first offset bytes already written """
+
+        if offset:
+            raise ValueError(f"{self.__class__.__name__} cannot append")
+
+        self.write(input_stream)
+
+
+    async def write_async(self, input_stream: Any):
+        """ Write stream without blocking the event loop, runs write in the default executor
+        unless the writer has non-blocking I/O """
+
+        await asyncio.get_running_loop().run_in_executor(None, self.write, input_stream)
+
+
+def read_chunk(input_stream: Any, size: int) -> bytes:
+    """ Read up to size bytes, also from streams that return short reads """
+
+    chunk = input_stream.read(size)
+    if not chunk or len(chunk) == size:
+        return chunk
+
+    chunks = [chunk]
+    remaining = size - len(chunk)
+    while remaining > 0:
+        chunk = input_stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+
+    return b"".join(chunks)
+
+
+async def run_bounded(awaitables: Iterable[Awaitable], max_concurrency: int):
+    """ Run awaitables max_concurrency at a time, taking the next one from the iterable only
+    when one completes, so e.g. chunks are read as they are uploaded. The others are cancelled
+    if one fails """
+
+    pending = set()
+    try:
+        for awaitable in awaitables:
+            if len(pending) >= max_concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()
+            pending.add(asyncio.ensure_future(awaitable))
+
+        if pending:
+            done, pending = await asyncio.wait(pending)
+            for task in done:
+                task.result()
+    finally:
+        for task in pending:
+            task.cancel()
@@ -1,11 +1,81 @@
 """ AWS S3 file """
 
+from __future__ import annotations
+from contextlib import asynccontextmanager
+import copy
+import io
+import itertools
+import math
 import os
-from typing import Any
-import boto3
-from boto3.s3.transfer import TransferConfig
+from typing import TYPE_CHECKING, Any, Callable
 
-from xcputils.streaming import StreamReader, StreamWriter
+from xcputils.streaming import RangeStreamReader, StreamReader, StreamWriter, read_chunk, run_bounded
+from xcputils.streaming.cache import ClientCache, DEFAULT_CLIENT_TTL
+
+if TYPE_CHECKING:
+    from boto3.s3.transfer import TransferConfig
+
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_READ_CONCURRENCY = 2
+MIN_PART_SIZE = 8 * 1024 * 1024
+MAX_PART_SIZE = 64 * 1024 * 1024
+MAX_PARTS = 10000
+EXPIRED_CREDENTIALS_ERROR_CODES = frozenset((
+    "ExpiredToken",
+    "ExpiredTokenException",
+    "InvalidAccessKeyId",
+    "InvalidToken",
+    "RequestExpired",
+    "TokenRefreshRequired",
+    ))
+
+_clients = ClientCache()
+
+
+class AwsS3TransferConfig():
+    """ AWS S3 multipart transfer configuration, chunk_size None picks the part size
+    from the content length when it is known """
+
+    def __init__(
+        self,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        chunk_size: int = None,
+        max_concurrency: int = 10,
+        use_threads: bool = True,
+        ):
+
+        self.multipart_threshold = multipart_threshold
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
+        self.use_threads = use_threads
+
+
+    def get_chunk_size(self, content_length: int = None) -> int:
+        """ Get part size, by default about four parts per thread between 8 and 64 MiB,
+        larger if needed to stay within the S3 limit of 10000 parts """
+
+        if self.chunk_size:
+            return self.chunk_size
+
+        if content_length is None:
+            return MIN_PART_SIZE
+
+        chunk_size = math.ceil(content_length / (4 * self.max_concurrency))
+        chunk_size = min(max(chunk_size, MIN_PART_SIZE), MAX_PART_SIZE)
+        return max(chunk_size, math.ceil(content_length / MAX_PARTS))
+
+
+    def get_boto3_config(self, content_length: int = None) -> TransferConfig:
+        """ Get boto3 transfer configuration for an object of content_length bytes """
+
+        from boto3.s3.transfer import TransferConfig # pylint: disable=import-outside-toplevel,redefined-outer-name
+
+        return TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.get_chunk_size(content_length),
+            max_concurrency=self.max_concurrency,
+            use_threads=self.use_threads)
 
 
 class AwsS3ConnectionSettings():
@@ -18,7 +88,13 @@ class AwsS3ConnectionSettings():
                  aws_secret_access_key: str = None,
                  aws_session_token: str = None,
                  aws_region_name: str = None,
+                 max_pool_connections: int = 10,
+                 client_ttl: float = DEFAULT_CLIENT_TTL,
+                 transfer_config: AwsS3TransferConfig = None,
+                 async_client = None,
                  ):
+        """ Constructor, async_client is an aiobotocore S3 client shared by the async reads and
+        writes of these settings, e.g. by a batch of copies, else each creates its own """
 
         self.bucket = bucket
         self.file_path = file_path
@@ -26,32 +102,123 @@ class AwsS3ConnectionSettings():
         self.aws_secret_access_key = aws_secret_access_key
         self.aws_session_token = aws_session_token
         self.aws_region_name = aws_region_name
+        self.max_pool_connections = max_pool_connections
+        self.client_ttl = client_ttl
+        self.transfer_config = transfer_config if transfer_config else AwsS3TransferConfig()
+        self.async_client = async_client
 
 
-    def get_client(self):
-        """ Get S3 client """
+    def get_identity(self) -> tuple:
+        """ Get credentials and region, connections with the same identity can copy server-side """
 
-        return boto3.Session(
-            aws_access_key_id=self.aws_access_key_id
+        return (
+            self.aws_access_key_id
                 if self.aws_access_key_id
                 else os.getenv("AWS_ACCESS_KEY_ID", None),
-            aws_secret_access_key=self.aws_secret_access_key
+            self.aws_secret_access_key
                 if self.aws_secret_access_key
                 else os.getenv("AWS_SECRET_ACCESS_KEY", None),
-            aws_session_token=self.aws_session_token
+            self.aws_session_token
                 if self.aws_session_token
                 else os.getenv("AWS_SESSION_TOKEN", None),
-            region_name=self.aws_region_name
+            self.aws_region_name
                 if self.aws_region_name
-                else os.getenv("AWS_DEFAULT_REGION", None)
-            ).client('s3')
+                else os.getenv("AWS_DEFAULT_REGION", None),
+            )
 
 
-class AwsS3StreamReader(StreamReader):
-    """ AWS S3 stream writer """
+    def get_client_key(self) -> tuple:
+        """ Get connection identity and pool size, used as client cache key """
 
-    def __init__(self, connection_settings: AwsS3ConnectionSettings):
-        super().__init__()
+        return self.get_identity() + (self.max_pool_connections,)
+
+
+    def get_client(self):
+        """ Get S3 client, shared by all connections with the same identity,
+        boto3 is imported when the first client is created. The client is evicted when
+        a call fails because its credentials expired or are invalid """
+
+        return _clients.get(self.get_client_key(), self._create_client, ttl=self.client_ttl)
+
+
+    def evict_client(self):
+        """ Evict cached S3 client, e.g. after its credentials expired """
+
+        _clients.evict(self.get_client_key())
+
+
+    @asynccontextmanager
+    async def get_async_client(self):
+        """ Get the shared async client, or a client created for the block if there is none,
+        use as an async context manager """
+
+        if self.async_client is not None:
+            yield self.async_client
+            return
+
+        async with self.create_async_client() as client:
+            yield client
+
+
+    def create_async_client(self):
+        """ Create aiobotocore S3 client, use as an async context manager """
+
+        try:
+            from aiobotocore.session import get_session # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ImportError(
+                "Async S3 I/O requires aiobotocore, install xcputils[async]") from error
+        from botocore.config import Config # pylint: disable=import-outside-toplevel
+
+        access_key_id, secret_access_key, session_token, region_name, max_pool_connections = \
+            self.get_client_key()
+
+        return get_session().create_client(
+            's3',
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            aws_session_token=session_token,
+            region_name=region_name,
+            config=Config(max_pool_connections=max_pool_connections))
+
+
+    def _create_client(self):
+        import boto3 # pylint: disable=import-outside-toplevel
+        from botocore.config import Config # pylint: disable=import-outside-toplevel
+
+        key = self.get_client_key()
+        access_key_id, secret_access_key, session_token, region_name, max_pool_connections = key
+
+        client = boto3.Session(
+            aws_access_key_id=access_key_id,
+            aws_secret_access_key=secret_access_key,
+            aws_session_token=session_token,
+            region_name=region_name,
+            ).client('s3', config=Config(max_pool_connections=max_pool_connections))
+
+        def evict_on_expired_credentials(parsed, **_):
+            if parsed.get("Error", {}).get("Code") in EXPIRED_CREDENTIALS_ERROR_CODES:
+                _clients.evict(key, client)
+
+        client.meta.events.register("after-call.s3", evict_on_expired_credentials)
+        return client
+
+
+class AwsS3StreamReader(RangeStreamReader):
+    """ AWS S3 stream reader, ranged GETs run max_concurrency at a time, by default a small
+    in-order window, one at a time if the transfer configuration does not use threads """
+
+    def __init__(
+        self,
+        connection_settings: AwsS3ConnectionSettings,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_concurrency: int = None,
+        ):
+        transfer_config = connection_settings.transfer_config
+        if max_concurrency is None:
+            max_concurrency = DEFAULT_READ_CONCURRENCY if transfer_config.use_threads else 1
+
+        super().__init__(chunk_size=chunk_size, max_concurrency=max_concurrency)
         self.connection_settings = connection_settings
 
 
@@ -63,7 +230,46 @@ class AwsS3StreamReader(StreamReader):
         client.download_fileobj(
             self.connection_settings.bucket,
             self.connection_settings.file_path,
-            output_stream)
+            output_stream,
+            Config=self.connection_settings.transfer_config.get_boto3_config())
+
+
+    def get_version(self) -> str:
+        """ Get ETag of object """
+
+        return self.connection_settings.get_client().head_object(
+            Bucket=self.connection_settings.bucket,
+            Key=self.connection_settings.file_path)["ETag"]
+
+
+    def get_size(self) -> int:
+        """ Get size of object """
+
+        return self.connection_settings.get_client().head_object(
+            Bucket=self.connection_settings.bucket,
+            Key=self.connection_settings.file_path)["ContentLength"]
+
+
+    def read_range(self, start: int, length: int) -> bytes:
+        """ Read length bytes from start with a ranged GET """
+
+        response = self.connection_settings.get_client().get_object(
+            Bucket=self.connection_settings.bucket,
+            Key=self.connection_settings.file_path,
+            Range=f"bytes={start}-{start + length - 1}")
+        with response["Body"] as body:
+            return body.read()
+
+
+    async def read_async(self) -> bytes:
+        """ Read object into memory with non-blocking I/O """
+
+        async with self.connection_settings.get_async_client() as client:
+            response = await client.get_object(
+                Bucket=self.connection_settings.bucket,
+                Key=self.connection_settings.file_path)
+            async with response["Body"] as body:
+                return await body.read()
 
 
 class AwsS3StreamWriter(StreamWriter):
@@ -86,15 +292,109 @@ class AwsS3StreamWriter(StreamWriter):
         self.connection_settings.file_path = file_path
 
 
-    def write(self, input_stream: Any):
-        """ Write to stream """
+    def for_file_path(self, file_path: str) -> StreamWriter:
+        """ Get a writer for file_path with its own connection settings """
 
-        conf = TransferConfig(multipart_threshold=10000, max_concurrency=4)
+        writer = copy.copy(self)
+        writer.connection_settings = copy.copy(self.connection_settings)
+        writer.set_file_path(file_path)
+        return writer
+
+
+    def copy_from(
+        self,
+        stream_reader: StreamReader,
+        offset: int = 0,
+        progress: Callable[[int], None] = None) -> bool:
+        """ Copy server-side if stream_reader reads from S3 with the same identity,
+        with UploadPartCopy for objects above the multipart threshold """
+
+        if not isinstance(stream_reader, AwsS3StreamReader):
+            return False
+
+        source = stream_reader.connection_settings
+        if source.get_identity() != self.connection_settings.get_identity():
+            return False
+
+        self.connection_settings.get_client().copy(
+            CopySource={"Bucket": source.bucket, "Key": source.file_path},
+            Bucket=self.connection_settings.bucket,
+            Key=self.connection_settings.file_path,
+            Config=self.connection_settings.transfer_config.get_boto3_config())
+
+        return True
+
+
+    def write(self, input_stream: Any):
+        """ Write to stream, with the part size picked from the stream size if it is known
+        unless the transfer configuration sets it """
 
         client = self.connection_settings.get_client()
+        transfer_config = self.connection_settings.transfer_config
 
         client.upload_fileobj(
             input_stream,
             self.connection_settings.bucket,
             self.connection_settings.file_path,
-            Config=conf)
+            Config=transfer_config.get_boto3_config(_get_content_length(input_stream)))
+
+
+    async def write_async(self, input_stream: Any):
+        """ Write to stream with non-blocking I/O, objects larger than a part are uploaded in
+        parts max_concurrency at a time, so only those parts are held in memory """
+
+        transfer_config = self.connection_settings.transfer_config
+        chunk_size = transfer_config.get_chunk_size(_get_content_length(input_stream))
+        chunks = iter(lambda: read_chunk(input_stream, chunk_size), b"")
+        first_chunk = next(chunks, b"")
+        second_chunk = next(chunks, None)
+
+        async with self.connection_settings.get_async_client() as client:
+            if second_chunk is None:
+                await client.put_object(
+                    Bucket=self.connection_settings.bucket,
+                    Key=self.connection_settings.file_path,
+                    Body=first_chunk)
+                return
+
+            upload_id = (await client.create_multipart_upload(
+                Bucket=self.connection_settings.bucket,
+                Key=self.connection_settings.file_path))["UploadId"]
+            parts = []
+
+            async def upload_part(part_number: int, chunk: bytes):
+                response = await client.upload_part(
+                    Bucket=self.connection_settings.bucket,
+                    Key=self.connection_settings.file_path,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    Body=chunk)
+                parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+            try:
+                await run_bounded(
+                    (upload_part(part_number, chunk) for part_number, chunk in enumerate(
+                        itertools.chain((first_chunk, second_chunk), chunks), start=1)),
+                    transfer_config.max_concurrency)
+                await client.complete_multipart_upload(
+                    Bucket=self.connection_settings.bucket,
+                    Key=self.connection_settings.file_path,
+                    UploadId=upload_id,
+                    MultipartUpload={"Parts": sorted(parts, key=lambda part: part["PartNumber"])})
+            except BaseException:
+                await client.abort_multipart_upload(
+                    Bucket=self.connection_settings.bucket,
+                    Key=self.connection_settings.file_path,
+                    UploadId=upload_id)
+                raise
+
+
+def _get_content_length(stream: Any) -> int:
+    """ Get number of bytes left in stream if it is a file or in memory, else None """
+
+    try:
+        if isinstance(stream, io.BytesIO):
+            return stream.getbuffer().nbytes - stream.tell()
+        return os.fstat(stream.fileno()).st_size - stream.tell()
+    except (AttributeError, OSError, ValueError, io.UnsupportedOperation):
+        return None
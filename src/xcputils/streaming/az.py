@@ -1,11 +1,38 @@
 """ Azure Data Lake Storage Account Streaming Connector """
 
-from typing import Any
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import asynccontextmanager
+from typing import Any, Callable
+import copy
 import os
-from azure.identity import DefaultAzureCredential, ClientSecretCredential
-from azure.storage.filedatalake import DataLakeServiceClient
+import time
 
-from xcputils.streaming import StreamReader, StreamWriter
+from xcputils.streaming import RangeStreamReader, StreamReader, StreamWriter, read_chunk, run_bounded
+from xcputils.streaming.cache import ClientCache, DEFAULT_CLIENT_TTL
+
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024
+DEFAULT_READ_CONCURRENCY = 2
+COPY_POLL_INTERVAL = 1.0
+EXPIRED_CREDENTIALS_ERROR_CODES = frozenset((
+    "AuthenticationFailed",
+    "InvalidAuthenticationInfo",
+    ))
+
+_clients = ClientCache()
+
+
+class AdfsTransferConfig():
+    """ Azure Data Lake Storage upload configuration """
+
+    def __init__(
+        self,
+        chunk_size: int = 8 * 1024 * 1024,
+        max_concurrency: int = 4,
+        ):
+
+        self.chunk_size = chunk_size
+        self.max_concurrency = max_concurrency
 
 
 class AdfsConnectionSettings():
@@ -20,7 +47,13 @@ class AdfsConnectionSettings():
         tenant_id: str = None,
         client_id: str = None,
         client_secret: str = None,
+        transfer_config: AdfsTransferConfig = None,
+        max_pool_connections: int = 10,
+        client_ttl: float = DEFAULT_CLIENT_TTL,
+        async_client = None,
         ):
+        """ Constructor, async_client is an async DataLakeServiceClient shared by the async reads
+        and writes of these settings, e.g. by a batch of copies, else each creates its own """
 
         self.container = container
         self.file_name = file_name
@@ -28,14 +61,114 @@ class AdfsConnectionSettings():
         self.tenant_id = tenant_id
         self.client_id = client_id
         self.client_secret = client_secret
+        self.transfer_config = transfer_config if transfer_config else AdfsTransferConfig()
+        self.max_pool_connections = max_pool_connections
+        self.client_ttl = client_ttl
+        self.async_client = async_client
 
         if storage_account_name is None:
             storage_account_name = os.getenv("ADFS_DEFAULT_STORAGE_ACCOUNT", None)
         self.storage_account_name = storage_account_name
 
 
+    def get_identity(self) -> tuple:
+        """ Get storage account and credentials, connections with the same identity can copy
+        server-side """
+
+        return (
+            self.storage_account_name,
+            self.tenant_id,
+            self.client_id,
+            self.client_secret,
+            )
+
+
+    def get_client_key(self) -> tuple:
+        """ Get connection identity and pool size, used as client cache key """
+
+        return self.get_identity() + (self.max_pool_connections,)
+
+
     def get_client(self):
-        """ get ADFS client"""
+        """ Get ADFS client, shared by all connections with the same identity,
+        the Azure SDK is imported when the first client is created. The client is evicted
+        when a call fails because its credentials expired or are invalid """
+
+        return _clients.get(self.get_client_key(), self._create_client, ttl=self.client_ttl)
+
+
+    def get_blob_service_client(self):
+        """ Get blob service client of the storage account, used for server-side copies """
+
+        return _clients.get(
+            ("blob",) + self.get_client_key(), self._create_blob_service_client, ttl=self.client_ttl)
+
+
+    def get_file_client(self):
+        """ Get client of file_name in directory """
+
+        return self.get_client() \
+            .get_file_system_client(file_system=self.container) \
+            .get_directory_client(self.directory) \
+            .get_file_client(self.file_name)
+
+
+    def get_path(self) -> str:
+        """ Get path of file in container """
+
+        return "/".join(part for part in (self.directory, self.file_name) if part)
+
+
+    def evict_client(self):
+        """ Evict cached ADFS clients, e.g. after their credentials expired """
+
+        _clients.evict(self.get_client_key())
+        _clients.evict(("blob",) + self.get_client_key())
+
+
+    @asynccontextmanager
+    async def get_async_client(self):
+        """ Get the shared async client, or a client created for the block if there is none,
+        use as an async context manager """
+
+        if self.async_client is not None:
+            yield self.async_client
+            return
+
+        async with self.create_async_client() as client:
+            yield client
+
+
+    @asynccontextmanager
+    async def create_async_client(self):
+        """ Create async ADFS client, use as an async context manager """
+
+        try:
+            import aiohttp # pylint: disable=import-outside-toplevel,unused-import
+            from azure.identity import aio as identity_aio # pylint: disable=import-outside-toplevel
+            from azure.storage.filedatalake import aio as datalake_aio # pylint: disable=import-outside-toplevel
+        except ImportError as error:
+            raise ImportError(
+                "Async ADFS I/O requires aiohttp, install xcputils[async]") from error
+
+        if self.tenant_id and self.client_id and self.client_secret:
+            credential = identity_aio.ClientSecretCredential(
+                tenant_id=self.tenant_id,
+                client_id=self.client_id,
+                client_secret=self.client_secret)
+        else:
+            credential = identity_aio.DefaultAzureCredential()
+
+        async with credential, datalake_aio.DataLakeServiceClient(
+            account_url=f"https://{self.storage_account_name}.dfs.core.windows.net",
+            credential=credential) as client:
+            yield client
+
+
+    def _create_client(self):
+        # pylint: disable=import-outside-toplevel
+        from azure.identity import DefaultAzureCredential, ClientSecretCredential
+        from azure.storage.filedatalake import DataLakeServiceClient
 
         if self.tenant_id and self.client_id and self.client_secret:
             credential = ClientSecretCredential(
@@ -47,36 +180,113 @@ class AdfsConnectionSettings():
 
         return DataLakeServiceClient(
             account_url=f"https://{self.storage_account_name}.dfs.core.windows.net",
-            credential=credential)
+            credential=credential,
+            transport=self._create_transport(),
+            raw_response_hook=self._create_eviction_hook(self.get_client_key()))
+
+
+    def _create_blob_service_client(self):
+        from azure.storage.blob import BlobServiceClient # pylint: disable=import-outside-toplevel
+
+        return BlobServiceClient(
+            account_url=f"https://{self.storage_account_name}.blob.core.windows.net",
+            credential=self.get_client().credential,
+            transport=self._create_transport(),
+            raw_response_hook=self._create_eviction_hook(self.get_client_key()))
+
+
+    @staticmethod
+    def _create_eviction_hook(key: tuple) -> Callable:
+        """ Create response hook evicting the clients of the identity key on authentication
+        errors, so the next call creates clients with fresh credentials """
+
+        def evict_on_expired_credentials(response):
+            http_response = response.http_response
+            if http_response.status_code == 401 or \
+                    http_response.headers.get("x-ms-error-code") in EXPIRED_CREDENTIALS_ERROR_CODES:
+                _clients.evict(key)
+                _clients.evict(("blob",) + key)
+
+        return evict_on_expired_credentials
+
+
+    def _create_transport(self):
+        # pylint: disable=import-outside-toplevel
+        from azure.core.pipeline.transport import RequestsTransport
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.max_pool_connections,
+            pool_maxsize=self.max_pool_connections,
+            max_retries=Retry(total=False, redirect=False, raise_on_status=False))
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
 
+        return RequestsTransport(session=session, session_owner=False)
 
-class AdfsStreamReader(StreamReader):
-    """ Azure data Lake Storage stream reader """
+
+class AdfsStreamReader(RangeStreamReader):
+    """ Azure data Lake Storage stream reader, ranged reads run max_concurrency at a time,
+    by default a small in-order window """
 
     def __init__(self,
-                 connection_settings: AdfsConnectionSettings):
+                 connection_settings: AdfsConnectionSettings,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 max_concurrency: int = None):
 
-        super().__init__()
+        super().__init__(
+            chunk_size=chunk_size,
+            max_concurrency=max_concurrency if max_concurrency is not None \
+                else DEFAULT_READ_CONCURRENCY)
 
         self.connection_settings = connection_settings
 
 
+    def _get_file_client(self):
+        return self.connection_settings.get_file_client()
+
+
     def read(self, output_stream):
         """ Read from stream """
 
-        client = self.connection_settings.get_client()
+        downloader = self._get_file_client().download_file()
 
-        file_system_client = client.get_file_system_client(
-            file_system=self.connection_settings.container)
+        downloader.readinto(output_stream)
 
-        directory_client = file_system_client.get_directory_client(
-            self.connection_settings.directory)
 
-        file_client = directory_client.get_file_client(self.connection_settings.file_name)
+    def get_version(self) -> str:
+        """ Get ETag of file, or last modified time if the service returns none """
 
-        downloader = file_client.download_file()
+        properties = self._get_file_client().get_file_properties()
 
-        downloader.readinto(output_stream)
+        return properties.etag or str(properties.last_modified)
+
+
+    def get_size(self) -> int:
+        """ Get size of file """
+
+        return self._get_file_client().get_file_properties().size
+
+
+    def read_range(self, start: int, length: int) -> bytes:
+        """ Read length bytes from start """
+
+        return self._get_file_client().download_file(offset=start, length=length).readall()
+
+
+    async def read_async(self) -> bytes:
+        """ Read file into memory with non-blocking I/O """
+
+        async with self.connection_settings.get_async_client() as client:
+            file_client = client \
+                .get_file_system_client(file_system=self.connection_settings.container) \
+                .get_directory_client(self.connection_settings.directory) \
+                .get_file_client(self.connection_settings.file_name)
+            downloader = await file_client.download_file()
+            return await downloader.readall()
 
 
 class AdfsStreamWriter(StreamWriter):
@@ -93,8 +303,7 @@ class AdfsStreamWriter(StreamWriter):
     def get_file_path(self) -> str:
         """ Get filename """
 
-        return self.connection_settings.file_name if not self.connection_settings.directory \
-            else f"{self.connection_settings.directory}/{self.connection_settings.file_name}"
+        return self.connection_settings.get_path()
 
 
     def set_file_path(self, file_path: str):
@@ -106,6 +315,59 @@ class AdfsStreamWriter(StreamWriter):
         self.connection_settings.file_name = file_name
 
 
+    def for_file_path(self, file_path: str) -> StreamWriter:
+        """ Get a writer for file_path with its own connection settings """
+
+        writer = copy.copy(self)
+        writer.connection_settings = copy.copy(self.connection_settings)
+        writer.set_file_path(file_path)
+        return writer
+
+
+    def copy_from(
+        self,
+        stream_reader: StreamReader,
+        offset: int = 0,
+        progress: Callable[[int], None] = None) -> bool:
+        """ Copy server-side with Copy Blob if stream_reader reads from the same storage
+        account with the same identity, creating the file system if missing like write,
+        waits until the copy completes """
+
+        if not isinstance(stream_reader, AdfsStreamReader):
+            return False
+
+        source = stream_reader.connection_settings
+        if source.get_identity() != self.connection_settings.get_identity():
+            return False
+
+        from azure.core.exceptions import ResourceExistsError # pylint: disable=import-outside-toplevel
+
+        blob_service_client = self.connection_settings.get_blob_service_client()
+        container_client = blob_service_client.get_container_client(
+            self.connection_settings.container)
+
+        if not container_client.exists():
+            try:
+                container_client.create_container()
+            except ResourceExistsError:
+                pass
+
+        source_url = blob_service_client.get_blob_client(source.container, source.get_path()).url
+        blob_client = blob_service_client.get_blob_client(
+            self.connection_settings.container, self.connection_settings.get_path())
+
+        status = blob_client.start_copy_from_url(source_url)["copy_status"]
+        while status == "pending":
+            time.sleep(COPY_POLL_INTERVAL)
+            status = blob_client.get_blob_properties().copy.status
+
+        if status != "success":
+            raise IOError(
+                f"Copy of {source.get_path()} to {self.connection_settings.get_path()} {status}")
+
+        return True
+
+
     def write(self, input_stream: Any):
         """ Write to stream """
 
@@ -126,6 +388,62 @@ class AdfsStreamWriter(StreamWriter):
                 self.connection_settings.directory)
 
         file_client = directory_client.create_file(self.connection_settings.file_name)
-        file_contents = input_stream.read()
-        file_client.upload_data(data=file_contents, overwrite=True)
+
+        config = self.connection_settings.transfer_config
+        offset = 0
+
+        with ThreadPoolExecutor(max_workers=config.max_concurrency) as executor:
+            pending = set()
+            while True:
+                chunk = read_chunk(input_stream, config.chunk_size)
+                if not chunk:
+                    break
+
+                if len(pending) >= config.max_concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+
+                pending.add(executor.submit(
+                    file_client.append_data, data=chunk, offset=offset, length=len(chunk)))
+                offset += len(chunk)
+
+            for future in wait(pending).done:
+                future.result()
+
+        file_client.flush_data(offset)
+
+
+    async def write_async(self, input_stream: Any):
+        """ Write to stream with non-blocking I/O, appending chunks of the transfer configuration
+        chunk size max_concurrency at a time, so only those chunks are held in memory """
+
+        config = self.connection_settings.transfer_config
+
+        async with self.connection_settings.get_async_client() as client:
+            file_system_client = client.get_file_system_client(
+                file_system=self.connection_settings.container)
+
+            if not await file_system_client.exists():
+                file_system_client = await client.create_file_system(
+                    file_system=self.connection_settings.container)
+
+            directory_client = file_system_client.get_directory_client(
+                self.connection_settings.directory)
+
+            if not await directory_client.exists():
+                directory_client = await file_system_client.create_directory(
+                    self.connection_settings.directory)
+
+            file_client = await directory_client.create_file(self.connection_settings.file_name)
+            offset = 0
+
+            def append_chunks():
+                nonlocal offset
+                for chunk in iter(lambda: read_chunk(input_stream, config.chunk_size), b""):
+                    yield file_client.append_data(data=chunk, offset=offset, length=len(chunk))
+                    offset += len(chunk)
+
+            await run_bounded(append_chunks(), config.max_concurrency)
+            await file_client.flush_data(offset)
 
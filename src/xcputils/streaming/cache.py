@@ -0,0 +1,77 @@
+""" Process-wide cache of storage clients """
+
+import threading
+import time
+from typing import Any, Callable, Hashable
+
+
+DEFAULT_CLIENT_TTL = 45 * 60
+
+
+class ClientCache():
+    """ Thread-safe cache of clients keyed on connection identity. Clients are created outside
+    the cache lock, one at a time per key, so a slow client does not hold up other identities,
+    and expired clients are dropped whenever a client is added """
+
+    def __init__(self):
+        self._clients = {}
+        self._key_locks = {}
+        self._lock = threading.Lock()
+
+
+    def get(self, key: Hashable, factory: Callable[[], Any], ttl: float = DEFAULT_CLIENT_TTL) -> Any:
+        """ Get cached client, creating it with factory if missing or expired """
+
+        with self._lock:
+            client = self.__get_valid(key)
+            if client is not None:
+                return client
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                client = self.__get_valid(key)
+                if client is not None:
+                    return client
+
+            client = factory()
+
+            with self._lock:
+                now = time.monotonic()
+                self.__sweep(now)
+                self._clients[key] = (client, now + ttl)
+                self._key_locks.setdefault(key, key_lock)
+                return client
+
+
+    def evict(self, key: Hashable, client: Any = None):
+        """ Evict client, e.g. after its credentials expired, if client is given only if it is
+        still the cached client, so a client created since is kept """
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry and (client is None or entry[0] is client):
+                del self._clients[key]
+
+
+    def clear(self):
+        """ Evict all clients """
+
+        with self._lock:
+            self._clients.clear()
+            self._key_locks.clear()
+
+
+    def __get_valid(self, key: Hashable) -> Any:
+        entry = self._clients.get(key)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        return None
+
+
+    def __sweep(self, now: float):
+        for key in [key for key, (_, expires) in self._clients.items() if expires <= now]:
+            del self._clients[key]
+            key_lock = self._key_locks.get(key)
+            if key_lock is not None and not key_lock.locked():
+                del self._key_locks[key]
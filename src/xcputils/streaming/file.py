@@ -1,21 +1,119 @@
 """ File stream writer """
 
-from xcputils.streaming import StreamWriter
+import io
+import os
+import shutil
+import stat
+from typing import Callable
+
+from xcputils.streaming import RangeStreamReader, StreamReader, StreamWriter
+
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
 
 
 class FileStreamWriter(StreamWriter):
     """ File stream writer """
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, buffer_size: int = DEFAULT_BUFFER_SIZE):
         super().__init__()
         self.file_path = file_path
+        self.buffer_size = buffer_size
 
 
     def write(self, input_stream):
-        """ Write stream to file """
+        """ Write stream to file in chunks of buffer_size bytes, creating missing folders """
+
+        folder = os.path.dirname(self.file_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
 
         with open(file=self.file_path, mode="wb") as file_stream:
-            file_stream.write(input_stream.read())
+            self._copy(input_stream, file_stream)
+
+
+    def copy_from(
+        self,
+        stream_reader: StreamReader,
+        offset: int = 0,
+        progress: Callable[[int], None] = None) -> bool:
+        """ Download with parallel ranged reads written at their positions in the file,
+        if stream_reader supports ranged reads with max_concurrency above 1 """
+
+        if not isinstance(stream_reader, RangeStreamReader) or stream_reader.max_concurrency <= 1:
+            return False
+
+        folder = os.path.dirname(self.file_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        stream_reader.read_into_file(self.file_path, offset=offset, progress=progress)
+
+        return True
+
+
+    def get_resume_offset(self, offset: int) -> int:
+        """ Get the offset append can continue from, at most the current file size """
+
+        try:
+            return min(offset, os.path.getsize(self.file_path))
+        except OSError:
+            return 0
+
+
+    def append(self, input_stream, offset: int):
+        """ Write stream to file after the first offset bytes, dropping anything after them """
+
+        if not offset:
+            self.write(input_stream)
+            return
+
+        with open(file=self.file_path, mode="r+b") as file_stream:
+            file_stream.truncate(offset)
+            file_stream.seek(offset)
+            self._copy(input_stream, file_stream)
+
+
+    def _copy(self, input_stream, file_stream):
+        if _is_regular_file(input_stream):
+            self._copy_file(input_stream, file_stream)
+        elif hasattr(input_stream, "readinto"):
+            self._copy_readinto(input_stream, file_stream)
+        else:
+            shutil.copyfileobj(input_stream, file_stream, self.buffer_size)
+
+
+    def _copy_file(self, input_stream, file_stream):
+        """ Copy from a real file, using sendfile where the platform supports it """
+
+        if hasattr(os, "sendfile"):
+            file_stream.flush()
+            offset = input_stream.tell()
+            try:
+                while True:
+                    sent = os.sendfile(
+                        file_stream.fileno(), input_stream.fileno(), offset, self.buffer_size)
+                    if sent == 0:
+                        break
+                    offset += sent
+                input_stream.seek(offset)
+                return
+            except OSError:
+                input_stream.seek(offset)
+
+        shutil.copyfileobj(input_stream, file_stream, self.buffer_size)
+
+
+    def _copy_readinto(self, input_stream, file_stream):
+        """ Copy through a single reused buffer """
+
+        buffer = memoryview(bytearray(self.buffer_size))
+        while True:
+            size = input_stream.readinto(buffer)
+            if not size:
+                break
+            file_stream.write(buffer[:size])
+
 
     def get_file_path(self) -> str:
         """ Get filename """
@@ -27,3 +125,10 @@ class FileStreamWriter(StreamWriter):
         """ Set filename """
 
         self.file_path = file_path
+
+
+def _is_regular_file(stream) -> bool:
+    try:
+        return stat.S_ISREG(os.fstat(stream.fileno()).st_mode)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
@@ -0,0 +1,32 @@
+""" FTP stream reader """
+
+from ftplib import FTP
+from typing import Any
+
+from xcputils.streaming import StreamReader
+
+
+DEFAULT_BLOCKSIZE = 64 * 1024
+
+
+class FtpStreamReader(StreamReader):
+    """ FTP stream reader for one file on a logged-in connection """
+
+    def __init__(self, ftp: FTP, file_name: str, blocksize: int = DEFAULT_BLOCKSIZE):
+        super().__init__()
+        self.ftp = ftp
+        self.file_name = file_name
+        self.blocksize = blocksize
+
+
+    def read(self, output_stream: Any):
+        """ Read from stream """
+
+        self.read_chunked(output_stream)
+
+
+    def read_chunked(self, output_stream: Any, offset: int = 0):
+        """ Read from stream, restarting the transfer at byte offset """
+
+        self.ftp.retrbinary(
+            f"RETR {self.file_name}", output_stream.write, self.blocksize, rest=offset or None)
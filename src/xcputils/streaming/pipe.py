@@ -0,0 +1,135 @@
+""" Bounded in-memory pipe between a producer and a consumer thread """
+
+from collections import deque
+import io
+import threading
+
+
+DEFAULT_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+class PipeStream(io.RawIOBase):
+    """ Readable stream fed by a producer thread through a bounded buffer """
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        super().__init__()
+
+        if buffer_size <= 0:
+            raise ValueError(f"buffer_size must be positive: {buffer_size}")
+
+        self.buffer_size = buffer_size
+        self._chunks = deque()
+        self._size = 0
+        self._condition = threading.Condition()
+        self._eof = False
+        self._error = None
+        self._aborted = False
+
+
+    def readable(self) -> bool:
+        return True
+
+
+    def writable(self) -> bool:
+        return True
+
+
+    def seekable(self) -> bool:
+        return False
+
+
+    def write(self, data) -> int:
+        """ Write data, blocking while the buffer is full """
+
+        view = memoryview(data).cast("B")
+        written = 0
+
+        with self._condition:
+            while written < len(view):
+                while self._size >= self.buffer_size and not self._aborted:
+                    self._condition.wait()
+
+                if self._aborted:
+                    raise BrokenPipeError("Pipe reader has been closed")
+
+                size = min(self.buffer_size - self._size, len(view) - written)
+                self._chunks.append(memoryview(bytes(view[written:written + size])))
+                self._size += size
+                written += size
+                self._condition.notify_all()
+
+        return written
+
+
+    def close_writer(self, error: BaseException = None):
+        """ Signal end of data, optionally with an error to raise in the reader """
+
+        with self._condition:
+            self._eof = True
+            self._error = error
+            self._condition.notify_all()
+
+
+    def read(self, size: int = -1) -> bytes:
+        """ Read size bytes, fewer only at the end of data or before a producer error, like a
+        buffered file, since readers such as multipart uploads treat every read as a whole part """
+
+        if size is None or size < 0:
+            return self.readall()
+
+        buffer = bytearray(size)
+        with memoryview(buffer) as view:
+            read = 0
+            while read < size:
+                try:
+                    count = self.readinto(view[read:])
+                except Exception: # pylint: disable=broad-except
+                    if not read:
+                        raise
+                    break
+                if not count:
+                    break
+                read += count
+
+            return view[:read].tobytes()
+
+
+    def readinto(self, buffer) -> int:
+        """ Read into buffer, blocking until data or end of data is available """
+
+        view = memoryview(buffer).cast("B")
+        read = 0
+
+        with self._condition:
+            while not self._chunks and not self._eof:
+                self._condition.wait()
+
+            if not self._chunks and self._error is not None:
+                raise self._error
+
+            while self._chunks and read < len(view):
+                chunk = self._chunks[0]
+                size = min(len(view) - read, len(chunk))
+                view[read:read + size] = chunk[:size]
+                read += size
+                if size == len(chunk):
+                    self._chunks.popleft()
+                else:
+                    self._chunks[0] = chunk[size:]
+
+            self._size -= read
+            self._condition.notify_all()
+
+        return read
+
+
+    def close(self):
+        """ Close the reader end, unblocking the producer """
+
+        with self._condition:
+            self._aborted = True
+            self._chunks.clear()
+            self._size = 0
+            self._condition.notify_all()
+
+        super().close()
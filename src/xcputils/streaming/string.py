@@ -1,23 +1,82 @@
 """ String stream writer """
 
+import threading
 from xcputils.streaming import StreamWriter
 
 
 class StringStreamWriter(StreamWriter):
-    """ String stream writer """
+    """ String stream writer, writes are kept as raw chunks, separated by a newline, and
+    joined and decoded once when the value is read """
 
 
     def __init__(self):
         super().__init__()
-        self.value = ""
+        self._chunks = []
+        self._size = 0
+        self._bytes = None
+        self._value = None
+        self._lock = threading.Lock()
+
+
+    @property
+    def value(self) -> str:
+        """ Written content decoded as UTF-8 """
+
+        with self._lock:
+            if self._value is None:
+                self._value = self.__join().decode("utf-8")
+            return self._value
+
+
+    @value.setter
+    def value(self, value: str):
+        with self._lock:
+            self._chunks = [value.encode("utf-8")] if value else []
+            self._size = len(self._chunks[0]) if value else 0
+            self._bytes = None
+            self._value = value
+
+
+    def get_buffer(self) -> memoryview:
+        """ Get written content without decoding it """
+
+        with self._lock:
+            return memoryview(self.__join())
+
+
+    def for_file_path(self, file_path: str) -> StreamWriter:
+        """ All files are written to the same string """
+
+        return self
 
 
     def write(self, input_stream):
         """ Write to stream """
 
-        content = input_stream if isinstance(input_stream, bytes) else  input_stream.read()
-        if isinstance(content, bytes):
-            content = content.decode('utf-8')
-        if self.value:
-            self.value += "\n"
-        self.value += content
+        content = input_stream if isinstance(input_stream, (bytes, bytearray, memoryview)) \
+            else input_stream.read()
+        if isinstance(content, str):
+            content = content.encode("utf-8")
+        elif not isinstance(content, bytes):
+            content = bytes(content)
+        with self._lock:
+            if self._size:
+                self._chunks.append(b"\n")
+                self._size += 1
+            self._chunks.append(content)
+            self._size += len(content)
+            self._bytes = None
+            self._value = None
+
+
+    async def write_async(self, input_stream):
+        """ Write to stream, in memory so it does not block """
+
+        self.write(input_stream)
+
+
+    def __join(self) -> bytes:
+        if self._bytes is None:
+            self._bytes = b"".join(self._chunks)
+            self._chunks = [self._bytes] if self._bytes else []
+        return self._bytes